@@ -2,10 +2,11 @@
 
 import os
 import json
-import asyncio
 import uuid
+import time
+import inspect
 import traceback
-from typing import List, Dict, Any, Optional, AsyncGenerator
+from typing import List, Dict, Any, Optional, AsyncGenerator, Tuple
 from datetime import datetime
 from dataclasses import dataclass
 from enum import Enum
@@ -20,9 +21,15 @@ from agno.tools.duckduckgo import DuckDuckGoTools
 from agno.tools.yfinance import YFinanceTools
 from agno.tools.reasoning import ReasoningTools
 
+# Clientes HTTP e ferramentas compartilhados
+from services.model_clients import model_clients
+from services.tool_pool import tool_pool
+from services.llm_governor import llm_governor
+from services.supabase_async import supabase_async
+
 # Sistema existente
 try:
-    from supabase_client import supabase, get_api_key, testar_login, safe_supabase_query
+    from supabase_client import supabase, get_api_key, testar_login
 except ImportError:
     print("⚠️ supabase_client não encontrado - usando configuração básica")
     supabase = None
@@ -42,6 +49,15 @@ class ModelProvider(str, Enum):
     ANTHROPIC = "anthropic"
 
 
+PROVIDER_API_KEY_ENV = {
+    ModelProvider.OPENAI: "OPENAI_API_KEY",
+    ModelProvider.ANTHROPIC: "ANTHROPIC_API_KEY",
+}
+
+# Por quanto tempo uma chave lida da tabela api_keys é reutilizada
+API_KEY_CACHE_TTL = float(os.getenv("AGNO_API_KEY_CACHE_TTL", "300"))
+
+
 @dataclass
 class AgentConfig:
     name: str
@@ -72,6 +88,9 @@ class AgnoService:
         self.teams: Dict[str, Team] = {}
         self.workflows: Dict[str, Any] = {}
         self.sessions: Dict[str, Dict] = {}
+        # Chaves lidas da tabela api_keys: (chave, expira_em); relidas após o TTL
+        # para que rotação/revogação no Supabase chegue ao processo
+        self._api_keys: Dict[ModelProvider, Tuple[str, float]] = {}
 
         logger.info("🚀 AgnoService REAL inicializado")
 
@@ -86,12 +105,12 @@ class AgnoService:
             if provider == ModelProvider.OPENAI:
                 return OpenAIChat(
                     id=model_id,
-                    api_key=api_key
+                    **model_clients.model_kwargs("openai", api_key)
                 )
             elif provider == ModelProvider.ANTHROPIC:
                 return Claude(
                     id=model_id,
-                    api_key=api_key
+                    **model_clients.model_kwargs("anthropic", api_key)
                 )
             else:
                 raise ValueError(f"Provider não suportado: {provider}")
@@ -106,11 +125,11 @@ class AgnoService:
         for tool_name in tool_names:
             try:
                 if tool_name.lower() in ['duckduckgo', 'web_search', 'search']:
-                    tools.append(DuckDuckGoTools())
+                    tools.append(tool_pool.get('duckduckgo', None, DuckDuckGoTools))
                 elif tool_name.lower() in ['yfinance', 'finance', 'stocks']:
-                    tools.append(YFinanceTools())
+                    tools.append(tool_pool.get('yfinance', None, YFinanceTools))
                 elif tool_name.lower() in ['reasoning', 'reason', 'think']:
-                    tools.append(ReasoningTools())
+                    tools.append(tool_pool.get('reasoning', None, ReasoningTools))
                 else:
                     logger.warning(f"⚠️ Ferramenta não reconhecida: {tool_name}")
             except Exception as e:
@@ -128,7 +147,7 @@ class AgnoService:
             logger.info(f"🤖 [SESSION: {session_id}] Modelo: {config.model_provider}/{config.model_id}")
 
             # Obter API key
-            api_key = self.get_api_key_for_provider(config.model_provider)
+            api_key = await self.get_api_key_for_provider(config.model_provider)
             if not api_key:
                 raise ValueError(f"API key não encontrada para {config.model_provider}")
 
@@ -205,8 +224,43 @@ class AgnoService:
             logger.error(f"❌ [SESSION: {session_id}] Erro ao criar workflow: {str(e)}")
             raise
 
+    async def _stream_deltas(self, runner: Any, message: str) -> AsyncGenerator[str, None]:
+        """Repassa os deltas incrementais do provider (Agent ou Team) assim que chegam"""
+        provider = str(getattr(getattr(runner, 'model', None), 'provider', None) or 'openai').lower()
+
+        # Concorrência e rate limit por provider durante todo o stream
+        async with llm_governor.slot(provider, llm_governor.estimate_tokens(message)) as usage:
+            stream = runner.arun(message, stream=True)
+            # Dependendo da versão do Agno, arun() devolve o iterador direto ou uma coroutine
+            if inspect.isawaitable(stream):
+                stream = await stream
+
+            async for chunk in stream:
+                content = getattr(chunk, 'content', None)
+                if isinstance(content, str) and content:
+                    yield content
+
+            usage["actual_tokens"] = self._extract_token_metrics(runner)["total_tokens"] or None
+
+    @staticmethod
+    def _extract_token_metrics(runner: Any) -> Dict[str, int]:
+        """Extrai métricas de tokens da última execução (run_response) do Agno"""
+        metrics = getattr(getattr(runner, 'run_response', None), 'metrics', None) or {}
+
+        def _total(key: str) -> int:
+            value = metrics.get(key, 0) if isinstance(metrics, dict) else 0
+            if isinstance(value, (list, tuple)):
+                return int(sum(v for v in value if isinstance(v, (int, float))))
+            return int(value or 0)
+
+        return {
+            "input_tokens": _total('input_tokens'),
+            "output_tokens": _total('output_tokens'),
+            "total_tokens": _total('total_tokens'),
+        }
+
     async def run_agent(self, agent_id: str, message: str, user_id: int) -> AsyncGenerator[str, None]:
-        """Executa agente REAL com streaming corrigido"""
+        """Executa agente REAL com streaming token a token do provider"""
         session_id = f"run_agent_{agent_id}_{int(datetime.now().timestamp())}"
 
         try:
@@ -233,70 +287,31 @@ class AgnoService:
             logger.info(f"⏳ [SESSION: {session_id}] Iniciando execução do Agno...")
 
             try:
-                # ====== FIX PRINCIPAL: Executar agente e extrair APENAS o content ======
-                response = agent.run(message)
-
-                if response and hasattr(response, 'content') and response.content:
-                    # CORRIGIDO: Usar apenas o content da resposta, não o objeto inteiro
-                    response_text = response.content.strip()
-
-                    logger.info(f"📤 [SESSION: {session_id}] Resposta recebida: {len(response_text)} caracteres")
-                    logger.info(f"🔍 [SESSION: {session_id}] Início da resposta: '{response_text[:100]}...'")
-
-                    # Converter resposta em chunks para streaming natural
-                    # Estratégia: dividir por sentenças primeiro, depois por palavras se necessário
-                    sentences = []
-
-                    # Dividir por pontos, mas manter formatação
-                    for part in response_text.split('.'):
-                        if part.strip():
-                            sentences.append(part.strip() + '.')
-
-                    # Se não tiver pontos, dividir por quebras de linha
-                    if len(sentences) <= 1:
-                        sentences = [line.strip() for line in response_text.split('\n') if line.strip()]
-
-                    # Se ainda for muito pouco, dividir em chunks de palavras
-                    if len(sentences) <= 2:
-                        words = response_text.split(' ')
-                        sentences = []
-                        current_chunk = ""
-
-                        for word in words:
-                            current_chunk += word + " "
-                            if len(current_chunk) >= 50:  # Chunk de ~50 caracteres
-                                sentences.append(current_chunk.strip())
-                                current_chunk = ""
-
-                        if current_chunk.strip():
-                            sentences.append(current_chunk.strip())
-
-                    total_chunks = 0
-
-                    for sentence_idx, sentence in enumerate(sentences):
-                        if not sentence.strip():
-                            continue
-
-                        # Preparar chunk para envio
-                        chunk_data = {
-                            "type": "text",  # Formato que o frontend espera
-                            "content": sentence + " ",
-                            "session_id": session_id,
-                            "agent_id": agent_id,
-                            "timestamp": datetime.now().isoformat(),
-                            "chunk_index": total_chunks
-                        }
+                start_time = time.perf_counter()
+                first_token_ms = None
+                total_chunks = 0
+                total_characters = 0
 
-                        yield f'data: {json.dumps(chunk_data)}\n\n'
-                        total_chunks += 1
+                # Cada delta do provider é enviado imediatamente, sem atraso artificial
+                async for delta in self._stream_deltas(agent, message):
+                    if first_token_ms is None:
+                        first_token_ms = round((time.perf_counter() - start_time) * 1000, 2)
+                        logger.info(f"⚡ [SESSION: {session_id}] Primeiro token em {first_token_ms}ms")
 
-                        # Log apenas dos primeiros chunks para não poluir
-                        if total_chunks <= 3:
-                            logger.debug(f"📦 [SESSION: {session_id}] Chunk {total_chunks}: '{sentence[:50]}...'")
+                    chunk_data = {
+                        "type": "text",  # Formato que o frontend espera
+                        "content": delta,
+                        "session_id": session_id,
+                        "agent_id": agent_id,
+                        "timestamp": datetime.now().isoformat(),
+                        "chunk_index": total_chunks
+                    }
 
-                        # Delay natural para simular streaming realista
-                        await asyncio.sleep(0.15)  # 150ms entre chunks
+                    yield f'data: {json.dumps(chunk_data)}\n\n'
+                    total_chunks += 1
+                    total_characters += len(delta)
 
+                if total_chunks > 0:
                     # Enviar sinal de finalização
                     final_data = {
                         "type": "done",  # Formato que o frontend aceita
@@ -304,14 +319,11 @@ class AgnoService:
                         "agent_id": agent_id,
                         "timestamp": datetime.now().isoformat(),
                         "total_chunks": total_chunks,
-                        "total_characters": len(response_text),
+                        "total_characters": total_characters,
                         "metrics": {
-                            "input_tokens": getattr(response, 'metrics', {}).get('input_tokens', [0])[0] if hasattr(
-                                response, 'metrics') else 0,
-                            "output_tokens": getattr(response, 'metrics', {}).get('output_tokens', [0])[0] if hasattr(
-                                response, 'metrics') else 0,
-                            "total_tokens": getattr(response, 'metrics', {}).get('total_tokens', [0])[0] if hasattr(
-                                response, 'metrics') else 0,
+                            **self._extract_token_metrics(agent),
+                            "time_to_first_token_ms": first_token_ms,
+                            "total_time_ms": round((time.perf_counter() - start_time) * 1000, 2),
                         }
                     }
 
@@ -321,6 +333,7 @@ class AgnoService:
 
                 else:
                     # Caso a resposta seja vazia ou inválida
+                    response = getattr(agent, 'run_response', None)
                     logger.warning(f"⚠️ [SESSION: {session_id}] Resposta vazia ou inválida: {type(response)}")
                     logger.warning(f"🔍 [SESSION: {session_id}] Response object: {response}")
 
@@ -367,7 +380,7 @@ class AgnoService:
             yield f'data: {json.dumps(error_data)}\n\n'
 
     async def run_workflow(self, workflow_id: str, message: str, user_id: int) -> AsyncGenerator[str, None]:
-        """Executa workflow REAL com streaming"""
+        """Executa workflow REAL com streaming token a token do team"""
         session_id = f"run_workflow_{workflow_id}_{int(datetime.now().timestamp())}"
 
         try:
@@ -384,31 +397,37 @@ class AgnoService:
             workflow = self.workflows[workflow_id]
             team = workflow["team"]
 
-            # Executar team
-            response = team.run(message)
+            start_time = time.perf_counter()
+            first_token_ms = None
+            total_chunks = 0
 
-            if response:
-                # Simular streaming da resposta do team
-                response_text = str(response)
-                words = response_text.split(' ')
+            # Executar team repassando os deltas conforme chegam
+            async for delta in self._stream_deltas(team, message):
+                if first_token_ms is None:
+                    first_token_ms = round((time.perf_counter() - start_time) * 1000, 2)
 
-                for i, word in enumerate(words):
-                    chunk_data = {
-                        "type": "text",
-                        "content": word + " ",
-                        "session_id": session_id,
-                        "workflow_id": workflow_id
-                    }
+                chunk_data = {
+                    "type": "text",
+                    "content": delta,
+                    "session_id": session_id,
+                    "workflow_id": workflow_id
+                }
 
-                    yield f'data: {json.dumps(chunk_data)}\n\n'
-                    await asyncio.sleep(0.03)
+                yield f'data: {json.dumps(chunk_data)}\n\n'
+                total_chunks += 1
 
-                # Finalizar
-                final_data = {
-                    "type": "done",
-                    "session_id": session_id
+            # Finalizar
+            final_data = {
+                "type": "done",
+                "session_id": session_id,
+                "total_chunks": total_chunks,
+                "metrics": {
+                    **self._extract_token_metrics(team),
+                    "time_to_first_token_ms": first_token_ms,
+                    "total_time_ms": round((time.perf_counter() - start_time) * 1000, 2),
                 }
-                yield f'data: {json.dumps(final_data)}\n\n'
+            }
+            yield f'data: {json.dumps(final_data)}\n\n'
 
         except Exception as e:
             error_data = {
@@ -446,48 +465,41 @@ class AgnoService:
             logger.error(f"❌ Erro ao listar agentes: {str(e)}")
             return []
 
-    def get_api_key_for_provider(self, provider: ModelProvider) -> Optional[str]:
-        """Obtém API key para o provider especificado"""
+    async def get_api_key_for_provider(self, provider: ModelProvider) -> Optional[str]:
+        """Obtém API key para o provider especificado (env ou tabela api_keys)"""
         try:
-            if provider == ModelProvider.OPENAI:
-                api_key = os.getenv("OPENAI_API_KEY")
-                if not api_key:
-                    # Tentar obter do Supabase se disponível
-                    if supabase:
-                        try:
-                            result = safe_supabase_query(
-                                supabase.table("api_keys")
-                                .select("key_value")
-                                .eq("provider", "openai")
-                                .limit(1)
-                            )
-                            if result and len(result) > 0:
-                                api_key = result[0]["key_value"]
-                        except Exception as e:
-                            logger.warning(f"⚠️ Erro ao obter API key do Supabase: {str(e)}")
+            env_var = PROVIDER_API_KEY_ENV.get(provider)
+            if not env_var:
+                return None
 
+            api_key = os.getenv(env_var)
+            if api_key:
                 return api_key
 
-            elif provider == ModelProvider.ANTHROPIC:
-                api_key = os.getenv("ANTHROPIC_API_KEY")
-                if not api_key:
-                    # Tentar obter do Supabase se disponível
-                    if supabase:
-                        try:
-                            result = safe_supabase_query(
-                                supabase.table("api_keys")
-                                .select("key_value")
-                                .eq("provider", "anthropic")
-                                .limit(1)
-                            )
-                            if result and len(result) > 0:
-                                api_key = result[0]["key_value"]
-                        except Exception as e:
-                            logger.warning(f"⚠️ Erro ao obter API key do Supabase: {str(e)}")
+            cached = self._api_keys.get(provider)
+            if cached is not None and cached[1] > time.monotonic():
+                return cached[0]
 
-                return api_key
+            # Tentar obter do Supabase (consulta assíncrona, sem bloquear o event loop)
+            try:
+                row = await supabase_async.select_one(
+                    "api_keys", "key_value", {"provider": provider.value}
+                )
+                api_key = row["key_value"] if row else None
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao obter API key do Supabase: {str(e)}")
+                # Falha na consulta: mantém a última chave conhecida
+                return cached[0] if cached else None
+
+            if cached is not None and cached[0] != api_key:
+                # Chave rotacionada/revogada: o pool de clientes da antiga não é mais usado
+                model_clients.discard(provider.value, cached[0])
+            if api_key:
+                self._api_keys[provider] = (api_key, time.monotonic() + API_KEY_CACHE_TTL)
+            else:
+                self._api_keys.pop(provider, None)
 
-            return None
+            return api_key
 
         except Exception as e:
             logger.error(f"❌ Erro ao obter API key para {provider}: {str(e)}")
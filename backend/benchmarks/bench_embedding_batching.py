@@ -0,0 +1,112 @@
+# backend/benchmarks/bench_embedding_batching.py - Vazão do batching de embeddings x concorrência
+"""
+Mede a vazão de `EmbeddingService._embed_texts` (lotes por tokens, enviados
+em paralelo) para um corpus sintético, variando a concorrência. Usa um
+cliente falso com latência proporcional aos tokens do lote, sem rede.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_embedding_batching --chunks 50000 --concurrency 1 2 4 8 16
+
+--legacy inclui o esquema anterior (lotes fixos de 100 em série, pausa de
+0,1 s entre eles) para comparação; com 50k chunks ele leva minutos.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.embedding_service import EmbeddingService, count_tokens
+
+MODEL = "text-embedding-3-small"
+
+WORDS = (
+    "agente workflow equipe documento consulta resposta modelo contexto busca vetor "
+    "dados relatório cliente análise resumo tarefa memória ferramenta pipeline índice"
+).split()
+
+
+class FakeEmbeddingsAPI:
+    """Imita `client.embeddings.create`: latência = base + custo por token"""
+
+    def __init__(self, base_ms: float, us_per_token: float, dimensions: int, server_slots: int):
+        self.base_ms = base_ms
+        self.us_per_token = us_per_token
+        self.dimensions = dimensions
+        # Requisições simultâneas que o "servidor" atende (o resto aguarda)
+        self._slots = asyncio.Semaphore(server_slots)
+        self.calls = 0
+
+    async def create(self, model: str, input: List[str], encoding_format: str = "float"):
+        tokens = sum(count_tokens(text, model) for text in input)
+        async with self._slots:
+            self.calls += 1
+            await asyncio.sleep((self.base_ms + tokens * self.us_per_token / 1000) / 1000)
+        vector = [0.0] * self.dimensions
+        return SimpleNamespace(data=[SimpleNamespace(embedding=vector) for _ in input])
+
+
+def build_corpus(chunks: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    # Chunks de 50 a 400 palavras, como os gerados pelo DocumentProcessor
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(50, 400))) for _ in range(chunks)]
+
+
+async def run_legacy(service: EmbeddingService, texts: List[str]) -> float:
+    """Esquema anterior: lotes fixos de 100 em série com pausa de 0,1 s"""
+    start = time.perf_counter()
+    for i in range(0, len(texts), 100):
+        await service._embed_batch(texts[i:i + 100], MODEL)
+        if i + 100 < len(texts):
+            await asyncio.sleep(0.1)
+    return time.perf_counter() - start
+
+
+async def main(args) -> None:
+    texts = build_corpus(args.chunks, args.seed)
+    total_tokens = sum(count_tokens(text, MODEL) for text in texts)
+    print(f"Corpus: {len(texts)} chunks, {total_tokens} tokens")
+    print(f"{'modo':>12} | {'lotes':>6} | {'segundos':>9} | {'chunks/s':>9} | {'tokens/s':>10}")
+    print("-" * 60)
+
+    if args.legacy:
+        client = SimpleNamespace(embeddings=FakeEmbeddingsAPI(args.base_ms, args.us_per_token, args.dimensions, args.server_slots))
+        service = EmbeddingService(client=client)
+        seconds = await run_legacy(service, texts)
+        print(
+            f"{'legado':>12} | {client.embeddings.calls:>6} | {seconds:>9.2f} | "
+            f"{len(texts) / seconds:>9.0f} | {total_tokens / seconds:>10.0f}"
+        )
+
+    for concurrency in args.concurrency:
+        client = SimpleNamespace(embeddings=FakeEmbeddingsAPI(args.base_ms, args.us_per_token, args.dimensions, args.server_slots))
+        service = EmbeddingService(client=client, max_concurrency=concurrency)
+
+        start = time.perf_counter()
+        embeddings = await service._embed_texts(texts, MODEL)
+        seconds = time.perf_counter() - start
+        assert len(embeddings) == len(texts)
+
+        print(
+            f"{f'conc={concurrency}':>12} | {client.embeddings.calls:>6} | {seconds:>9.2f} | "
+            f"{len(texts) / seconds:>9.0f} | {total_tokens / seconds:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do batching de embeddings")
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--base-ms", type=float, default=150.0, help="Latência fixa por requisição")
+    parser.add_argument("--us-per-token", type=float, default=5.0, help="Custo por token (microssegundos)")
+    parser.add_argument("--server-slots", type=int, default=8, help="Requisições atendidas em paralelo pela API falsa")
+    parser.add_argument("--dimensions", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--legacy", action="store_true")
+    asyncio.run(main(parser.parse_args()))
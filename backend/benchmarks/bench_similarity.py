@@ -0,0 +1,103 @@
+# backend/benchmarks/bench_similarity.py - Similaridade coseno: par a par x em lote
+"""
+Compara o `EmbeddingService.cosine_similarity` (dois vetores por chamada)
+com `top_k_similar` / `batch_cosine_similarity` sobre matrizes float32
+pré-normalizadas, em dois cenários:
+
+- rerank: 1 query contra N embeddings, top-k
+- dedup: M embeddings contra eles mesmos, top-k por linha
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_similarity --rows 20000 --dimensions 1536 --k 10
+"""
+
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.embedding_service import EmbeddingService
+
+
+def timed(func, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def main(args) -> None:
+    # Sem cliente remoto: apenas as funções de similaridade são usadas
+    service = EmbeddingService(client=SimpleNamespace())
+    rng = np.random.default_rng(args.seed)
+
+    rows = rng.standard_normal((args.rows, args.dimensions)).astype(np.float32)
+    query = rng.standard_normal(args.dimensions).astype(np.float32)
+    rows_list = rows.tolist()
+    query_list = query.tolist()
+    normalized_rows = service.normalize(rows)
+    normalized_query = service.normalize(query)[0]
+
+    print(f"Matriz: {args.rows} x {args.dimensions} float32, k={args.k}")
+    print(f"{'cenário':>24} | {'ms':>10} | {'speedup':>8}")
+    print("-" * 50)
+
+    # Rerank: uma query contra todas as linhas
+    def pairwise_rerank():
+        scores = [service.cosine_similarity(query_list, row) for row in rows_list]
+        return sorted(range(len(scores)), key=scores.__getitem__, reverse=True)[:args.k]
+
+    def batched_rerank():
+        return service.top_k_similar(normalized_query, normalized_rows, args.k, normalized=True)[0]
+
+    expected, pairwise_ms = timed(pairwise_rerank, 1)
+    got, batched_ms = timed(batched_rerank, args.repeat)
+    assert list(got) == expected, (list(got), expected)
+    print(f"{'rerank par a par':>24} | {pairwise_ms:>10.2f} | {'1.0x':>8}")
+    print(f"{'rerank em lote':>24} | {batched_ms:>10.2f} | {pairwise_ms / batched_ms:>7.1f}x")
+
+    # Dedup: subconjunto contra ele mesmo (o par a par é O(M²) chamadas)
+    m = min(args.dedup_rows, args.rows)
+    subset = rows_list[:m]
+
+    def pairwise_dedup():
+        return [
+            sorted(range(m), key=lambda j: service.cosine_similarity(subset[i], subset[j]), reverse=True)[:args.k]
+            for i in range(m)
+        ]
+
+    def batched_dedup():
+        return service.top_k_similar(normalized_rows[:m], normalized_rows[:m], args.k, normalized=True,
+                                     chunk_size=args.chunk_size)[0]
+
+    expected, pairwise_ms = timed(pairwise_dedup, 1)
+    got, batched_ms = timed(batched_dedup, args.repeat)
+    assert [list(r) for r in got] == expected
+    print(f"{f'dedup {m}x{m} par a par':>24} | {pairwise_ms:>10.2f} | {'1.0x':>8}")
+    print(f"{f'dedup {m}x{m} em lote':>24} | {batched_ms:>10.2f} | {pairwise_ms / batched_ms:>7.1f}x")
+
+    # Matriz completa em blocos (memória limitada por chunk_size)
+    _, full_ms = timed(lambda: service.top_k_similar(
+        normalized_rows, normalized_rows, args.k, normalized=True, chunk_size=args.chunk_size
+    ), 1)
+    print(f"{f'top-k {args.rows}x{args.rows}':>24} | {full_ms:>10.2f} | {'-':>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de similaridade coseno em lote")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dedup-rows", type=int, default=300)
+    parser.add_argument("--chunk-size", type=int, default=4096)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
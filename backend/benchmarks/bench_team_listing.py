@@ -0,0 +1,151 @@
+# backend/benchmarks/bench_team_listing.py - Listagem de teams: N+1 vs carregamento em lote
+"""
+Compara a listagem antiga de teams (uma consulta por team) com o
+`load_teams_with_agents` (número fixo de consultas), contando as consultas
+SQL emitidas e a latência para diferentes quantidades de teams.
+
+Uso (a partir de backend/):
+    pip install aiosqlite
+    python -m benchmarks.bench_team_listing --teams 10 50 200 --agents-per-team 3
+
+Por padrão usa SQLite em memória; passe --database-url para medir contra o
+Postgres real (os dados de teste são criados num user_id dedicado).
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from models.agents import Agent, Base, Team, TeamAgent
+from services.team_loader import load_team_members, load_teams_with_agents, serialize_team
+
+BENCH_USER_ID = 987654
+
+
+class QueryCounter:
+    """Conta as consultas executadas pelo engine"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+
+async def seed(session_factory, teams: int, agents_per_team: int) -> None:
+    async with session_factory() as db:
+        agents = [
+            Agent(
+                user_id=BENCH_USER_ID, name=f"bench-agent-{i}", role="Assistente",
+                model_provider="openai", model_id="gpt-4o-mini",
+                instructions=["Seja breve"], tools=["duckduckgo"]
+            )
+            for i in range(agents_per_team * 4)
+        ]
+        db.add_all(agents)
+        await db.flush()
+
+        for t in range(teams):
+            team = Team(user_id=BENCH_USER_ID, name=f"bench-team-{t}", team_type="collaborative")
+            db.add(team)
+            await db.flush()
+            for p in range(agents_per_team):
+                agent = agents[(t + p) % len(agents)]
+                db.add(TeamAgent(team_id=team.id, agent_id=agent.id, role_in_team="member", priority=p + 1))
+        await db.commit()
+
+
+async def cleanup(session_factory) -> None:
+    async with session_factory() as db:
+        team_ids = select(Team.id).where(Team.user_id == BENCH_USER_ID)
+        for row in (await db.execute(select(TeamAgent).where(TeamAgent.team_id.in_(team_ids)))).scalars():
+            await db.delete(row)
+        for model in (Team, Agent):
+            for row in (await db.execute(select(model).where(model.user_id == BENCH_USER_ID))).scalars():
+                await db.delete(row)
+        await db.commit()
+
+
+async def list_teams_n_plus_one(db: AsyncSession, user_id: int) -> List[dict]:
+    """Padrão anterior: teams + (team_agents JOIN agents) por team"""
+    result = await db.execute(
+        select(Team).where(Team.user_id == user_id, Team.is_active == True).order_by(Team.created_at.desc())
+    )
+    teams = []
+    for team in result.scalars().all():
+        team_result = await db.execute(
+            select(Team).where(Team.id == team.id, Team.user_id == user_id, Team.is_active == True)
+        )
+        team_row = team_result.scalar_one_or_none()
+        members = await load_team_members(db, [team.id])
+        teams.append(serialize_team(team_row, members.get(team.id, [])))
+    return teams
+
+
+async def list_teams_batched(db: AsyncSession, user_id: int) -> List[dict]:
+    return await load_teams_with_agents(db, user_id)
+
+
+async def measure(session_factory, counter: QueryCounter, loader, repeat: int):
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        async with session_factory() as db:
+            before = counter.count
+            start = time.perf_counter()
+            teams = await loader(db, BENCH_USER_ID)
+            timings.append((time.perf_counter() - start) * 1000)
+            queries = counter.count - before
+    return len(teams), queries, statistics.median(timings)
+
+
+async def main(args) -> None:
+    is_sqlite = args.database_url.startswith("sqlite")
+    # SQLite em memória: todas as sessões precisam compartilhar a mesma conexão
+    engine = create_async_engine(args.database_url, poolclass=StaticPool) if is_sqlite \
+        else create_async_engine(args.database_url)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    counter = QueryCounter(engine)
+
+    if is_sqlite:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    print(f"{'teams':>6} | {'N+1 queries':>11} | {'N+1 ms':>9} | {'lote queries':>12} | {'lote ms':>9} | {'speedup':>7}")
+    print("-" * 70)
+    try:
+        for teams in args.teams:
+            await cleanup(session_factory)
+            await seed(session_factory, teams, args.agents_per_team)
+
+            count_a, queries_a, ms_a = await measure(session_factory, counter, list_teams_n_plus_one, args.repeat)
+            count_b, queries_b, ms_b = await measure(session_factory, counter, list_teams_batched, args.repeat)
+            assert count_a == count_b == teams, (count_a, count_b, teams)
+
+            print(
+                f"{teams:>6} | {queries_a:>11} | {ms_a:>9.2f} | {queries_b:>12} | {ms_b:>9.2f} | "
+                f"{ms_a / ms_b if ms_b else 0:>6.1f}x"
+            )
+    finally:
+        await cleanup(session_factory)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da listagem de teams")
+    parser.add_argument("--teams", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--agents-per-team", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///:memory:")
+    asyncio.run(main(parser.parse_args()))
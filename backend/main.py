@@ -166,6 +166,12 @@ except ImportError as e:
     logger.warning(f"⚠️ Agno framework não disponível: {e}")
     AGNO_AVAILABLE = False
 
+# Clientes HTTP compartilhados com os providers de LLM (fechados no shutdown)
+from services.model_clients import model_clients
+from services.agent_config_cache import agent_config_cache
+from services.executors import shutdown_executors
+from services.supabase_async import supabase_async
+
 
 # =============================================
 # MODELOS PYDANTIC MELHORADOS
@@ -308,6 +314,9 @@ async def lifespan(app: FastAPI):
     logger.info("🛑 Encerrando Agno Platform...")
     try:
         await engine.dispose()
+        await model_clients.aclose()
+        await supabase_async.aclose()
+        shutdown_executors()
         logger.info("✅ Conexões fechadas com sucesso")
     except Exception as e:
         logger.error(f"❌ Erro no shutdown: {e}")
@@ -659,20 +668,8 @@ async def chat_with_agent(
     chat_id = f"chat_{agent_id}_{int(datetime.now().timestamp())}"
 
     try:
-        # Buscar agente com validação de acesso
-        agent_query = sa_text("""
-            SELECT id, name, role, model_provider, model_id, instructions, tools,
-                   temperature, memory_enabled, rag_enabled
-            FROM agno_agents 
-            WHERE id = :agent_id AND user_id = :user_id AND is_active = true
-        """)
-
-        result = await db.execute(agent_query, {
-            "agent_id": agent_id,
-            "user_id": user_id
-        })
-
-        agent = result.fetchone()
+        # Buscar agente com validação de acesso (cache read-through)
+        agent = await agent_config_cache.load(db, agent_id, user_id, endpoint="main.chat")
         if not agent:
             raise HTTPException(
                 status_code=404,
@@ -775,10 +772,13 @@ async def execute_real_agno_chat(chat_id: str, agent, request: ChatRequest):
 
         # Configurar agente
         agent_config = {
+            "id": agent.id,
+            "updated_at": agent.updated_at,
             "name": agent.name,
             "role": agent.role,
             "model_provider": agent.model_provider,
             "model_id": agent.model_id,
+            "temperature": agent.temperature,
             "instructions": agent.instructions or ["Você é um assistente útil."],
         }
 
@@ -796,27 +796,18 @@ async def execute_real_agno_chat(chat_id: str, agent, request: ChatRequest):
             for tool in (agent.tools or [])
         ]
 
-        # Executar via Agno
-        stream_info = agno_service.execute_agent_task(
-            agent_config=agent_config,
-            prompt=request.prompt,
-            tools_list=tools_to_use,
-            stream=True
-        )
-
-        if stream_info.get("status") != "ready_for_stream":
-            raise HTTPException(
-                status_code=500,
-                detail=f"Erro ao preparar streaming: {stream_info}"
-            )
-
-        agent_instance = stream_info["agent"]
-        prompt_val = stream_info["prompt"]
+        prompt_val = request.prompt
 
         # Gerar streaming
         async def generate_real_response():
             try:
-                for chunk_data in agno_service.create_streaming_generator(agent_instance, prompt_val):
+                # Agente emprestado do pool só quando o corpo começa a ser
+                # enviado: astream_agent o devolve ao terminar
+                agent_instance = await agno_service.acreate_agent_from_db_config(
+                    agent_config=agent_config,
+                    tools_list=tools_to_use
+                )
+                async for chunk_data in agno_service.astream_agent(agent_instance, prompt_val):
                     yield f"data: {json.dumps(chunk_data)}\n\n"
 
                 logger.info(f"✅ Chat Agno real concluído: {chat_id}")
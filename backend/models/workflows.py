@@ -0,0 +1,74 @@
+# backend/models/workflows.py - Workflows visuais e suas execuções
+
+from sqlalchemy import Column, Integer, String, Text, Boolean, JSON, DateTime, Index
+from sqlalchemy.ext.declarative import declarative_base
+from datetime import datetime
+
+Base = declarative_base()
+
+
+class Workflow(Base):
+    __tablename__ = "agno_workflows"
+    __table_args__ = (
+        # Listagem paginada por usuário (ver database/migrations/003_workflow_storage_indexes.sql)
+        Index("idx_agno_workflows_user_active_created", "user_id", "is_active", "created_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False, default=1)
+    name = Column(String(255), nullable=False)
+    description = Column(Text, nullable=True)
+    flow_type = Column(String(20), default='sequential')
+    workflow_definition = Column(JSON, nullable=False, default=dict)
+    visual_definition = Column(JSON, nullable=True)
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class WorkflowExecution(Base):
+    __tablename__ = "agno_workflow_executions"
+    __table_args__ = (
+        Index("idx_agno_workflow_executions_user_created", "user_id", "created_at", "id"),
+        Index("idx_agno_workflow_executions_workflow_created", "workflow_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    workflow_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=True)
+    input_data = Column(JSON, default=dict)
+    output_data = Column(JSON, nullable=True)
+    visual_definition = Column(JSON, nullable=True)
+    execution_status = Column(String(20), nullable=False, default='queued')
+    error_message = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ExecutionStep(Base):
+    """Checkpoint de um nó (um registro por execução/nó, ver step_journal)"""
+    __tablename__ = "agno_execution_steps"
+
+    id = Column(Integer, primary_key=True, index=True)
+    execution_id = Column(Integer, nullable=False)
+    node_id = Column(String(100), nullable=False)
+    step_type = Column(String(50), nullable=True)
+    input_data = Column(JSON, nullable=True)
+    output_data = Column(JSON, nullable=True)
+    status = Column(String(20), nullable=False, default='running')
+    error_message = Column(Text, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+
+
+class WorkflowWorkerStats(Base):
+    """Métricas publicadas por cada processo de workflow_worker.py"""
+    __tablename__ = "agno_workflow_worker_stats"
+
+    worker_id = Column(String(255), primary_key=True)
+    stats = Column(JSON, nullable=False, default=dict)
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow)
@@ -6,7 +6,6 @@ from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field
 from datetime import datetime
 import json
-import asyncio
 
 try:
     from .agno_services import RealAgnoService, AGNO_AVAILABLE
@@ -26,6 +25,15 @@ except ImportError:
     from ..models.database import get_db
     from ..models.agents import Agent
 
+try:
+    from services.agent_pool import agent_pool
+    from services.agent_config_cache import agent_config_cache
+    from services.response_cache import response_cache
+except ImportError:
+    from ..services.agent_pool import agent_pool
+    from ..services.agent_config_cache import agent_config_cache
+    from ..services.response_cache import response_cache
+
 # ==================== ROUTER SEM TRAILING SLASH ISSUES ====================
 router = APIRouter(prefix="/api/agents", tags=["Agents"])
 
@@ -284,15 +292,9 @@ async def chat_with_agent(
 ):
     """Chat com um agente específico"""
     try:
-        # Verificar se agente existe
-        result = await db.execute(
-            select(Agent).where(
-                Agent.id == agent_id,
-                Agent.user_id == user_id,
-                Agent.is_active == True
-            )
-        )
-        agent = result.scalar_one_or_none()
+        # Verificar se agente existe (cache read-through com a consulta padrão,
+        # a mesma dos outros endpoints - inclui temperature)
+        agent = await agent_config_cache.load(db, agent_id, user_id, endpoint="agents.chat")
 
         if not agent:
             raise HTTPException(status_code=404, detail="Agente não encontrado")
@@ -311,18 +313,20 @@ async def chat_with_agent(
         if AGNO_AVAILABLE and real_agno_service:
             try:
                 agent_config = {
+                    "id": agent.id,
+                    "updated_at": agent.updated_at,
                     "name": agent.name,
                     "role": agent.role,
                     "model_provider": agent.model_provider,
                     "model_id": agent.model_id,
+                    "temperature": agent.temperature,
                     "instructions": agent.instructions or [],
                     "tools": tools_list,
                     "memory_enabled": agent.memory_enabled,
                     "rag_enabled": getattr(agent, "rag_enabled", False),
                     "rag_index_id": getattr(agent, "rag_index_id", None),
                 }
-                result = await asyncio.to_thread(
-                    real_agno_service.execute_agent_task,
+                result = await real_agno_service.aexecute_agent_task(
                     agent_config,
                     request.prompt,
                     tools_list,
@@ -418,6 +422,9 @@ async def update_agent(
             )
         )
         await db.commit()
+        agent_pool.invalidate_agent(agent_id)
+        agent_config_cache.invalidate(agent_id)
+        response_cache.invalidate_agent(agent_id)
 
         print(f"✅ Agente atualizado: {request.name} (ID: {agent_id})")
 
@@ -476,6 +483,9 @@ async def delete_agent(
             .values(is_active=False, updated_at=datetime.utcnow())
         )
         await db.commit()
+        agent_pool.invalidate_agent(agent_id)
+        agent_config_cache.invalidate(agent_id)
+        response_cache.invalidate_agent(agent_id)
 
         print(f"🗑️ Agente {agent.name} removido")
 
@@ -1,6 +1,6 @@
 # backend/routers/agno_routes.py
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text as sa_text
@@ -43,6 +43,15 @@ except ImportError:
             def get_real_agno_service():
                 raise HTTPException(status_code=500, detail="Agno service não disponível")
 
+try:
+    from services.agent_pool import agent_pool
+    from services.agent_config_cache import agent_config_cache
+    from services.response_cache import response_cache
+except ImportError:
+    from ..services.agent_pool import agent_pool
+    from ..services.agent_config_cache import agent_config_cache
+    from ..services.response_cache import response_cache
+
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/api/agno", tags=["Agno Tools Real"])
@@ -162,6 +171,15 @@ async def agno_health_check():
         }
 
 
+@router.get("/metrics")
+async def agno_performance_metrics():
+    """Métricas de desempenho (pool de agentes, caches)"""
+    if not AGNO_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Agno framework não disponível")
+
+    return get_real_agno_service().get_performance_metrics()
+
+
 # =============================================
 # ROTAS DE EXECUÇÃO COM BANCO EXISTENTE
 # =============================================
@@ -170,6 +188,7 @@ async def agno_health_check():
 async def execute_agent_with_real_tools(
         agent_id: int,
         request: AgentExecuteRequest,
+        http_request: Request,
         user_id: int = Depends(get_current_user),
         db: AsyncSession = Depends(get_database_session)
 ):
@@ -180,28 +199,22 @@ async def execute_agent_with_real_tools(
 
         agno_service = get_real_agno_service()
 
-        # Buscar configuração do agente no banco existente
-        query = sa_text("""
-            SELECT 
-                id, name, description, role, model_provider, model_id,
-                instructions, tools, memory_enabled, rag_enabled
-            FROM agno_agents 
-            WHERE id = :agent_id AND user_id = :user_id AND is_active = true
-        """)
-
-        result = await db.execute(query, {"agent_id": agent_id, "user_id": user_id})
-        agent_row = result.fetchone()
+        # Buscar configuração do agente (cache read-through sobre o banco existente)
+        agent_row = await agent_config_cache.load(db, agent_id, user_id, endpoint="agno.execute")
 
         if not agent_row:
             raise HTTPException(status_code=404, detail="Agente não encontrado")
 
         # Montar configuração do agente
         agent_config = {
+            "id": agent_row.id,
+            "updated_at": agent_row.updated_at,
             "name": agent_row.name,
             "description": agent_row.description,
             "role": agent_row.role,
             "model_provider": agent_row.model_provider,
             "model_id": agent_row.model_id,
+            "temperature": agent_row.temperature,
             "instructions": agent_row.instructions if isinstance(agent_row.instructions, list) else [
                 str(agent_row.instructions)]
         }
@@ -225,13 +238,30 @@ async def execute_agent_with_real_tools(
                 agno_tool = tools_mapping.get(db_tool, db_tool)
                 tools_to_use.append(agno_tool)
 
-        # Executar com serviço real
-        result = agno_service.execute_agent_task(
+        # Cache exato de respostas (opt-in por agente, apenas configurações determinísticas)
+        cache_key = None
+        cache_ttl = response_cache.ttl_for(agent_row, tools_to_use)
+        if cache_ttl is not None and not response_cache.should_bypass(http_request.headers):
+            cache_key = response_cache.make_key(
+                agent_pool.config_hash(agent_config, tools_to_use),
+                request.prompt,
+                tools_to_use
+            )
+            cached_result = response_cache.get(cache_key)
+            if cached_result is not None:
+                await _save_execution_log(db, agent_id, user_id, request.prompt, cached_result)
+                return cached_result
+
+        # Executar com serviço real sem bloquear o event loop
+        result = await agno_service.aexecute_agent_task(
             agent_config=agent_config,
             prompt=request.prompt,
-            tools_list=tools_to_use,
-            stream=request.stream
+            tools_list=tools_to_use
         )
+        result["cached"] = False
+
+        if cache_key:
+            response_cache.put(cache_key, result, cache_ttl, agent_id=agent_id)
 
         # Salvar log da execução no banco
         if result["status"] == "success":
@@ -260,26 +290,20 @@ async def execute_agent_stream_real(
         agno_service = get_real_agno_service()
 
         # Buscar configuração do agente (mesmo código acima)
-        query = sa_text("""
-            SELECT 
-                id, name, description, role, model_provider, model_id,
-                instructions, tools, memory_enabled, rag_enabled
-            FROM agno_agents 
-            WHERE id = :agent_id AND user_id = :user_id AND is_active = true
-        """)
-
-        result = await db.execute(query, {"agent_id": agent_id, "user_id": user_id})
-        agent_row = result.fetchone()
+        agent_row = await agent_config_cache.load(db, agent_id, user_id, endpoint="agno.execute_stream")
 
         if not agent_row:
             raise HTTPException(status_code=404, detail="Agente não encontrado")
 
         agent_config = {
+            "id": agent_row.id,
+            "updated_at": agent_row.updated_at,
             "name": agent_row.name,
             "description": agent_row.description,
             "role": agent_row.role,
             "model_provider": agent_row.model_provider,
             "model_id": agent_row.model_id,
+            "temperature": agent_row.temperature,
             "instructions": agent_row.instructions if isinstance(agent_row.instructions, list) else [
                 str(agent_row.instructions)]
         }
@@ -298,24 +322,12 @@ async def execute_agent_stream_real(
 
             tools_to_use = [tools_mapping.get(db_tool, db_tool) for db_tool in db_tools]
 
-        # Preparar para streaming
-        stream_result = agno_service.execute_agent_task(
-            agent_config=agent_config,
-            prompt=request.prompt,
-            tools_list=tools_to_use,
-            stream=True
-        )
-
-        if stream_result["status"] != "ready_for_stream":
-            raise HTTPException(status_code=500, detail="Erro ao preparar streaming")
-
-        agent = stream_result["agent"]
-        prompt = stream_result["prompt"]
+        prompt = request.prompt
 
         async def generate_stream():
             try:
-                # Usar o gerador de streaming real
-                for chunk_data in agno_service.create_streaming_generator(agent, prompt):
+                # Streaming real (async); streams idênticos concorrentes são coalescidos
+                async for chunk_data in agno_service.astream_agent_task(agent_config, prompt, tools_to_use):
                     yield f"data: {json.dumps(chunk_data)}\n\n"
 
                 # Salvar log após conclusão
@@ -386,6 +398,11 @@ async def update_agent_tools_real(
 
         await db.commit()
 
+        # Agentes construídos com as ferramentas antigas não podem mais ser reutilizados
+        agent_pool.invalidate_agent(agent_id)
+        agent_config_cache.invalidate(agent_id)
+        response_cache.invalidate_agent(agent_id)
+
         return {
             "status": "success",
             "message": f"Ferramentas atualizadas para agente {agent_id}",
@@ -406,13 +423,7 @@ async def get_agent_tools_real(
 ):
     """Lista ferramentas configuradas para um agente no banco existente"""
     try:
-        query = sa_text("""
-            SELECT tools FROM agno_agents 
-            WHERE id = :agent_id AND user_id = :user_id AND is_active = true
-        """)
-
-        result = await db.execute(query, {"agent_id": agent_id, "user_id": user_id})
-        agent_row = result.fetchone()
+        agent_row = await agent_config_cache.load(db, agent_id, user_id, endpoint="agno.agent_tools")
 
         if not agent_row:
             raise HTTPException(status_code=404, detail="Agente não encontrado")
@@ -614,7 +625,8 @@ async def _save_execution_log(
                         "framework": "agno_real",
                         "execution_time_ms": result.get("execution_time_ms"),
                         "tools_used": result.get("tools_used"),
-                        "model_used": result.get("model_used")
+                        "model_used": result.get("model_used"),
+                        "cached": result.get("cached", False)
                     }
                 }
             ]
@@ -3,9 +3,13 @@
 import os
 import time
 import json
+import asyncio
+import inspect
 import importlib
+import threading
 import traceback
-from typing import Dict, List, Optional, Any, Tuple
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional, Any, Tuple, AsyncGenerator
 from datetime import datetime
 from loguru import logger
 
@@ -52,6 +56,44 @@ except ImportError as e:
     logger.error(f"❌ Erro ao importar Agno: {e}")
     AGNO_AVAILABLE = False
 
+try:
+    from services.agent_pool import agent_pool
+    from services.model_clients import model_clients, supports_temperature
+    from services.tool_pool import tool_pool
+    from services.agent_config_cache import agent_config_cache
+    from services.response_cache import response_cache
+    from services.llm_governor import llm_governor
+    from services.executors import agent_executor, get_executor_stats
+    from services.single_flight import single_flight, flight_key
+    from services.supabase_async import supabase_async
+    from services.embedding_cache import embedding_cache
+except ImportError:
+    from ..services.agent_pool import agent_pool
+    from ..services.model_clients import model_clients, supports_temperature
+    from ..services.tool_pool import tool_pool
+    from ..services.agent_config_cache import agent_config_cache
+    from ..services.response_cache import response_cache
+    from ..services.llm_governor import llm_governor
+    from ..services.executors import agent_executor, get_executor_stats
+    from ..services.single_flight import single_flight, flight_key
+    from ..services.supabase_async import supabase_async
+    from ..services.embedding_cache import embedding_cache
+
+# Variável de ambiente com a API key de cada provider
+PROVIDER_API_KEY_ENV = {
+    "openai": "OPENAI_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY",
+    "groq": "GROQ_API_KEY"
+}
+
+
+# Tamanho máximo da fila da ponte de streaming síncrono (o executor limitado
+# do fallback síncrono fica em services/executors.py)
+AGNO_STREAM_QUEUE_SIZE = int(os.getenv("AGNO_STREAM_QUEUE_SIZE", "256"))
+
+# Sentinela que marca o fim do stream na ponte thread -> event loop
+_STREAM_END = object()
+
 
 class RealAgnoService:
     """Serviço REAL do Agno - integra com framework verdadeiro"""
@@ -166,23 +208,19 @@ class RealAgnoService:
         model_class = self.available_models[provider][model_id]
 
         # Configurações específicas por provider
-        model_kwargs = kwargs.copy()
+        env_var = PROVIDER_API_KEY_ENV[provider]
+        api_key = os.getenv(env_var)
+        if not api_key:
+            raise ValueError(f"{env_var} não configurada")
 
-        if provider == "openai":
-            if not os.getenv("OPENAI_API_KEY"):
-                raise ValueError("OPENAI_API_KEY não configurada")
-        elif provider == "anthropic":
-            if not os.getenv("ANTHROPIC_API_KEY"):
-                raise ValueError("ANTHROPIC_API_KEY não configurada")
-        elif provider == "groq":
-            if not os.getenv("GROQ_API_KEY"):
-                raise ValueError("GROQ_API_KEY não configurada")
+        # Clientes HTTP compartilhados (keep-alive) por (provider, api_key)
+        model_kwargs = {**model_clients.model_kwargs(provider, api_key), **kwargs}
 
         # ✅ CORREÇÃO: Usar parâmetro 'id' em vez de 'model' para todos os provedores
         return model_class(id=model_id, **model_kwargs)
 
     def create_tool_instance(self, tool_name: str, config: Dict[str, Any] = None) -> Any:
-        """Cria instância REAL de uma ferramenta"""
+        """Obtém instância REAL de uma ferramenta (reaproveitada do pool quando possível)"""
         if tool_name not in self.available_tools:
             raise ValueError(f"Ferramenta '{tool_name}' não disponível")
 
@@ -218,7 +256,7 @@ class RealAgnoService:
             }
 
         try:
-            return tool_class(**tool_config)
+            return tool_pool.get(tool_name, tool_config, lambda: tool_class(**tool_config))
         except Exception as e:
             logger.error(f"Erro ao criar ferramenta {tool_name}: {e}")
             raise
@@ -227,6 +265,26 @@ class RealAgnoService:
             self,
             agent_config: Dict[str, Any],
             tools_list: List[str] = None
+    ) -> Agent:
+        """Obtém um agente Agno REAL do pool (ou constrói um novo).
+
+        O agente fica emprestado ao chamador e deve ser devolvido com
+        `release_agent()` quando a execução terminar.
+        """
+        return agent_pool.acquire(
+            agent_config,
+            tools_list,
+            lambda: self._build_agent(agent_config, tools_list)
+        )
+
+    def release_agent(self, agent: Agent) -> None:
+        """Devolve ao pool um agente obtido via create_agent_from_db_config"""
+        agent_pool.release(agent)
+
+    def _build_agent(
+            self,
+            agent_config: Dict[str, Any],
+            tools_list: List[str] = None
     ) -> Agent:
         """Cria um agente Agno REAL baseado na configuração do banco"""
 
@@ -236,9 +294,13 @@ class RealAgnoService:
         instructions = agent_config.get("instructions", [])
         description = agent_config.get("description", "Assistente IA")
         name = agent_config.get("name", "Agente")
+        temperature = agent_config.get("temperature")
 
-        # Criar modelo
-        model = self.get_model_instance(model_provider, model_id)
+        # Criar modelo (com a temperatura do banco, quando o modelo a aceita)
+        model_kwargs = {}
+        if temperature is not None and supports_temperature(model_id):
+            model_kwargs["temperature"] = float(temperature)
+        model = self.get_model_instance(model_provider, model_id, **model_kwargs)
 
         # Criar ferramentas
         tool_instances = []
@@ -274,49 +336,167 @@ class RealAgnoService:
             self,
             agent_config: Dict[str, Any],
             prompt: str,
-            tools_list: List[str] = None,
-            stream: bool = False
+            tools_list: List[str] = None
     ) -> Dict[str, Any]:
-        """Executa uma tarefa REAL usando agente Agno"""
+        """Executa uma tarefa REAL usando agente Agno (streaming: ver astream_agent)"""
         start_time = time.time()
 
         try:
             # Criar agente real
             agent = self.create_agent_from_db_config(agent_config, tools_list)
 
-            if stream:
-                # Para streaming, retornar o agente para uso externo
-                return {
-                    "status": "ready_for_stream",
-                    "agent": agent,
-                    "prompt": prompt,
-                    "tools_count": len(tools_list) if tools_list else 0
-                }
-            else:
-                # Executar tarefa
-                logger.info(f"🚀 Executando prompt: {prompt[:100]}...")
+            # Executar tarefa
+            logger.info(f"🚀 Executando prompt: {prompt[:100]}...")
 
-                # ✅ CORREÇÃO: Usar método run() do Agno corretamente
+            # ✅ CORREÇÃO: Usar método run() do Agno corretamente
+            try:
                 response = agent.run(prompt)
-                execution_time = int((time.time() - start_time) * 1000)
+            finally:
+                self.release_agent(agent)
+            execution_time = int((time.time() - start_time) * 1000)
 
-                # Extrair conteúdo da resposta
-                if hasattr(response, 'content'):
-                    content = response.content
-                elif hasattr(response, 'messages') and response.messages:
-                    content = response.messages[-1].content
-                else:
-                    content = str(response)
+            content = self._extract_response_content(response)
 
-                logger.info(f"✅ Execução concluída em {execution_time}ms")
+            logger.info(f"✅ Execução concluída em {execution_time}ms")
 
-                return {
-                    "status": "success",
-                    "response": content,
-                    "execution_time_ms": execution_time,
-                    "tools_used": len(tools_list) if tools_list else 0,
-                    "model_used": f"{agent_config.get('model_provider')}/{agent_config.get('model_id')}"
-                }
+            return {
+                "status": "success",
+                "response": content,
+                "execution_time_ms": execution_time,
+                "tools_used": len(tools_list) if tools_list else 0,
+                "model_used": f"{agent_config.get('model_provider')}/{agent_config.get('model_id')}"
+            }
+
+        except Exception as e:
+            error_msg = str(e)
+            execution_time = int((time.time() - start_time) * 1000)
+
+            logger.error(f"❌ Erro na execução: {error_msg}")
+            logger.error(f"📍 Traceback: {traceback.format_exc()}")
+
+            return {
+                "status": "error",
+                "error": error_msg,
+                "execution_time_ms": execution_time,
+                "tools_attempted": len(tools_list) if tools_list else 0
+            }
+
+    @staticmethod
+    def _extract_response_content(response: Any) -> str:
+        """Extrai o conteúdo textual de uma resposta do Agno"""
+        if hasattr(response, 'content'):
+            return response.content
+        elif hasattr(response, 'messages') and response.messages:
+            return response.messages[-1].content
+        return str(response)
+
+    # ==================== API ASSÍNCRONA ====================
+
+    async def _run_in_executor(self, func, *args):
+        """Executa uma chamada bloqueante no executor dedicado de agentes"""
+        return await agent_executor.run(func, *args)
+
+    async def acreate_agent_from_db_config(
+            self,
+            agent_config: Dict[str, Any],
+            tools_list: List[str] = None
+    ) -> Agent:
+        """Versão assíncrona de create_agent_from_db_config (construção fora do event loop)"""
+        return await self._run_in_executor(self.create_agent_from_db_config, agent_config, tools_list)
+
+    @staticmethod
+    def _agent_provider(agent: Agent) -> str:
+        """Provider do modelo do agente (chave do governor de LLM)"""
+        provider = getattr(getattr(agent, "model", None), "provider", None) or "openai"
+        return str(provider).lower()
+
+    @staticmethod
+    def _agent_total_tokens(agent: Agent) -> Optional[int]:
+        """Total de tokens da última execução, quando o Agno reporta métricas"""
+        metrics = getattr(getattr(agent, "run_response", None), "metrics", None)
+        if not isinstance(metrics, dict):
+            return None
+        total = metrics.get("total_tokens")
+        if isinstance(total, list):
+            total = sum(v for v in total if isinstance(v, (int, float)))
+        return int(total) if isinstance(total, (int, float)) and total > 0 else None
+
+    def _governor_slot(self, agent: Agent, prompt: str):
+        """Reserva capacidade no provider do agente (concorrência + RPM/TPM)"""
+        return llm_governor.slot(
+            self._agent_provider(agent),
+            llm_governor.estimate_tokens(prompt, getattr(agent, "instructions", None))
+        )
+
+    async def _arun_agent(self, agent: Agent, prompt: str) -> Any:
+        """Executa o agente usando arun() nativo ou, na falta dele, o executor limitado"""
+        async with self._governor_slot(agent, prompt) as usage:
+            arun_method = getattr(agent, "arun", None)
+            if callable(arun_method):
+                response = arun_method(prompt)
+                if inspect.isawaitable(response):
+                    response = await response
+            else:
+                response = await self._run_in_executor(agent.run, prompt)
+
+            usage["actual_tokens"] = self._agent_total_tokens(agent)
+            return response
+
+    @staticmethod
+    def _flight_key(agent_config: Dict[str, Any], prompt: str, tools_list: List[str] = None) -> str:
+        """Chave de coalescência: (hash da configuração do agente, prompt)"""
+        return flight_key(agent_pool.config_hash(agent_config, tools_list), prompt)
+
+    async def aexecute_agent_task(
+            self,
+            agent_config: Dict[str, Any],
+            prompt: str,
+            tools_list: List[str] = None
+    ) -> Dict[str, Any]:
+        """Executa uma tarefa REAL sem bloquear o event loop.
+
+        Requisições idênticas concorrentes (mesma configuração, ferramentas e
+        prompt) compartilham uma única execução e o mesmo resultado.
+        """
+        result, shared = await single_flight.do(
+            self._flight_key(agent_config, prompt, tools_list),
+            lambda: self._aexecute_agent_task(agent_config, prompt, tools_list)
+        )
+        result = dict(result)
+        if shared:
+            result["coalesced"] = True
+        return result
+
+    async def _aexecute_agent_task(
+            self,
+            agent_config: Dict[str, Any],
+            prompt: str,
+            tools_list: List[str] = None
+    ) -> Dict[str, Any]:
+        """Execução efetiva de aexecute_agent_task"""
+        start_time = time.time()
+
+        try:
+            agent = await self.acreate_agent_from_db_config(agent_config, tools_list)
+
+            logger.info(f"🚀 Executando prompt (async): {prompt[:100]}...")
+            try:
+                response = await self._arun_agent(agent, prompt)
+            finally:
+                self.release_agent(agent)
+            execution_time = int((time.time() - start_time) * 1000)
+
+            content = self._extract_response_content(response)
+
+            logger.info(f"✅ Execução concluída em {execution_time}ms")
+
+            return {
+                "status": "success",
+                "response": content,
+                "execution_time_ms": execution_time,
+                "tools_used": len(tools_list) if tools_list else 0,
+                "model_used": f"{agent_config.get('model_provider')}/{agent_config.get('model_id')}"
+            }
 
         except Exception as e:
             error_msg = str(e)
@@ -332,6 +512,155 @@ class RealAgnoService:
                 "tools_attempted": len(tools_list) if tools_list else 0
             }
 
+    async def _bridge_sync_stream(self, agent: Agent, prompt: str) -> AsyncGenerator[Any, None]:
+        """Ponte entre o stream síncrono do Agno e o event loop.
+
+        O iterador bloqueante roda no executor limitado e publica os chunks
+        numa fila com tamanho máximo; se o consumidor parar de ler (cliente
+        desconectou), a thread produtora é liberada pelo evento de parada e
+        o gerador só termina depois que ela sai.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=AGNO_STREAM_QUEUE_SIZE)
+        stop_event = threading.Event()
+
+        def publish(item: Any) -> bool:
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            while True:
+                try:
+                    future.result(timeout=0.5)
+                    return True
+                except FutureTimeoutError:
+                    if stop_event.is_set():
+                        future.cancel()
+                        return False
+
+        def produce():
+            try:
+                response = agent.run(prompt, stream=True)
+                if hasattr(response, '__iter__') and not isinstance(response, (str, bytes)):
+                    for chunk in response:
+                        if not publish(chunk):
+                            return
+                else:
+                    publish(response)
+            except Exception as e:
+                publish(e)
+            finally:
+                publish(_STREAM_END)
+
+        producer = asyncio.wrap_future(agent_executor.submit(produce))
+
+        try:
+            while True:
+                item = await queue.get()
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop_event.set()
+            # A thread percebe a parada em até 0,5 s (ou ao fim do chunk atual);
+            # aguardá-la garante que a vaga do executor foi devolvida
+            await producer
+
+    async def astream_agent(self, agent: Agent, prompt: str) -> AsyncGenerator[Dict[str, Any], None]:
+        """Gerador assíncrono de streaming REAL.
+
+        Usa arun(stream=True) quando o Agno oferece a chamada assíncrona e,
+        caso contrário, a ponte com executor limitado e fila.
+        """
+        try:
+            logger.info(f"🔄 Iniciando streaming async para prompt: {prompt[:50]}...")
+
+            # A vaga no provider fica reservada durante todo o stream
+            async with self._governor_slot(agent, prompt) as usage:
+                arun_method = getattr(agent, "arun", None)
+                if callable(arun_method):
+                    stream = arun_method(prompt, stream=True)
+                    if inspect.isawaitable(stream):
+                        stream = await stream
+                else:
+                    stream = self._bridge_sync_stream(agent, prompt)
+
+                if hasattr(stream, '__aiter__'):
+                    async for chunk in stream:
+                        chunk_content = getattr(chunk, 'content', None)
+                        if chunk_content is None and isinstance(chunk, str):
+                            chunk_content = chunk
+                        if not chunk_content:
+                            continue
+                        yield {
+                            "type": "chunk",
+                            "content": str(chunk_content),
+                            "timestamp": datetime.utcnow().isoformat()
+                        }
+                else:
+                    # Resposta completa (sem stream disponível)
+                    content = self._extract_response_content(stream)
+                    if content:
+                        yield {
+                            "type": "chunk",
+                            "content": content,
+                            "timestamp": datetime.utcnow().isoformat()
+                        }
+
+                usage["actual_tokens"] = self._agent_total_tokens(agent)
+
+            yield {
+                "type": "done",
+                "message": "Execução concluída com sucesso"
+            }
+
+        except Exception as e:
+            logger.error(f"❌ Erro no streaming: {e}")
+            yield {
+                "type": "error",
+                "error": str(e)
+            }
+        finally:
+            self.release_agent(agent)
+
+    async def astream_agent_task(
+            self,
+            agent_config: Dict[str, Any],
+            prompt: str,
+            tools_list: List[str] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """Constrói o agente e faz streaming da resposta sem bloquear o event loop.
+
+        Streams idênticos concorrentes são coalescidos: quem chega depois
+        recebe os chunks já emitidos e em seguida a cauda ao vivo.
+        """
+        async for chunk_data in single_flight.stream(
+                self._flight_key(agent_config, prompt, tools_list),
+                lambda: self._astream_agent_task(agent_config, prompt, tools_list)
+        ):
+            yield chunk_data
+
+    async def _astream_agent_task(
+            self,
+            agent_config: Dict[str, Any],
+            prompt: str,
+            tools_list: List[str] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """Stream efetivo de astream_agent_task"""
+        try:
+            agent = await self.acreate_agent_from_db_config(agent_config, tools_list)
+        except Exception as e:
+            logger.error(f"❌ Erro ao preparar streaming: {e}")
+            yield {
+                "type": "error",
+                "error": str(e)
+            }
+            return
+
+        async for chunk_data in self.astream_agent(agent, prompt):
+            yield chunk_data
+
+    # ==================== API SÍNCRONA (LEGADO) ====================
+
     def create_streaming_generator(self, agent: Agent, prompt: str):
         """Gerador para streaming de resposta REAL.
 
@@ -403,7 +732,6 @@ class RealAgnoService:
                         "content": word + " ",
                         "progress": f"{i + 1}/{total_words}"
                     }
-                    time.sleep(0.05)  # Simular delay
             yield {
                 "type": "done",
                 "message": "Execução concluída com sucesso"
@@ -415,6 +743,8 @@ class RealAgnoService:
                 "type": "error",
                 "error": str(e)
             }
+        finally:
+            self.release_agent(agent)
 
     def get_available_tools_info(self) -> List[Dict[str, Any]]:
         """Retorna informações das ferramentas disponíveis"""
@@ -509,6 +839,13 @@ class RealAgnoService:
                 "category": tool_data["category"]
             }
 
+        # Pool de agentes construídos e pools HTTP dos providers
+        health["agent_pool"] = agent_pool.get_stats()
+        health["model_http_pools"] = model_clients.get_stats()
+        health["tool_pool"] = tool_pool.get_stats()
+        health["llm_governor"] = llm_governor.get_stats()
+        health["executors"] = get_executor_stats()
+
         # Status geral
         configured_keys = sum(health["api_keys_status"].values())
         if configured_keys >= 1 and health["available_tools"] >= 2:
@@ -520,6 +857,22 @@ class RealAgnoService:
 
         return health
 
+    def get_performance_metrics(self) -> Dict[str, Any]:
+        """Métricas de desempenho dos caches e pools do serviço"""
+        return {
+            "agent_pool": agent_pool.get_stats(),
+            "model_http_pools": model_clients.get_stats(),
+            "tool_pool": tool_pool.get_stats(),
+            "agent_config_cache": agent_config_cache.get_stats(),
+            "response_cache": response_cache.get_stats(),
+            "llm_governor": llm_governor.get_stats(),
+            "executors": get_executor_stats(),
+            "single_flight": single_flight.get_stats(),
+            "supabase": supabase_async.get_stats(),
+            "embedding_cache": embedding_cache.get_stats(),
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
 
 # Instância global do serviço
 agno_service = None
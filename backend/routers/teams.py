@@ -1,12 +1,16 @@
 # backend/routers/teams.py - VERSÃO CORRIGIDA SEM 307 REDIRECTS
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, insert, update, delete, func
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from pydantic import BaseModel, Field
 from datetime import datetime
+import os
 import json
+import time
 import asyncio
+import contextlib
 
 try:
     from .agno_services import RealAgnoService, AGNO_AVAILABLE
@@ -26,9 +30,24 @@ except ImportError:
     from ..models.database import get_db
     from ..models.agents import Agent, Team, TeamAgent
 
+try:
+    from services.team_loader import load_teams_with_agents, count_active_teams, TEAM_LIST_DEFAULT_LIMIT, TEAM_LIST_MAX_LIMIT
+except ImportError:
+    from ..services.team_loader import load_teams_with_agents, count_active_teams, TEAM_LIST_DEFAULT_LIMIT, TEAM_LIST_MAX_LIMIT
+
 # ==================== ROUTER SEM TRAILING SLASH ISSUES ====================
 router = APIRouter(prefix="/api/teams", tags=["Teams"])
 
+# Execução de teams: tipos que dependem da ordem rodam em sequência,
+# os demais disparam todos os membros em paralelo (com limite)
+SEQUENTIAL_TEAM_TYPES = {"sequential", "hierarchical"}
+TEAM_MAX_PARALLEL_AGENTS = int(os.getenv("TEAM_MAX_PARALLEL_AGENTS", "5"))
+TEAM_AGENT_TIMEOUT_S = float(os.getenv("TEAM_AGENT_TIMEOUT_S", "120"))
+TEAM_STREAM_QUEUE_SIZE = int(os.getenv("TEAM_STREAM_QUEUE_SIZE", "512"))
+
+# Sentinela de fim do stream multiplexado
+_TEAM_STREAM_END = object()
+
 # ==================== MODELOS PYDANTIC ====================
 
 class AgentInTeamRequest(BaseModel):
@@ -62,105 +81,181 @@ class TeamResponse(BaseModel):
 
 # ==================== HELPER FUNCTIONS ====================
 
-async def get_team_with_agents(db: AsyncSession, team_id: int, user_id: int = 1) -> Optional[Dict[str, Any]]:
-    """Busca team com todos os agentes"""
+def build_member_agent_config(agent_info: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """Monta a configuração de execução de um membro do team"""
+    tools_list = [
+        t["tool_id"] if isinstance(t, dict) else str(t)
+        for t in (agent_info.get("tools") or [])
+    ]
+    agent_config = {
+        "id": agent_info["id"],
+        "updated_at": agent_info.get("updated_at"),
+        "name": agent_info["name"],
+        "role": agent_info["role"],
+        "model_provider": agent_info["model_provider"],
+        "model_id": agent_info["model_id"],
+        "instructions": agent_info.get("instructions", []),
+        "tools": tools_list,
+        "memory_enabled": agent_info.get("memory_enabled", False),
+        "rag_enabled": agent_info.get("rag_enabled", False),
+        "rag_index_id": agent_info.get("rag_index_id"),
+    }
+    return agent_config, tools_list
+
+
+def resolve_team_execution_settings(team_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Modo de execução (parallel/sequential), concorrência e timeout do team"""
+    team_config = team_data.get("team_configuration") or {}
+    mode = team_config.get("execution_mode")
+    if mode not in ("parallel", "sequential"):
+        mode = "sequential" if team_data.get("team_type") in SEQUENTIAL_TEAM_TYPES else "parallel"
+
+    return {
+        "mode": mode,
+        "max_parallel": max(1, int(team_config.get("max_parallel_agents", TEAM_MAX_PARALLEL_AGENTS))),
+        "agent_timeout_s": float(team_config.get("agent_timeout_s", TEAM_AGENT_TIMEOUT_S))
+    }
+
+
+async def run_team_member(agent_info: Dict[str, Any], message: str, timeout_s: float) -> Dict[str, Any]:
+    """Executa um membro do team com timeout e mede a duração"""
+    agent_config, tools_list = build_member_agent_config(agent_info)
+    start = time.perf_counter()
     try:
-        # Buscar team
-        result = await db.execute(
-            select(Team).where(
-                Team.id == team_id,
-                Team.user_id == user_id,
-                Team.is_active == True
-            )
+        result = await asyncio.wait_for(
+            real_agno_service.aexecute_agent_task(agent_config, message, tools_list),
+            timeout=timeout_s
         )
-        team = result.scalar_one_or_none()
+        entry = {
+            "agent": agent_info["name"],
+            "agent_id": agent_info["id"],
+            "status": "success" if result.get("status") == "success" else "error",
+        }
+        if entry["status"] == "success":
+            entry["response"] = result.get("response", "")
+        else:
+            entry["error"] = result.get("error", "Erro desconhecido")
+    except asyncio.TimeoutError:
+        print(f"⏱️ Agente {agent_info['name']} excedeu {timeout_s}s")
+        entry = {
+            "agent": agent_info["name"],
+            "agent_id": agent_info["id"],
+            "status": "timeout",
+            "error": f"Tempo limite de {timeout_s}s excedido"
+        }
+    except Exception as e:
+        print(f"⚠️ Falha na execução do agente {agent_info['name']}: {e}")
+        entry = {
+            "agent": agent_info["name"],
+            "agent_id": agent_info["id"],
+            "status": "error",
+            "error": str(e)
+        }
 
-        if not team:
-            return None
+    entry["duration_ms"] = int((time.perf_counter() - start) * 1000)
+    return entry
 
-        # Buscar team_agents com dados dos agentes
-        result = await db.execute(
-            select(TeamAgent, Agent)
-            .join(Agent, TeamAgent.agent_id == Agent.id)
-            .where(
-                TeamAgent.team_id == team_id,
-                TeamAgent.is_active == True,
-                Agent.is_active == True
-            )
-            .order_by(TeamAgent.priority.asc())
-        )
-        team_agents = result.all()
-
-        # Processar agentes
-        agents_data = []
-        for team_agent, agent in team_agents:
-            # Processar configuração do agente no team
-            agent_config = {}
-            if team_agent.agent_config:
-                if isinstance(team_agent.agent_config, str):
-                    try:
-                        agent_config = json.loads(team_agent.agent_config)
-                    except:
-                        agent_config = {}
-                elif isinstance(team_agent.agent_config, dict):
-                    agent_config = team_agent.agent_config
-
-            # Processar instruções do agente
-            instructions = agent.instructions if agent.instructions else []
-            if isinstance(instructions, str):
-                try:
-                    instructions = json.loads(instructions)
-                except:
-                    instructions = [instructions]
-
-            # Processar tools do agente
-            tools = agent.tools if agent.tools else []
-            if isinstance(tools, str):
-                try:
-                    tools = json.loads(tools)
-                except:
-                    tools = []
-            if isinstance(tools, list):
-                tools = [
-                    t if isinstance(t, dict) else {"tool_id": str(t), "config": {}}
-                    for t in tools
-                ]
-            agent_data = {
-                "id": agent.id,
-                "name": agent.name,
-                "role": agent.role,
-                "description": agent.description or "",
-                "model_provider": agent.model_provider,
-                "model_id": agent.model_id,
-                "instructions": instructions,
-                "tools": tools,
-                "role_in_team": team_agent.role_in_team,
-                "priority": team_agent.priority,
-                "config": agent_config
-            }
-            agents_data.append(agent_data)
 
-        # Processar configuração do team
-        team_config = team.team_configuration if team.team_configuration else {}
-        if isinstance(team_config, str):
-            try:
-                team_config = json.loads(team_config)
-            except:
-                team_config = {}
+def team_status(responses: List[Dict[str, Any]]) -> str:
+    """completed (todos ok), partial (alguns ok) ou failed (nenhum ok)"""
+    succeeded = sum(1 for r in responses if r["status"] == "success")
+    if succeeded == len(responses):
+        return "completed"
+    return "partial" if succeeded else "failed"
 
-        return {
-            "id": team.id,
-            "name": team.name,
-            "description": team.description or "",
-            "team_type": team.team_type,
-            "supervisor_agent_id": team.supervisor_agent_id,
-            "team_configuration": team_config,
-            "is_active": team.is_active,
-            "created_at": team.created_at,
-            "updated_at": team.updated_at,
-            "agents": agents_data,
-            "agent_count": len(agents_data)
-        }
+
+async def stream_team_member(
+        agent_info: Dict[str, Any],
+        message: str,
+        queue: asyncio.Queue,
+        timeout_s: float
+) -> Dict[str, Any]:
+    """Repassa os chunks de um membro para a fila do team, marcados com o agent_id.
+
+    O timeout vale para o agente: o tempo bloqueado em `queue.put` (cliente
+    lento consumindo o SSE) não conta contra o prazo.
+    """
+    agent_config, tools_list = build_member_agent_config(agent_info)
+    tag = {"agent_id": agent_info["id"], "agent": agent_info["name"]}
+    start = time.perf_counter()
+    first_token_ms = None
+    parts: List[str] = []
+    status, error = "success", None
+
+    try:
+        async with asyncio.timeout(timeout_s) as deadline:
+            async for chunk in real_agno_service.astream_agent_task(agent_config, message, tools_list):
+                if chunk.get("type") == "chunk":
+                    if first_token_ms is None:
+                        first_token_ms = int((time.perf_counter() - start) * 1000)
+                    parts.append(chunk.get("content", ""))
+
+                    # Backpressure do consumidor: prazo suspenso e estendido pelo tempo bloqueado
+                    when = deadline.when()
+                    deadline.reschedule(None)
+                    blocked_since = asyncio.get_running_loop().time()
+                    await queue.put({**chunk, **tag})
+                    deadline.reschedule(when + (asyncio.get_running_loop().time() - blocked_since))
+                elif chunk.get("type") == "error":
+                    status, error = "error", chunk.get("error")
+    except TimeoutError:
+        status, error = "timeout", f"Tempo limite de {timeout_s}s excedido"
+    except Exception as e:
+        print(f"⚠️ Falha no streaming do agente {agent_info['name']}: {e}")
+        status, error = "error", str(e)
+
+    summary = {
+        **tag,
+        "status": status,
+        "response": "".join(parts),
+        "duration_ms": int((time.perf_counter() - start) * 1000),
+        "time_to_first_token_ms": first_token_ms
+    }
+    if error:
+        summary["error"] = error
+
+    await queue.put({"type": "agent_done", **summary})
+    return summary
+
+
+async def run_team_members(team_data: Dict[str, Any], message: str) -> Dict[str, Any]:
+    """Executa os membros do team em paralelo (limitado) ou em sequência"""
+    settings = resolve_team_execution_settings(team_data)
+    agents = team_data["agents"]
+    start = time.perf_counter()
+
+    if settings["mode"] == "parallel":
+        semaphore = asyncio.Semaphore(settings["max_parallel"])
+
+        async def bounded(agent_info: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                return await run_team_member(agent_info, message, settings["agent_timeout_s"])
+
+        # gather preserva a ordem (prioridade) dos membros na resposta
+        responses = list(await asyncio.gather(*(bounded(a) for a in agents)))
+    else:
+        responses = []
+        for agent_info in agents:
+            responses.append(await run_team_member(agent_info, message, settings["agent_timeout_s"]))
+
+    succeeded = sum(1 for r in responses if r["status"] == "success")
+
+    return {
+        "responses": responses,
+        "status": team_status(responses),
+        "execution_mode": settings["mode"],
+        "max_parallel_agents": settings["max_parallel"] if settings["mode"] == "parallel" else 1,
+        "wall_clock_ms": int((time.perf_counter() - start) * 1000),
+        "agents_succeeded": succeeded,
+        "agents_failed": len(responses) - succeeded
+    }
+
+
+async def get_team_with_agents(db: AsyncSession, team_id: int, user_id: int = 1) -> Optional[Dict[str, Any]]:
+    """Busca team com todos os agentes"""
+    try:
+        teams = await load_teams_with_agents(db, user_id, team_ids=[team_id])
+        return teams[0] if teams else None
 
     except Exception as e:
         print(f"❌ Erro ao buscar team {team_id}: {e}")
@@ -170,25 +265,26 @@ async def get_team_with_agents(db: AsyncSession, team_id: int, user_id: int = 1)
 
 @router.get("", response_model=List[TeamResponse])
 async def list_teams(
+    response: Response,
     user_id: int = Query(1, description="ID do usuário"),
+    limit: int = Query(TEAM_LIST_DEFAULT_LIMIT, ge=1, le=TEAM_LIST_MAX_LIMIT, description="Teams por página"),
+    offset: int = Query(0, ge=0, description="Deslocamento da página"),
     db: AsyncSession = Depends(get_db)
 ):
-    """Lista todos os teams do usuário - SEM TRAILING SLASH"""
+    """Lista os teams do usuário, paginados - SEM TRAILING SLASH
+
+    `X-Total-Count` traz o total de teams ativos e `X-Next-Offset` o offset
+    da próxima página (ausente na última), para o cliente saber que há mais.
+    """
     try:
-        # Buscar teams ativos do usuário
-        result = await db.execute(
-            select(Team)
-            .where(Team.user_id == user_id, Team.is_active == True)
-            .order_by(Team.created_at.desc())
-        )
-        teams = result.scalars().all()
+        # Teams + membros em lote (número fixo de consultas por página)
+        teams = await load_teams_with_agents(db, user_id, limit=limit, offset=offset)
+        teams_response = [TeamResponse(**team_data) for team_data in teams]
 
-        # Buscar dados completos para cada team
-        teams_response = []
-        for team in teams:
-            team_data = await get_team_with_agents(db, team.id, user_id)
-            if team_data:
-                teams_response.append(TeamResponse(**team_data))
+        total = await count_active_teams(db, user_id)
+        response.headers["X-Total-Count"] = str(total)
+        if offset + len(teams_response) < total:
+            response.headers["X-Next-Offset"] = str(offset + len(teams_response))
 
         print(f"📋 Listados {len(teams_response)} teams para usuário {user_id}")
         return teams_response
@@ -318,49 +414,15 @@ async def execute_team(
         print(f"🚀 Executando team: {team_data['name']} com {len(team_data['agents'])} agentes")
 
         if AGNO_AVAILABLE and real_agno_service:
-            responses = []
-            for agent_info in team_data["agents"]:
-                tools_list = [
-                    t["tool_id"] if isinstance(t, dict) else str(t)
-                    for t in (agent_info.get("tools") or [])
-                ]
-                agent_config = {
-                    "name": agent_info["name"],
-                    "role": agent_info["role"],
-                    "model_provider": agent_info["model_provider"],
-                    "model_id": agent_info["model_id"],
-                    "instructions": agent_info.get("instructions", []),
-                    "tools": tools_list,
-                    "memory_enabled": getattr(agent_info, "memory_enabled", False),
-                    "rag_enabled": getattr(agent_info, "rag_enabled", False),
-                    "rag_index_id": getattr(agent_info, "rag_index_id", None),
-                }
-                try:
-                    result = await asyncio.to_thread(
-                        real_agno_service.execute_agent_task,
-                        agent_config,
-                        request.message,
-                        tools_list,
-                    )
-                    responses.append({
-                        "agent": agent_info["name"],
-                        "response": result.get("response", "")
-                    })
-                    print(responses)
-                except Exception as e:
-                    print(f"⚠️ Falha na execução do agente {agent_info['name']}: {e}")
-                    responses.append({
-                        "agent": agent_info["name"],
-                        "error": str(e)
-                    })
+            team_run = await run_team_members(team_data, request.message)
+            print(f"✅ Team {team_data['name']}: {team_run['status']} em {team_run['wall_clock_ms']}ms ({team_run['execution_mode']})")
 
             execution_result = {
                 "team_id": team_id,
                 "team_name": team_data["name"],
                 "message": request.message,
-                "responses": responses,
+                **team_run,
                 "timestamp": datetime.utcnow().isoformat(),
-                "status": "completed",
                 "context": request.context,
             }
         else:
@@ -390,6 +452,106 @@ async def execute_team(
         print(f"❌ Erro na execução do team {team_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Erro na execução: {str(e)}")
 
+@router.post("/{team_id}/execute/stream")
+async def execute_team_stream(
+    team_id: int,
+    request: TeamExecuteRequest,
+    user_id: int = Query(1, description="ID do usuário"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Executa um team multiplexando o streaming de todos os agentes numa conexão SSE"""
+    if not (AGNO_AVAILABLE and real_agno_service):
+        raise HTTPException(status_code=503, detail="Agno framework não disponível")
+
+    team_data = await get_team_with_agents(db, team_id, user_id)
+    if not team_data:
+        raise HTTPException(status_code=404, detail=f"Team {team_id} não encontrado")
+
+    settings = resolve_team_execution_settings(team_data)
+    agents = team_data["agents"]
+
+    async def run_members(queue: asyncio.Queue) -> List[Dict[str, Any]]:
+        try:
+            if settings["mode"] == "parallel":
+                semaphore = asyncio.Semaphore(settings["max_parallel"])
+
+                async def bounded(agent_info: Dict[str, Any]) -> Dict[str, Any]:
+                    async with semaphore:
+                        return await stream_team_member(agent_info, request.message, queue, settings["agent_timeout_s"])
+
+                return list(await asyncio.gather(*(bounded(a) for a in agents)))
+
+            summaries = []
+            for agent_info in agents:
+                summaries.append(
+                    await stream_team_member(agent_info, request.message, queue, settings["agent_timeout_s"])
+                )
+            return summaries
+        finally:
+            # Sem bloquear: o consumidor pode já ter saído com a fila cheia;
+            # se a marca não couber, ele detecta o fim pelo término do runner
+            with contextlib.suppress(asyncio.QueueFull):
+                queue.put_nowait(_TEAM_STREAM_END)
+
+    async def generate_team_stream():
+        queue: asyncio.Queue = asyncio.Queue(maxsize=TEAM_STREAM_QUEUE_SIZE)
+        start = time.perf_counter()
+        runner = asyncio.create_task(run_members(queue))
+
+        try:
+            start_event = {
+                "type": "team_start",
+                "team_id": team_id,
+                "team_name": team_data["name"],
+                "execution_mode": settings["mode"],
+                "agents": [{"agent_id": a["id"], "agent": a["name"]} for a in agents]
+            }
+            yield f"data: {json.dumps(start_event)}\n\n"
+
+            while True:
+                if runner.done() and queue.empty():
+                    break
+                getter = asyncio.ensure_future(queue.get())
+                await asyncio.wait({getter, runner}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    continue
+                event = getter.result()
+                if event is _TEAM_STREAM_END:
+                    break
+                yield f"data: {json.dumps(event, default=str)}\n\n"
+
+            responses = await runner
+            final_event = {
+                "type": "team_done",
+                "team_id": team_id,
+                "team_name": team_data["name"],
+                "status": team_status(responses),
+                "execution_mode": settings["mode"],
+                "wall_clock_ms": int((time.perf_counter() - start) * 1000),
+                "responses": responses,
+                "timestamp": datetime.utcnow().isoformat()
+            }
+            yield f"data: {json.dumps(final_event, default=str)}\n\n"
+
+        except Exception as e:
+            print(f"❌ Erro no streaming do team {team_id}: {e}")
+            yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+        finally:
+            # Cliente desconectou: interromper os agentes ainda em execução
+            if not runner.done():
+                runner.cancel()
+
+    return StreamingResponse(
+        generate_team_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Team-ID": str(team_id)
+        }
+    )
+
 @router.put("/{team_id}", response_model=TeamResponse)
 async def update_team(
     team_id: int,
@@ -1,18 +1,23 @@
 # backend/routers/workflow_team_router.py - VERSÃO CORRIGIDA COMPLETA
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, insert, update, delete, func, desc
+from sqlalchemy import select, insert, update, delete, func, tuple_
+import base64
 import json
-import uuid
 
 import sys
 import os
 from models.database import get_db
 from models.agents import Agent, Team, TeamAgent
+from models.workflows import Workflow, WorkflowExecution, ExecutionStep, WorkflowWorkerStats
+from services.workflow_cache import workflow_cache
+from services.team_loader import load_teams_with_agents, TEAM_LIST_DEFAULT_LIMIT, TEAM_LIST_MAX_LIMIT
+from services.workflow_dag import WorkflowGraph, WorkflowGraphError
+from services.workflow_queue import workflow_queue
 
 router = APIRouter(tags=["Workflow & Team Builder"])
 
@@ -66,12 +71,6 @@ class WorkflowFromTemplateRequest(BaseModel):
     customizations: Optional[Dict[str, Any]] = None
 
 
-# ==================== STORAGE EM MEMÓRIA (TEMPORÁRIO) ====================
-WORKFLOWS_STORAGE = {}
-TEAMS_STORAGE = {}
-EXECUTIONS_STORAGE = {}
-
-
 def get_mock_user_id() -> int:
     """Retorna user_id mock para desenvolvimento"""
     return 1
@@ -80,58 +79,37 @@ def get_mock_user_id() -> int:
 # ==================== TEAMS ENDPOINTS CORRIGIDOS ====================
 
 @router.get("/teams", response_model=List[Dict])
-async def list_teams(user_id: int = 1, db: AsyncSession = Depends(get_db)):
+async def list_teams(
+        user_id: int = 1,
+        limit: int = Query(TEAM_LIST_DEFAULT_LIMIT, ge=1, le=TEAM_LIST_MAX_LIMIT),
+        offset: int = Query(0, ge=0),
+        db: AsyncSession = Depends(get_db)
+):
     """Lista todos os teams do usuário - VERSÃO CORRIGIDA"""
     try:
-        # Query simples sem relacionamentos problemáticos
-        result = await db.execute(
-            select(Team)
-            .where(Team.user_id == user_id, Team.is_active == True)
-            .order_by(desc(Team.created_at))
-        )
-        teams = result.scalars().all()
+        # Teams + membros em lote (número fixo de consultas por página)
+        teams = await load_teams_with_agents(db, user_id, limit=limit, offset=offset)
 
-        # Buscar dados dos agentes para cada team
         teams_list = []
         for team in teams:
-            # Buscar team_agents
-            team_agents_result = await db.execute(
-                select(TeamAgent).where(
-                    TeamAgent.team_id == team.id,
-                    TeamAgent.is_active == True
-                )
-            )
-            team_agents = team_agents_result.scalars().all()
-
-            # Buscar dados dos agentes
-            agents_data = []
-            if team_agents:
-                agent_ids = [ta.agent_id for ta in team_agents]
-                agents_result = await db.execute(
-                    select(Agent).where(Agent.id.in_(agent_ids), Agent.is_active == True)
-                )
-                agents = {agent.id: agent for agent in agents_result.scalars().all()}
-
-                for ta in team_agents:
-                    if ta.agent_id in agents:
-                        agent = agents[ta.agent_id]
-                        agent_data = {
-                            "id": agent.id,
-                            "name": agent.name,
-                            "role": agent.role,
-                            "role_in_team": ta.role_in_team,
-                            "priority": ta.priority
-                        }
-                        agents_data.append(agent_data)
-
+            agents_data = [
+                {
+                    "id": agent["id"],
+                    "name": agent["name"],
+                    "role": agent["role"],
+                    "role_in_team": agent["role_in_team"],
+                    "priority": agent["priority"]
+                }
+                for agent in team["agents"]
+            ]
             team_dict = {
-                "id": team.id,
-                "name": team.name,
-                "description": team.description,
-                "team_type": team.team_type,
-                "is_active": team.is_active,
-                "created_at": team.created_at.isoformat() if team.created_at else None,
-                "updated_at": team.updated_at.isoformat() if team.updated_at else None,
+                "id": team["id"],
+                "name": team["name"],
+                "description": team["description"],
+                "team_type": team["team_type"],
+                "is_active": team["is_active"],
+                "created_at": team["created_at"].isoformat() if team["created_at"] else None,
+                "updated_at": team["updated_at"].isoformat() if team["updated_at"] else None,
                 "agents": agents_data,
                 "agent_count": len(agents_data)
             }
@@ -215,6 +193,123 @@ async def get_team(team_id: int, user_id: int = 1, db: AsyncSession = Depends(ge
 
 # ==================== WORKFLOWS ENDPOINTS ====================
 
+WORKFLOW_LIST_DEFAULT_LIMIT = 50
+WORKFLOW_LIST_MAX_LIMIT = 200
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Cursor opaco da paginação keyset: (created_at, id) do último item"""
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def validate_visual_definition(definition: Any) -> Dict[str, Any]:
+    """Valida a definição visual antes de enfileirar (400 se inválida).
+
+    Mesmas regras do worker: um nó de início, ao menos um de fim, conexões
+    entre nós existentes e nenhum ciclo.
+    """
+    if isinstance(definition, str):
+        try:
+            definition = json.loads(definition)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Definição do workflow não é um JSON válido")
+    if not isinstance(definition, dict):
+        raise HTTPException(status_code=400, detail="Workflow sem definição visual")
+
+    nodes = definition.get("nodes") or []
+    if len([n for n in nodes if n.get("type") == "start"]) != 1:
+        raise HTTPException(status_code=400, detail="Workflow deve ter exatamente um nó de início")
+    if not any(n.get("type") == "end" for n in nodes):
+        raise HTTPException(status_code=400, detail="Workflow deve ter pelo menos um nó de fim")
+
+    try:
+        WorkflowGraph(nodes, definition.get("connections") or [])
+    except WorkflowGraphError as e:
+        raise HTTPException(status_code=400, detail=f"Workflow inválido: {e}")
+    return definition
+
+
+def serialize_workflow(workflow: Workflow) -> Dict[str, Any]:
+    definition = workflow.visual_definition or workflow.workflow_definition or {}
+    return {
+        "id": workflow.id,
+        "name": workflow.name,
+        "description": workflow.description,
+        "user_id": workflow.user_id,
+        "workflow_type": workflow.flow_type,
+        "nodes": definition.get("nodes", []),
+        "connections": definition.get("connections", []),
+        "metadata": definition.get("metadata", {}),
+        "is_active": workflow.is_active,
+        "created_at": workflow.created_at.isoformat() if workflow.created_at else None,
+        "updated_at": workflow.updated_at.isoformat() if workflow.updated_at else None
+    }
+
+
+def serialize_execution(execution: WorkflowExecution) -> Dict[str, Any]:
+    return {
+        "id": execution.id,
+        "workflow_id": execution.workflow_id,
+        "status": execution.execution_status,
+        "input_data": execution.input_data,
+        "output_data": execution.output_data,
+        "error_message": execution.error_message,
+        "attempts": execution.attempts,
+        "started_at": execution.started_at.isoformat() if execution.started_at else None,
+        "completed_at": execution.completed_at.isoformat() if execution.completed_at else None,
+        "created_at": execution.created_at.isoformat() if execution.created_at else None
+    }
+
+
+async def save_workflow(
+        db: AsyncSession,
+        user_id: int,
+        name: str,
+        description: str,
+        flow_type: str,
+        visual_definition: Dict[str, Any]
+) -> Workflow:
+    workflow = Workflow(
+        user_id=user_id,
+        name=name,
+        description=description,
+        flow_type=flow_type,
+        workflow_definition=visual_definition,
+        visual_definition=visual_definition,
+        is_active=True
+    )
+    db.add(workflow)
+    await db.commit()
+    await db.refresh(workflow)
+    workflow_cache.invalidate_user(user_id)
+    return workflow
+
+
+async def get_user_workflow(db: AsyncSession, workflow_id: int, user_id: int) -> Workflow:
+    result = await db.execute(
+        select(Workflow).where(
+            Workflow.id == workflow_id,
+            Workflow.user_id == user_id,
+            Workflow.is_active == True
+        )
+    )
+    workflow = result.scalar_one_or_none()
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow não encontrado")
+    return workflow
+
+
 @router.post("/workflows/visual", response_model=Dict[str, str])
 async def create_visual_workflow(
         workflow_request: VisualWorkflowRequest,
@@ -222,82 +317,71 @@ async def create_visual_workflow(
 ):
     """Cria um workflow visual"""
     try:
-        workflow_id = str(uuid.uuid4())
-        user_id = get_mock_user_id()
-
-        workflow_data = {
-            "id": workflow_id,
-            "name": workflow_request.name,
-            "description": workflow_request.description,
-            "user_id": user_id,
-            "workflow_type": "visual",
-            "nodes": [node.dict() for node in workflow_request.nodes],
-            "connections": [conn.dict() for conn in workflow_request.connections],
-            "metadata": workflow_request.metadata,
-            "is_active": True,
-            "created_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat()
-        }
-
-        WORKFLOWS_STORAGE[workflow_id] = workflow_data
-        return {"workflow_id": workflow_id, "message": "Workflow criado com sucesso"}
+        workflow = await save_workflow(
+            db,
+            get_mock_user_id(),
+            workflow_request.name,
+            workflow_request.description,
+            "visual",
+            {
+                "nodes": [node.dict() for node in workflow_request.nodes],
+                "connections": [conn.dict() for conn in workflow_request.connections],
+                "metadata": workflow_request.metadata
+            }
+        )
+        return {"workflow_id": str(workflow.id), "message": "Workflow criado com sucesso"}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/workflows", response_model=List[Dict])
-async def list_workflows(user_id: int = 1, db: AsyncSession = Depends(get_db)):
-    """Lista todos os workflows do usuário"""
+async def list_workflows(
+        response: Response,
+        user_id: int = 1,
+        limit: int = Query(WORKFLOW_LIST_DEFAULT_LIMIT, ge=1, le=WORKFLOW_LIST_MAX_LIMIT),
+        cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor da página anterior"),
+        db: AsyncSession = Depends(get_db)
+):
+    """Lista os workflows do usuário (paginação keyset por created_at/id)"""
     try:
-        workflows_list = []
-
-        # Adicionar workflows de exemplo se storage estiver vazio
-        if not WORKFLOWS_STORAGE:
-            example_workflows = [
-                {
-                    "id": "example_workflow_1",
-                    "name": "Workflow de Análise",
-                    "description": "Análise automática de dados",
-                    "user_id": user_id,
-                    "workflow_type": "visual",
-                    "nodes": [
-                        {"id": "start", "type": "start", "name": "Início"},
-                        {"id": "agent1", "type": "agent", "name": "Agente Analista"}
-                    ],
-                    "connections": [{"from_node": "start", "to_node": "agent1"}],
-                    "metadata": {"version": "1.0"},
-                    "is_active": True,
-                    "created_at": datetime.utcnow().isoformat(),
-                    "updated_at": datetime.utcnow().isoformat()
-                }
-            ]
-
-            for workflow in example_workflows:
-                WORKFLOWS_STORAGE[workflow["id"]] = workflow
-
-        # Retornar workflows ativos do usuário
-        for workflow_id, workflow_data in WORKFLOWS_STORAGE.items():
-            if workflow_data.get("user_id") == user_id and workflow_data.get("is_active", True):
-                workflows_list.append(workflow_data)
-
+        cached = workflow_cache.get(user_id, ("list", cursor, limit))
+        if cached is None:
+            query = (
+                select(Workflow)
+                .where(Workflow.user_id == user_id, Workflow.is_active == True)
+                .order_by(Workflow.created_at.desc(), Workflow.id.desc())
+                .limit(limit + 1)
+            )
+            if cursor:
+                created_at, row_id = decode_cursor(cursor)
+                query = query.where(tuple_(Workflow.created_at, Workflow.id) < tuple_(created_at, row_id))
+
+            rows = (await db.execute(query)).scalars().all()
+            page = rows[:limit]
+            next_cursor = encode_cursor(page[-1].created_at, page[-1].id) if len(rows) > limit else None
+            cached = ([serialize_workflow(w) for w in page], next_cursor)
+            workflow_cache.put(user_id, ("list", cursor, limit), cached)
+
+        workflows_list, next_cursor = cached
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
         return workflows_list
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/workflows/{workflow_id}", response_model=Dict)
-async def get_workflow(workflow_id: str, user_id: int = 1, db: AsyncSession = Depends(get_db)):
+async def get_workflow(workflow_id: int, user_id: int = 1, db: AsyncSession = Depends(get_db)):
     """Busca detalhes de um workflow específico"""
     try:
-        if workflow_id not in WORKFLOWS_STORAGE:
-            raise HTTPException(status_code=404, detail="Workflow não encontrado")
-
-        workflow_data = WORKFLOWS_STORAGE[workflow_id]
-
-        if workflow_data.get("user_id") != user_id:
-            raise HTTPException(status_code=404, detail="Workflow não encontrado")
+        workflow_data = workflow_cache.get(user_id, ("detail", workflow_id))
+        if workflow_data is None:
+            workflow_data = serialize_workflow(await get_user_workflow(db, workflow_id, user_id))
+            workflow_cache.put(user_id, ("detail", workflow_id), workflow_data)
 
         return workflow_data
 
@@ -309,27 +393,22 @@ async def get_workflow(workflow_id: str, user_id: int = 1, db: AsyncSession = De
 
 @router.post("/workflows/{workflow_id}/execute", response_model=Dict[str, str])
 async def execute_workflow(
-        workflow_id: str,
+        workflow_id: int,
         execution_request: WorkflowExecutionRequest,
-        background_tasks: BackgroundTasks,
         db: AsyncSession = Depends(get_db)
 ):
-    """Executa um workflow visual"""
+    """Enfileira a execução de um workflow visual (processada por workflow_worker.py)"""
     try:
-        if workflow_id not in WORKFLOWS_STORAGE:
-            raise HTTPException(status_code=404, detail="Workflow não encontrado")
-
-        workflow_data = WORKFLOWS_STORAGE[workflow_id]
-        execution_id = str(uuid.uuid4())
-
-        # Simular execução
-        EXECUTIONS_STORAGE[execution_id] = {
-            "id": execution_id,
-            "workflow_id": workflow_id,
-            "status": "running",
-            "input_data": execution_request.input_data,
-            "started_at": datetime.utcnow().isoformat()
-        }
+        user_id = get_mock_user_id()
+        workflow = await get_user_workflow(db, workflow_id, user_id)
+
+        # Definição inválida falha aqui (400), não como execução 'failed' no worker
+        definition = validate_visual_definition(workflow.visual_definition or workflow.workflow_definition)
+
+        # Única porta de entrada da fila (max_attempts e métricas da fila)
+        execution_id = await workflow_queue.enqueue(
+            workflow.id, user_id, execution_request.input_data, definition
+        )
 
         return {
             "execution_id": execution_id,
@@ -342,50 +421,150 @@ async def execute_workflow(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/workflows/executions/{execution_id}/resume", response_model=Dict[str, Any])
+async def resume_workflow_execution(execution_id: int, db: AsyncSession = Depends(get_db)):
+    """Retoma uma execução que falhou a partir do nó com falha.
+
+    A execução volta para a fila; o worker reaproveita as saídas dos nós já
+    concluídos (checkpoints em agno_execution_steps) e só executa o nó que
+    falhou e os que dependem dele.
+    """
+    try:
+        user_id = get_mock_user_id()
+        result = await db.execute(
+            update(WorkflowExecution)
+            .where(
+                WorkflowExecution.id == execution_id,
+                WorkflowExecution.user_id == user_id,
+                WorkflowExecution.execution_status == 'failed'
+            )
+            .values(
+                execution_status='queued',
+                attempts=0,
+                error_message=None,
+                available_at=datetime.utcnow(),
+                completed_at=None
+            )
+            .returning(WorkflowExecution.id)
+        )
+        if result.scalar_one_or_none() is None:
+            await db.rollback()
+            exists = (await db.execute(
+                select(WorkflowExecution.execution_status)
+                .where(WorkflowExecution.id == execution_id, WorkflowExecution.user_id == user_id)
+            )).scalar_one_or_none()
+            if exists is None:
+                raise HTTPException(status_code=404, detail="Execução não encontrada")
+            raise HTTPException(status_code=409, detail=f"Execução está '{exists}'; só execuções com falha podem ser retomadas")
+        await db.commit()
+
+        steps = (await db.execute(
+            select(ExecutionStep.node_id, ExecutionStep.status)
+            .where(ExecutionStep.execution_id == execution_id)
+        )).all()
+
+        return {
+            "execution_id": str(execution_id),
+            "status": "queued",
+            "checkpoints": sorted(node_id for node_id, status in steps if status == 'completed'),
+            "failed_nodes": sorted(node_id for node_id, status in steps if status == 'failed'),
+            "message": "Execução retomada a partir do nó com falha"
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/workflows/workers/stats", response_model=Dict[str, Any])
+async def get_workflow_worker_stats(
+        active_within_s: int = Query(120, ge=1, description="Considera só workers que publicaram neste intervalo"),
+        db: AsyncSession = Depends(get_db)
+):
+    """Métricas dos workers (fila, journal, memoização de nós) publicadas em agno_workflow_worker_stats"""
+    try:
+        since = datetime.now(timezone.utc) - timedelta(seconds=active_within_s)
+        rows = (await db.execute(
+            select(WorkflowWorkerStats)
+            .where(WorkflowWorkerStats.updated_at >= since)
+            .order_by(WorkflowWorkerStats.worker_id)
+        )).scalars().all()
+
+        # Hit rate da memoização por workflow somando todos os workers ativos
+        memo_workflows: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            for workflow_id, counts in ((row.stats or {}).get("node_memo", {}).get("workflows") or {}).items():
+                total = memo_workflows.setdefault(workflow_id, {"hits": 0, "misses": 0})
+                total["hits"] += counts.get("hits", 0)
+                total["misses"] += counts.get("misses", 0)
+        for total in memo_workflows.values():
+            lookups = total["hits"] + total["misses"]
+            total["hit_ratio"] = round(total["hits"] / lookups, 4) if lookups else 0.0
+
+        return {
+            "workers": [
+                {
+                    "worker_id": row.worker_id,
+                    "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+                    "stats": row.stats
+                }
+                for row in rows
+            ],
+            "node_memo_workflows": memo_workflows
+        }
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ==================== TEMPLATES ENDPOINTS ====================
 
+WORKFLOW_TEMPLATES = [
+    {
+        "id": 1,
+        "name": "Análise de Dados",
+        "description": "Template para análise automática de dados",
+        "category": "analytics",
+        "usage_count": 15,
+        "template_definition": {
+            "nodes": [
+                {"id": "start", "type": "start", "name": "Início"},
+                {"id": "analyze", "type": "agent", "name": "Analisar"},
+                {"id": "report", "type": "agent", "name": "Relatório"}
+            ],
+            "connections": [
+                {"from_node": "start", "to_node": "analyze"},
+                {"from_node": "analyze", "to_node": "report"}
+            ]
+        }
+    },
+    {
+        "id": 2,
+        "name": "Atendimento ao Cliente",
+        "description": "Template para fluxo de atendimento",
+        "category": "customer_service",
+        "usage_count": 8,
+        "template_definition": {
+            "nodes": [
+                {"id": "start", "type": "start", "name": "Início"},
+                {"id": "classify", "type": "agent", "name": "Classificar"},
+                {"id": "respond", "type": "agent", "name": "Responder"}
+            ],
+            "connections": [
+                {"from_node": "start", "to_node": "classify"},
+                {"from_node": "classify", "to_node": "respond"}
+            ]
+        }
+    }
+]
+
+
 @router.get("/templates", response_model=List[Dict])
 async def list_workflow_templates(category: Optional[str] = None, db: AsyncSession = Depends(get_db)):
     """Lista templates de workflow disponíveis"""
     try:
-        templates = [
-            {
-                "id": 1,
-                "name": "Análise de Dados",
-                "description": "Template para análise automática de dados",
-                "category": "analytics",
-                "usage_count": 15,
-                "template_definition": {
-                    "nodes": [
-                        {"id": "start", "type": "start", "name": "Início"},
-                        {"id": "analyze", "type": "agent", "name": "Analisar"},
-                        {"id": "report", "type": "agent", "name": "Relatório"}
-                    ],
-                    "connections": [
-                        {"from_node": "start", "to_node": "analyze"},
-                        {"from_node": "analyze", "to_node": "report"}
-                    ]
-                }
-            },
-            {
-                "id": 2,
-                "name": "Atendimento ao Cliente",
-                "description": "Template para fluxo de atendimento",
-                "category": "customer_service",
-                "usage_count": 8,
-                "template_definition": {
-                    "nodes": [
-                        {"id": "start", "type": "start", "name": "Início"},
-                        {"id": "classify", "type": "agent", "name": "Classificar"},
-                        {"id": "respond", "type": "agent", "name": "Responder"}
-                    ],
-                    "connections": [
-                        {"from_node": "start", "to_node": "classify"},
-                        {"from_node": "classify", "to_node": "respond"}
-                    ]
-                }
-            }
-        ]
+        templates = WORKFLOW_TEMPLATES
 
         if category:
             templates = [t for t in templates if t["category"] == category]
@@ -403,28 +582,32 @@ async def create_workflow_from_template(
 ):
     """Cria um workflow a partir de um template"""
     try:
-        workflow_id = str(uuid.uuid4())
-
-        workflow_data = {
-            "id": workflow_id,
-            "name": template_request.name,
-            "description": f"Workflow criado a partir do template {template_request.template_id}",
-            "user_id": get_mock_user_id(),
-            "workflow_type": "template",
-            "template_id": template_request.template_id,
-            "customizations": template_request.customizations,
-            "is_active": True,
-            "created_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat()
-        }
-
-        WORKFLOWS_STORAGE[workflow_id] = workflow_data
+        template = next((t for t in WORKFLOW_TEMPLATES if t["id"] == template_request.template_id), None)
+        if not template:
+            raise HTTPException(status_code=404, detail="Template não encontrado")
+
+        workflow = await save_workflow(
+            db,
+            get_mock_user_id(),
+            template_request.name,
+            f"Workflow criado a partir do template {template_request.template_id}",
+            "template",
+            {
+                **template["template_definition"],
+                "metadata": {
+                    "template_id": template_request.template_id,
+                    "customizations": template_request.customizations
+                }
+            }
+        )
 
         return {
-            "workflow_id": workflow_id,
+            "workflow_id": str(workflow.id),
             "message": "Workflow criado a partir do template com sucesso"
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -435,17 +618,32 @@ async def create_workflow_from_template(
 async def get_workflow_analytics(user_id: int = 1, db: AsyncSession = Depends(get_db)):
     """Analytics de workflows do usuário"""
     try:
-        user_workflows = [w for w in WORKFLOWS_STORAGE.values() if w.get("user_id") == user_id]
-        total_workflows = len(user_workflows)
-        total_executions = len(EXECUTIONS_STORAGE)
-
-        recent_executions = list(EXECUTIONS_STORAGE.values())[-5:]
+        total_workflows = (await db.execute(
+            select(func.count(Workflow.id))
+            .where(Workflow.user_id == user_id, Workflow.is_active == True)
+        )).scalar()
+
+        status_counts = dict((await db.execute(
+            select(WorkflowExecution.execution_status, func.count(WorkflowExecution.id))
+            .where(WorkflowExecution.user_id == user_id)
+            .group_by(WorkflowExecution.execution_status)
+        )).all())
+        total_executions = sum(status_counts.values())
+
+        recent_result = await db.execute(
+            select(WorkflowExecution)
+            .where(WorkflowExecution.user_id == user_id)
+            .order_by(WorkflowExecution.created_at.desc(), WorkflowExecution.id.desc())
+            .limit(5)
+        )
+        recent_executions = [serialize_execution(e) for e in recent_result.scalars().all()]
 
+        finished = status_counts.get('completed', 0) + status_counts.get('failed', 0)
         stats = {
             'total_workflows': total_workflows,
             'total_executions': total_executions,
             'recent_executions': recent_executions,
-            'success_rate': 85.5
+            'success_rate': round(100.0 * status_counts.get('completed', 0) / finished, 2) if finished else 0.0
         }
 
         return stats
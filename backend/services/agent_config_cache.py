@@ -0,0 +1,179 @@
+# backend/services/agent_config_cache.py - Cache read-through das configurações de agentes
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import text as sa_text
+
+# Consulta única usada por todos os endpoints de chat/execução
+AGENT_CONFIG_QUERY = sa_text("""
+    SELECT
+        id, user_id, name, description, role, model_provider, model_id,
+        instructions, tools, configuration, memory_enabled, rag_enabled,
+        rag_index_id, temperature, updated_at
+    FROM agno_agents
+    WHERE id = :agent_id AND user_id = :user_id AND is_active = true
+""")
+
+
+@dataclass(frozen=True)
+class CachedAgentConfig:
+    """Linha de agno_agents em cache (mesmos nomes de atributo da linha do banco)"""
+    id: int
+    user_id: Optional[int] = None
+    name: str = ""
+    description: Optional[str] = None
+    role: Optional[str] = None
+    model_provider: str = "openai"
+    model_id: str = "gpt-4o"
+    instructions: Any = None
+    tools: Any = None
+    configuration: Any = None
+    memory_enabled: bool = False
+    rag_enabled: bool = False
+    rag_index_id: Optional[str] = None
+    temperature: Optional[float] = None
+    updated_at: Optional[datetime] = None
+
+    @classmethod
+    def from_row(cls, row: Any) -> "CachedAgentConfig":
+        """Cria a partir de uma linha SQL (Row) ou de um objeto ORM"""
+        values = {}
+        for f in fields(cls):
+            value = getattr(row, f.name, None)
+            if f.name == "temperature" and value is not None:
+                value = float(value)
+            if value is not None:
+                values[f.name] = value
+        return cls(**values)
+
+
+@dataclass
+class _CacheEntry:
+    config: CachedAgentConfig
+    expires_at: float
+
+
+class AgentConfigCache:
+    """Cache com TTL das linhas de agno_agents, indexado por (agent_id, user_id).
+
+    Os endpoints de escrita (create/update/delete/tools) chamam `invalidate()`;
+    o TTL cobre alterações feitas por outros processos.
+    """
+
+    def __init__(self, ttl_seconds: float = 30.0, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._entries: "OrderedDict[Tuple[int, int], _CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._endpoint_stats: Dict[str, Dict[str, int]] = {}
+        self.invalidations = 0
+
+    def _record(self, endpoint: str, hit: bool) -> None:
+        stats = self._endpoint_stats.setdefault(endpoint, {"hits": 0, "misses": 0})
+        stats["hits" if hit else "misses"] += 1
+
+    def get(self, agent_id: int, user_id: int, endpoint: str = "default") -> Optional[CachedAgentConfig]:
+        """Retorna a configuração em cache (ou None se ausente/expirada)"""
+        key = (agent_id, user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self._record(endpoint, hit=True)
+                return entry.config
+
+            if entry:
+                del self._entries[key]
+            self._record(endpoint, hit=False)
+            return None
+
+    def put(self, agent_id: int, user_id: int, config: CachedAgentConfig) -> None:
+        with self._lock:
+            self._entries[(agent_id, user_id)] = _CacheEntry(
+                config=config,
+                expires_at=time.monotonic() + self.ttl_seconds
+            )
+            self._entries.move_to_end((agent_id, user_id))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get_or_load(
+            self,
+            agent_id: int,
+            user_id: int,
+            loader: Callable[[], Awaitable[Any]],
+            endpoint: str = "default"
+    ) -> Optional[CachedAgentConfig]:
+        """Read-through: busca no cache e, em caso de miss, executa `loader`"""
+        cached = self.get(agent_id, user_id, endpoint)
+        if cached is not None:
+            return cached
+
+        row = await loader()
+        if row is None:
+            return None
+
+        config = CachedAgentConfig.from_row(row)
+        self.put(agent_id, user_id, config)
+        return config
+
+    async def load(self, db: Any, agent_id: int, user_id: int, endpoint: str = "default") -> Optional[CachedAgentConfig]:
+        """Read-through usando a consulta SQL padrão de agno_agents"""
+        async def loader():
+            result = await db.execute(AGENT_CONFIG_QUERY, {"agent_id": agent_id, "user_id": user_id})
+            return result.fetchone()
+
+        return await self.get_or_load(agent_id, user_id, loader, endpoint)
+
+    def invalidate(self, agent_id: int) -> None:
+        """Remove o agente do cache (todas as entradas de qualquer usuário)"""
+        with self._lock:
+            keys = [k for k in self._entries if k[0] == agent_id]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+
+        if keys:
+            logger.debug(f"♻️ Configuração do agente {agent_id} removida do cache")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit ratio por endpoint"""
+        with self._lock:
+            endpoints = {}
+            for endpoint, stats in self._endpoint_stats.items():
+                total = stats["hits"] + stats["misses"]
+                endpoints[endpoint] = {
+                    **stats,
+                    "hit_ratio": round(stats["hits"] / total, 4) if total else 0.0
+                }
+            hits = sum(s["hits"] for s in self._endpoint_stats.values())
+            misses = sum(s["misses"] for s in self._endpoint_stats.values())
+            return {
+                "entries": len(self._entries),
+                "ttl_seconds": self.ttl_seconds,
+                "max_entries": self.max_entries,
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                "invalidations": self.invalidations,
+                "endpoints": endpoints
+            }
+
+
+# Instância global do cache
+agent_config_cache = AgentConfigCache(
+    ttl_seconds=float(os.getenv("AGENT_CONFIG_CACHE_TTL", "30")),
+    max_entries=int(os.getenv("AGENT_CONFIG_CACHE_SIZE", "1024"))
+)
@@ -0,0 +1,218 @@
+# backend/services/agent_pool.py - Pool LRU de agentes Agno já construídos
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+
+@dataclass
+class _PoolEntry:
+    """Agentes ociosos de uma mesma configuração"""
+    key: str
+    updated_at: Optional[str] = None
+    agent_ids: Set[Any] = field(default_factory=set)
+    idle: List[Any] = field(default_factory=list)
+    builds: int = 0
+    total_build_ms: float = 0.0
+
+    @property
+    def avg_build_ms(self) -> float:
+        return self.total_build_ms / self.builds if self.builds else 0.0
+
+
+class AgentPool:
+    """Pool LRU de agentes Agno indexado pelo hash estável da configuração
+    (e pelo id do agente no banco, quando houver).
+
+    Cada configuração guarda até `max_idle_per_config` agentes ociosos. Um
+    agente é emprestado com `acquire()` e devolvido com `release()`, de modo
+    que duas requisições concorrentes nunca compartilham a mesma instância.
+    """
+
+    def __init__(self, max_configs: int = 128, max_idle_per_config: int = 4):
+        self.max_configs = max_configs
+        self.max_idle_per_config = max_idle_per_config
+
+        self._entries: "OrderedDict[str, _PoolEntry]" = OrderedDict()
+        self._checked_out: Dict[int, Tuple[str, _PoolEntry]] = {}
+        self._lock = threading.Lock()
+
+        # Contadores
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.build_time_saved_ms = 0.0
+
+    @staticmethod
+    def config_hash(agent_config: Dict[str, Any], tools_list: Optional[List[str]] = None) -> str:
+        """Hash estável de (model_provider, model_id, temperature, instructions, tools, description)"""
+        instructions = agent_config.get("instructions", [])
+        if not isinstance(instructions, list):
+            instructions = [str(instructions)]
+
+        payload = {
+            "model_provider": agent_config.get("model_provider", "openai"),
+            "model_id": agent_config.get("model_id", "gpt-4o"),
+            "temperature": agent_config.get("temperature"),
+            "instructions": instructions,
+            "tools": sorted(str(t) for t in (tools_list or [])),
+            "description": agent_config.get("description"),
+            # O nome é repassado ao Agent, então também diferencia instâncias
+            "name": agent_config.get("name"),
+        }
+        raw = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def acquire(
+            self,
+            agent_config: Dict[str, Any],
+            tools_list: Optional[List[str]],
+            builder: Callable[[], Any]
+    ) -> Any:
+        """Empresta um agente do pool ou constrói um novo com `builder`"""
+        agent_id = agent_config.get("id")
+        # Agentes do banco com configuração idêntica têm updated_at próprios:
+        # entradas separadas evitam que um invalide a do outro a cada acquire
+        key = self.config_hash(agent_config, tools_list)
+        if agent_id is not None:
+            key = f"{key}:{agent_id}"
+        updated_at = agent_config.get("updated_at")
+        updated_at = str(updated_at) if updated_at is not None else None
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            # Linha do banco mudou desde que a entrada foi criada
+            if entry and updated_at is not None and entry.updated_at not in (None, updated_at):
+                self._drop_entry(key)
+                self.invalidations += 1
+                entry = None
+
+            if entry and entry.idle:
+                agent = entry.idle.pop()
+                self._entries.move_to_end(key)
+                if agent_id is not None:
+                    entry.agent_ids.add(agent_id)
+                self.hits += 1
+                self.build_time_saved_ms += entry.avg_build_ms
+                self._checked_out[id(agent)] = (key, entry)
+                return agent
+
+            self.misses += 1
+
+        start = time.perf_counter()
+        agent = builder()
+        build_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _PoolEntry(key=key, updated_at=updated_at)
+                self._entries[key] = entry
+                self._evict_if_needed()
+            else:
+                self._entries.move_to_end(key)
+                if updated_at is not None:
+                    entry.updated_at = updated_at
+
+            if agent_id is not None:
+                entry.agent_ids.add(agent_id)
+            entry.builds += 1
+            entry.total_build_ms += build_ms
+            self._checked_out[id(agent)] = (key, entry)
+
+        logger.debug(f"🧱 Agente construído para o pool em {build_ms:.1f}ms (key={key[:12]})")
+        return agent
+
+    def release(self, agent: Any) -> None:
+        """Devolve um agente emprestado ao pool"""
+        with self._lock:
+            checked_out = self._checked_out.pop(id(agent), None)
+            if checked_out is None:
+                return
+
+            key, entry = checked_out
+            # Entrada invalidada/evictada enquanto o agente estava em uso
+            if self._entries.get(key) is not entry:
+                return
+            if len(entry.idle) >= self.max_idle_per_config:
+                return
+
+            self._reset_agent_state(agent)
+            entry.idle.append(agent)
+
+    def invalidate_agent(self, agent_id: Any) -> int:
+        """Remove todas as entradas construídas para um agente do banco"""
+        removed = 0
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if agent_id in e.agent_ids]:
+                self._drop_entry(key)
+                removed += 1
+            self.invalidations += removed
+
+        if removed:
+            logger.info(f"♻️ Pool de agentes: {removed} entrada(s) invalidada(s) para agente {agent_id}")
+        return removed
+
+    def clear(self) -> None:
+        """Esvazia o pool"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores do pool para monitoramento"""
+        with self._lock:
+            requests = self.hits + self.misses
+            builds = sum(e.builds for e in self._entries.values())
+            total_build_ms = sum(e.total_build_ms for e in self._entries.values())
+            return {
+                "configs": len(self._entries),
+                "idle_agents": sum(len(e.idle) for e in self._entries.values()),
+                "checked_out": len(self._checked_out),
+                "max_configs": self.max_configs,
+                "max_idle_per_config": self.max_idle_per_config,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / requests, 4) if requests else 0.0,
+                "avg_build_ms": round(total_build_ms / builds, 2) if builds else 0.0,
+                "build_time_saved_ms": round(self.build_time_saved_ms, 2),
+                "build_time_saved_per_request_ms": round(self.build_time_saved_ms / requests, 2) if requests else 0.0,
+            }
+
+    # ==================== HELPERS ====================
+
+    def _drop_entry(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def _evict_if_needed(self) -> None:
+        while len(self._entries) > self.max_configs:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    @staticmethod
+    def _reset_agent_state(agent: Any) -> None:
+        """Limpa o estado de conversa para que a próxima requisição comece do zero"""
+        memory = getattr(agent, "memory", None)
+        clear = getattr(memory, "clear", None)
+        if callable(clear):
+            try:
+                clear()
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao limpar memória do agente do pool: {e}")
+
+
+# Instância global do pool (compartilhada por todas as instâncias do serviço)
+agent_pool = AgentPool(
+    max_configs=int(os.getenv("AGENT_POOL_MAX_CONFIGS", "128")),
+    max_idle_per_config=int(os.getenv("AGENT_POOL_MAX_IDLE", "4"))
+)
@@ -1,5 +1,4 @@
 import io
-import asyncio
 from typing import List, Optional, Dict, Any
 import PyPDF2
 import docx
@@ -9,6 +8,11 @@ from pathlib import Path
 import magic
 import hashlib
 
+try:
+    from services.executors import document_executor
+except ImportError:
+    from backend.services.executors import document_executor
+
 
 class DocumentProcessor:
     """Serviço para processamento de documentos"""
@@ -35,10 +39,8 @@ class DocumentProcessor:
             raise ValueError(f"Tipo de arquivo não suportado: {content_type}")
 
         try:
-            # Executar extração em thread separada para não bloquear
-            loop = asyncio.get_event_loop()
-            text = await loop.run_in_executor(
-                None,
+            # Executar extração no executor dedicado a documentos
+            text = await document_executor.run(
                 self.supported_types[content_type],
                 file_content
             )
@@ -0,0 +1,170 @@
+# backend/services/embedding_backends.py - Backends locais (CPU) de embedding
+
+import os
+import re
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from loguru import logger
+
+try:
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SentenceTransformer = None
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "64"))
+# "torch" (padrão) ou "onnx" (sentence-transformers >= 3 com optimum instalado)
+LOCAL_EMBEDDING_RUNTIME = os.getenv("LOCAL_EMBEDDING_RUNTIME", "torch")
+HASHING_EMBEDDING_DIMENSIONS = 256
+
+LOCAL_MODEL_PREFIX = "local:"
+HASHING_MODEL_PREFIX = "hash"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class LocalEmbeddingBackend(ABC):
+    """Backend que calcula embeddings no próprio processo.
+
+    `embed_batch` é síncrono e vetorizado sobre o lote; o EmbeddingService
+    distribui os lotes no executor `embedding_local` para não bloquear o
+    event loop. `cacheable` indica se vale gravar os vetores no cache em disco.
+    """
+
+    name = "local"
+    cacheable = True
+
+    def __init__(self, batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE):
+        self.batch_size = batch_size
+
+    @abstractmethod
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Vetores float32 (uma linha por texto)"""
+
+
+class SentenceTransformerBackend(LocalEmbeddingBackend):
+    """Modelo sentence-transformers na CPU (ex.: `local:all-MiniLM-L6-v2`)"""
+
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str, batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE):
+        super().__init__(batch_size)
+        if not SENTENCE_TRANSFORMERS_AVAILABLE:
+            raise ValueError(
+                f"Modelo local {model_name} requer o pacote sentence-transformers (pip install sentence-transformers)"
+            )
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        # Carregamento preguiçoso: o primeiro lote paga o custo, uma vez por processo
+        with self._lock:
+            if self._model is None:
+                kwargs = {"backend": LOCAL_EMBEDDING_RUNTIME} if LOCAL_EMBEDDING_RUNTIME != "torch" else {}
+                self._model = SentenceTransformer(self.model_name, device="cpu", **kwargs)
+                logger.info(f"🧠 Modelo de embedding local {self.model_name} carregado ({LOCAL_EMBEDDING_RUNTIME})")
+            return self._model
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        vectors = self._get_model().encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        return vectors.astype(np.float32, copy=False)
+
+
+@lru_cache(maxsize=65536)
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class HashingEmbeddingBackend(LocalEmbeddingBackend):
+    """Embedder determinístico por feature hashing (`hash` ou `hash:<dimensões>`).
+
+    Cada palavra cai numa dimensão fixa com sinal ±1 e o vetor é normalizado.
+    Não tem qualidade semântica: serve para testes e benchmarks offline do
+    pipeline de RAG com vetores estáveis entre execuções.
+    """
+
+    name = "hashing"
+    cacheable = False
+
+    def __init__(self, dimensions: int = HASHING_EMBEDDING_DIMENSIONS, batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE):
+        super().__init__(batch_size)
+        self.dimensions = dimensions
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        rows, cols, signs = [], [], []
+        for row, text in enumerate(texts):
+            for token in _TOKEN_RE.findall(text.lower()):
+                h = _token_hash(token)
+                rows.append(row)
+                cols.append(h % self.dimensions)
+                signs.append(1.0 if (h >> 63) else -1.0)
+
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        np.add.at(vectors, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)),
+                  np.asarray(signs, dtype=np.float32))
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+class EmbeddingBackendRegistry:
+    """Resolve o backend local pelo prefixo do modelo (uma instância por modelo)"""
+
+    def __init__(self):
+        self._backends: Dict[str, LocalEmbeddingBackend] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_local(model: str) -> bool:
+        return model.startswith(LOCAL_MODEL_PREFIX) or model == HASHING_MODEL_PREFIX or \
+            model.startswith(HASHING_MODEL_PREFIX + ":")
+
+    def _create(self, model: str) -> LocalEmbeddingBackend:
+        if model.startswith(LOCAL_MODEL_PREFIX):
+            return SentenceTransformerBackend(model[len(LOCAL_MODEL_PREFIX):])
+
+        _, _, dimensions = model.partition(":")
+        try:
+            size = int(dimensions) if dimensions else HASHING_EMBEDDING_DIMENSIONS
+        except ValueError:
+            size = 0
+        if size <= 0:
+            raise ValueError(f"Dimensões inválidas para o modelo de hashing: {model}")
+        return HashingEmbeddingBackend(size)
+
+    def get(self, model: str) -> Optional[LocalEmbeddingBackend]:
+        """Backend local do modelo, ou None para modelos remotos"""
+        if not self.is_local(model):
+            return None
+        with self._lock:
+            backend = self._backends.get(model)
+            if backend is None:
+                backend = self._create(model)
+                self._backends[model] = backend
+            return backend
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sentence_transformers_available": SENTENCE_TRANSFORMERS_AVAILABLE,
+                "runtime": LOCAL_EMBEDDING_RUNTIME,
+                "loaded": {model: backend.name for model, backend in self._backends.items()}
+            }
+
+
+# Instância global do registro
+embedding_backends = EmbeddingBackendRegistry()
@@ -0,0 +1,191 @@
+# backend/services/embedding_cache.py - Cache de embeddings endereçado por conteúdo
+
+import os
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+try:
+    from services.executors import embedding_cache_executor
+except ImportError:
+    from backend.services.executors import embedding_cache_executor
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./vector_db/embedding_cache.sqlite3")
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "10000"))
+
+CacheKey = Tuple[str, str]
+
+
+def text_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Embeddings já calculados, chaveados por (modelo, sha256 do texto).
+
+    Os vetores ficam em disco num SQLite como blobs float32 (4 bytes por
+    dimensão) e os mais recentes também numa LRU em memória, que atende as
+    consultas repetidas sem tocar no disco. Reenviar um documento pouco
+    alterado só paga pelos chunks que mudaram.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, memory_entries: int = EMBEDDING_CACHE_MEMORY_ENTRIES):
+        self.path = path
+        self.memory_entries = memory_entries
+
+        # `_lock` protege só a LRU e os contadores (nunca fica preso em I/O:
+        # get_memory roda no event loop); `_db_lock` serializa a conexão SQLite
+        self._memory: "OrderedDict[CacheKey, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        # Contadores
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.bytes_saved = 0
+
+    # ==================== ARMAZENAMENTO ====================
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL,"
+                " digest TEXT NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " PRIMARY KEY (model, digest)"
+                ") WITHOUT ROWID"
+            )
+            logger.info(f"💾 Cache de embeddings em {self.path}")
+        return self._conn
+
+    def _remember(self, key: CacheKey, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_memory(self, model: str, text: str) -> Optional[np.ndarray]:
+        """Consulta só a LRU em memória (sem disco): segura no event loop"""
+        key = (model, text_digest(text))
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is None:
+                return None
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            self.bytes_saved += len(text.encode("utf-8"))
+            return vector
+
+    def get_many_sync(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Vetores em cache na ordem dos textos (None para os ausentes)"""
+        keys = [(model, text_digest(text)) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(keys)
+
+        missing: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+                    self.memory_hits += 1
+                    self.bytes_saved += len(texts[i].encode("utf-8"))
+                else:
+                    missing.setdefault(key[1], []).append(i)
+
+        found: List[Tuple[str, np.ndarray]] = []
+        if missing:
+            digests = list(missing)
+            with self._db_lock:
+                conn = self._connection()
+                # Limite de variáveis por consulta do SQLite
+                for start in range(0, len(digests), 500):
+                    chunk = digests[start:start + 500]
+                    rows = conn.execute(
+                        f"SELECT digest, vector FROM embeddings WHERE model = ? "
+                        f"AND digest IN ({','.join('?' * len(chunk))})",
+                        [model, *chunk]
+                    ).fetchall()
+                    found.extend((digest, np.frombuffer(blob, dtype=np.float32)) for digest, blob in rows)
+
+        with self._lock:
+            for digest, vector in found:
+                self._remember((model, digest), vector)
+                for i in missing[digest]:
+                    results[i] = vector
+                    self.disk_hits += 1
+                    self.bytes_saved += len(texts[i].encode("utf-8"))
+            self.misses += sum(1 for vector in results if vector is None)
+
+        return results
+
+    def put_many_sync(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                array = np.asarray(vector, dtype=np.float32)
+                digest = text_digest(text)
+                self._remember((model, digest), array)
+                rows.append((model, digest, array.tobytes()))
+
+        if rows:
+            with self._db_lock:
+                conn = self._connection()
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO embeddings (model, digest, vector) VALUES (?, ?, ?)", rows
+                    )
+            with self._lock:
+                self.stores += len(rows)
+
+    # ==================== API ASSÍNCRONA ====================
+
+    async def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        return await embedding_cache_executor.run(self.get_many_sync, model, texts)
+
+    async def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        await embedding_cache_executor.run(self.put_many_sync, model, texts, vectors)
+
+    def close(self) -> None:
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ==================== MÉTRICAS ====================
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "path": self.path,
+                "memory_entries": len(self._memory),
+                "max_memory_entries": self.memory_entries,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "stores": self.stores,
+                # Texto que deixou de ser enviado à API de embeddings
+                "bytes_saved": self.bytes_saved
+            }
+
+
+# Instância global do cache
+embedding_cache = EmbeddingCache()
@@ -1,75 +1,385 @@
+import os
+import time
 import openai
 import asyncio
-from typing import List, Optional
+import contextlib
+from collections import deque
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 import numpy as np
 from tenacity import retry, stop_after_attempt, wait_exponential
 import logging
 
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+try:
+    from services.embedding_cache import embedding_cache
+    from services.embedding_backends import embedding_backends, LocalEmbeddingBackend
+    from services.executors import embedding_executor
+except ImportError:
+    from backend.services.embedding_cache import embedding_cache
+    from backend.services.embedding_backends import embedding_backends, LocalEmbeddingBackend
+    from backend.services.executors import embedding_executor
+
 logger = logging.getLogger(__name__)
 
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+EMBEDDING_MAX_BATCH_TOKENS = int(os.getenv("EMBEDDING_MAX_BATCH_TOKENS", "100000"))
+EMBEDDING_MAX_BATCH_ITEMS = 2048
+EMBEDDING_SIMILARITY_CHUNK_ROWS = int(os.getenv("EMBEDDING_SIMILARITY_CHUNK_ROWS", "4096"))
+EMBEDDING_MICROBATCH_WAIT_MS = float(os.getenv("EMBEDDING_MICROBATCH_WAIT_MS", "5"))
+EMBEDDING_MICROBATCH_MAX_ITEMS = int(os.getenv("EMBEDDING_MICROBATCH_MAX_ITEMS", "64"))
+
+# Amostras mantidas para os percentis de latência do micro-batcher
+_LATENCY_SAMPLES = 2048
+
+# Soma máxima de tokens das entradas numa requisição, por modelo
+MODEL_REQUEST_TOKEN_LIMITS = {
+    "text-embedding-3-small": 300_000,
+    "text-embedding-3-large": 300_000,
+    "text-embedding-ada-002": 300_000,
+}
+DEFAULT_REQUEST_TOKEN_LIMIT = 8_191
+
+BatchCallback = Callable[[List[str], List[List[float]]], Awaitable[None]]
+
+
+@lru_cache(maxsize=8)
+def _encoding_for(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Tokens do texto (estimativa conservadora se o tiktoken não estiver instalado)"""
+    encoding = _encoding_for(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+def count_tokens_many(texts: List[str], model: str) -> List[int]:
+    """Tokens de cada texto (CPU: chamar fora do event loop)"""
+    return [count_tokens(text, model) for text in texts]
+
+
+def plan_batches(token_counts: List[int], max_tokens: int, max_items: int) -> List[Tuple[int, int]]:
+    """Divide as entradas em intervalos [início, fim) respeitando tokens e itens por requisição"""
+    batches = []
+    start = 0
+    tokens = 0
+    for i, count in enumerate(token_counts):
+        if i > start and (tokens + count > max_tokens or i - start >= max_items):
+            batches.append((start, i))
+            start = i
+            tokens = 0
+        tokens += count
+    if start < len(token_counts):
+        batches.append((start, len(token_counts)))
+    return batches
+
+
+class EmbeddingMicroBatcher:
+    """Agrupa pedidos de embedding de um texto só em uma requisição.
+
+    O primeiro pedido abre uma janela de `max_wait_ms`; os que chegam nela
+    entram no mesmo lote, que é enviado ao fim da janela ou ao atingir
+    `max_items`. Cada chamador recebe o seu vetor (ou a exceção do lote).
+    """
+
+    def __init__(
+            self,
+            embed: Callable[[List[str]], Awaitable[List[List[float]]]],
+            max_wait_ms: float = EMBEDDING_MICROBATCH_WAIT_MS,
+            max_items: int = EMBEDDING_MICROBATCH_MAX_ITEMS
+    ):
+        self.embed = embed
+        self.max_wait_ms = max_wait_ms
+        self.max_items = max_items
+
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+        # Métricas
+        self.submitted = 0
+        self.flushed_batches = 0
+        self.failed_batches = 0
+        self._latencies_ms: deque = deque(maxlen=_LATENCY_SAMPLES)
+        self._batch_sizes: deque = deque(maxlen=_LATENCY_SAMPLES)
+
+    async def submit(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        self.submitted += 1
+
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+
+        start = time.perf_counter()
+        try:
+            return await future
+        finally:
+            self._latencies_ms.append((time.perf_counter() - start) * 1000)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        self.flushed_batches += 1
+        self._batch_sizes.append(len(batch))
+        try:
+            embeddings = await self.embed([text for text, _ in batch])
+        except Exception as e:
+            self.failed_batches += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding)
+
+    def get_stats(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies_ms)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 2)
+
+        return {
+            "max_wait_ms": self.max_wait_ms,
+            "max_items": self.max_items,
+            "submitted": self.submitted,
+            "batches": self.flushed_batches,
+            "failed_batches": self.failed_batches,
+            "avg_requests_per_batch": round(sum(self._batch_sizes) / len(self._batch_sizes), 2)
+            if self._batch_sizes else 0.0,
+            "p50_ms": percentile(0.50),
+            "p99_ms": percentile(0.99)
+        }
+
 
 class EmbeddingService:
     """Serviço para criação de embeddings usando diferentes provedores"""
 
-    def __init__(self):
-        self.openai_client = openai.AsyncOpenAI()
+    def __init__(
+            self,
+            client: Optional[Any] = None,
+            cache: Optional[Any] = None,
+            max_concurrency: int = EMBEDDING_MAX_CONCURRENCY
+    ):
+        self.openai_client = client or openai.AsyncOpenAI()
+        self.cache = cache or embedding_cache
+        self.max_concurrency = max_concurrency
+        self.micro_batchers: Dict[str, EmbeddingMicroBatcher] = {}
+
+        # Contadores
+        self.requests = 0
+        self.failed_requests = 0
+        self.batches = 0
+        self.local_batches = 0
+        self.tokens = 0
+        self.api_ms = 0.0
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10)
-    )
     async def create_embeddings(
             self,
             texts: List[str],
             model: str = "text-embedding-3-small",
-            batch_size: int = 100
+            batch_size: int = EMBEDDING_MAX_BATCH_ITEMS,
+            use_cache: bool = True
     ) -> List[List[float]]:
         """
-        Cria embeddings para lista de textos com batching automático
+        Cria embeddings para lista de textos, calculando apenas os que não
+        estão no cache (modelo + sha256 do texto) e mantendo a ordem original.
+        Cada lote concluído já é gravado no cache (checkpoint): repetir a
+        chamada após uma falha só envia os lotes que faltaram.
         """
         if not texts:
             return []
+        backend = embedding_backends.get(model)
+        if not use_cache or (backend is not None and not backend.cacheable):
+            return await self._embed_texts(texts, model, batch_size)
 
-        all_embeddings = []
+        cached = await self.cache.get_many(model, texts)
 
-        # Processar em batches para evitar rate limits
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i:i + batch_size]
+        # Textos repetidos na mesma chamada são calculados uma única vez
+        missing: Dict[str, List[int]] = {}
+        for i, vector in enumerate(cached):
+            if vector is None:
+                missing.setdefault(texts[i], []).append(i)
 
-            try:
-                if model.startswith("text-embedding"):
-                    # OpenAI embeddings
-                    response = await self.openai_client.embeddings.create(
-                        model=model,
-                        input=batch_texts,
-                        encoding_format="float"
-                    )
+        results: List[Optional[List[float]]] = [
+            vector.tolist() if vector is not None else None for vector in cached
+        ]
+        if missing:
+            missing_texts = list(missing)
+
+            async def checkpoint(batch_texts: List[str], embeddings: List[List[float]]) -> None:
+                await self.cache.put_many(model, batch_texts, embeddings)
+
+            embeddings = await self._embed_texts(missing_texts, model, batch_size, on_batch=checkpoint)
+            for text, embedding in zip(missing_texts, embeddings):
+                for i in missing[text]:
+                    results[i] = embedding
+
+        logger.info(
+            f"Embeddings: {len(texts) - sum(len(v) for v in missing.values())}/{len(texts)} do cache, "
+            f"{len(missing)} calculados ({model})"
+        )
+        return results
+
+    async def _embed_texts(
+            self,
+            texts: List[str],
+            model: str = "text-embedding-3-small",
+            batch_size: int = EMBEDDING_MAX_BATCH_ITEMS,
+            on_batch: Optional[BatchCallback] = None,
+            max_concurrency: Optional[int] = None
+    ) -> List[List[float]]:
+        """
+        Cria embeddings em lotes dimensionados por tokens, enviados em paralelo
+        (até `max_concurrency`). Cada lote tem seu próprio retry; uma falha não
+        reenvia os lotes que já deram certo. Modelos locais (`local:`, `hash`)
+        são calculados na CPU, sem chamada remota.
+        """
+        backend = embedding_backends.get(model)
+        if backend is not None:
+            return await self._embed_local(backend, texts, on_batch)
 
-                    batch_embeddings = [data.embedding for data in response.data]
-                    all_embeddings.extend(batch_embeddings)
+        if not model.startswith("text-embedding"):
+            raise ValueError(f"Modelo de embedding não suportado: {model}")
 
-                else:
-                    raise ValueError(f"Modelo de embedding não suportado: {model}")
+        max_tokens = min(EMBEDDING_MAX_BATCH_TOKENS, MODEL_REQUEST_TOKEN_LIMITS.get(model, DEFAULT_REQUEST_TOKEN_LIMIT))
+        # Com o tiktoken, contar um corpus grande leva segundos: fora do event loop
+        token_counts = await embedding_executor.run(count_tokens_many, texts, model)
+        batches = plan_batches(token_counts, max_tokens, min(batch_size, EMBEDDING_MAX_BATCH_ITEMS))
 
-                # Rate limiting - pause between batches
-                if i + batch_size < len(texts):
-                    await asyncio.sleep(0.1)
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
 
+        async def run_batch(start: int, end: int) -> None:
+            batch_texts = texts[start:end]
+            try:
+                embeddings = await self._embed_batch(batch_texts, model, semaphore)
             except Exception as e:
-                logger.error(f"Erro ao criar embeddings batch {i}-{i + batch_size}: {e}")
+                logger.error(f"Erro ao criar embeddings batch {start}-{end}: {e}")
                 raise
+            results[start:end] = embeddings
+            self.tokens += sum(token_counts[start:end])
+            if on_batch is not None:
+                await on_batch(batch_texts, embeddings)
 
-        logger.info(f"Criados {len(all_embeddings)} embeddings usando {model}")
-        return all_embeddings
+        # Os demais lotes terminam (e entram no checkpoint) mesmo se um falhar
+        outcomes = await asyncio.gather(*(run_batch(start, end) for start, end in batches), return_exceptions=True)
+        errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+        if errors:
+            raise errors[0]
+
+        logger.info(f"Criados {len(texts)} embeddings usando {model} em {len(batches)} lotes")
+        return results
+
+    async def _embed_local(
+            self,
+            backend: LocalEmbeddingBackend,
+            texts: List[str],
+            on_batch: Optional[BatchCallback] = None
+    ) -> List[List[float]]:
+        """Lotes vetorizados distribuídos no executor `embedding_local`"""
+        async def run_batch(batch_texts: List[str]) -> List[List[float]]:
+            embeddings = (await embedding_executor.run(backend.embed_batch, batch_texts)).tolist()
+            self.local_batches += 1
+            if on_batch is not None:
+                await on_batch(batch_texts, embeddings)
+            return embeddings
+
+        step = backend.batch_size
+        batches = await asyncio.gather(*(run_batch(texts[i:i + step]) for i in range(0, len(texts), step)))
+        return [embedding for batch in batches for embedding in batch]
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        reraise=True
+    )
+    async def _embed_batch(
+            self,
+            batch_texts: List[str],
+            model: str,
+            semaphore: Optional[asyncio.Semaphore] = None
+    ) -> List[List[float]]:
+        """Uma requisição à API de embeddings (repetida individualmente em caso de falha).
+
+        A vaga do `semaphore` vale por tentativa: um lote esperando o backoff
+        do retry não segura a concorrência dos demais.
+        """
+        async with semaphore or contextlib.nullcontext():
+            self.requests += 1
+            start = time.perf_counter()
+            try:
+                response = await self.openai_client.embeddings.create(
+                    model=model,
+                    input=batch_texts,
+                    encoding_format="float"
+                )
+            except Exception:
+                self.failed_requests += 1
+                raise
+            self.api_ms += (time.perf_counter() - start) * 1000
+        self.batches += 1
+        return [data.embedding for data in response.data]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "batches": self.batches,
+            "requests": self.requests,
+            "failed_requests": self.failed_requests,
+            "local_batches": self.local_batches,
+            "tokens": self.tokens,
+            "avg_batch_ms": round(self.api_ms / self.batches, 2) if self.batches else 0.0,
+            "cache": self.cache.get_stats(),
+            "local_backends": embedding_backends.get_stats(),
+            "micro_batching": {model: batcher.get_stats() for model, batcher in self.micro_batchers.items()}
+        }
 
     async def create_single_embedding(
             self,
             text: str,
             model: str = "text-embedding-3-small"
     ) -> List[float]:
-        """Cria embedding para um único texto"""
-        embeddings = await self.create_embeddings([text], model)
-        return embeddings[0] if embeddings else []
+        """Cria embedding para um único texto (agrupado com pedidos simultâneos)"""
+        backend = embedding_backends.get(model)
+        if backend is None or backend.cacheable:
+            # Hit na LRU em memória não espera a janela do micro-batch nem o executor
+            vector = self.cache.get_memory(model, text)
+            if vector is not None:
+                return vector.tolist()
+
+        batcher = self.micro_batchers.get(model)
+        if batcher is None:
+            batcher = EmbeddingMicroBatcher(lambda texts: self.create_embeddings(texts, model))
+            self.micro_batchers[model] = batcher
+        return await batcher.submit(text)
 
     def cosine_similarity(
             self,
@@ -88,3 +398,88 @@ class EmbeddingService:
         similarity = np.dot(vec1_norm, vec2_norm)
 
         return float(similarity)
+
+    # ==================== SIMILARIDADE EM LOTE ====================
+
+    @staticmethod
+    def normalize(vectors: Any) -> np.ndarray:
+        """Vetores (linhas) como float32 com norma 1; vetores nulos ficam zerados"""
+        matrix = np.array(vectors, dtype=np.float32, ndmin=2)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def batch_cosine_similarity(
+            self,
+            queries: Any,
+            matrix: Any,
+            normalized: bool = False,
+            chunk_size: int = EMBEDDING_SIMILARITY_CHUNK_ROWS
+    ) -> np.ndarray:
+        """
+        Similaridade coseno de cada query (linha) contra cada linha da matriz.
+        Com `normalized=True` as entradas já devem ser float32 normalizadas
+        (ex.: saída de `normalize`) e não são copiadas. Retorna
+        (n_queries, n_linhas), ou um vetor se `queries` for um único embedding.
+        """
+        single = np.ndim(queries) == 1
+        q = np.atleast_2d(np.asarray(queries, dtype=np.float32) if normalized else self.normalize(queries))
+        m = np.asarray(matrix, dtype=np.float32)
+
+        scores = np.empty((q.shape[0], m.shape[0]), dtype=np.float32)
+        # Blocos da matriz limitam a memória intermediária da normalização
+        for start in range(0, m.shape[0], chunk_size):
+            block = m[start:start + chunk_size]
+            if not normalized:
+                block = self.normalize(block)
+            np.matmul(q, block.T, out=scores[:, start:start + block.shape[0]])
+        return scores[0] if single else scores
+
+    def top_k_similar(
+            self,
+            queries: Any,
+            matrix: Any,
+            k: int,
+            normalized: bool = False,
+            chunk_size: int = EMBEDDING_SIMILARITY_CHUNK_ROWS
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Índices e similaridades das `k` linhas mais próximas de cada query,
+        em ordem decrescente. Queries e matriz são percorridas em blocos de
+        `chunk_size` linhas, mantendo só os k melhores candidatos por query
+        (`argpartition`): a memória fica em O(chunk² + n_queries·k) em vez
+        de O(n_queries·n_linhas).
+        """
+        single = np.ndim(queries) == 1
+        q = np.atleast_2d(np.asarray(queries, dtype=np.float32) if normalized else self.normalize(queries))
+        m = np.asarray(matrix, dtype=np.float32)
+        k = max(0, min(k, m.shape[0]))
+
+        result_idx = np.empty((q.shape[0], k), dtype=np.int64)
+        result_scores = np.empty((q.shape[0], k), dtype=np.float32)
+
+        for q_start in range(0, q.shape[0] if k else 0, chunk_size):
+            q_block = q[q_start:q_start + chunk_size]
+            top = np.empty((q_block.shape[0], 0), dtype=np.float32)
+            idx = np.empty((q_block.shape[0], 0), dtype=np.int64)
+
+            for start in range(0, m.shape[0], chunk_size):
+                block = m[start:start + chunk_size]
+                if not normalized:
+                    block = self.normalize(block)
+                scores = q_block @ block.T
+
+                top = np.concatenate([top, scores], axis=1)
+                idx = np.concatenate(
+                    [idx, np.broadcast_to(np.arange(start, start + block.shape[0]), scores.shape)], axis=1
+                )
+                if top.shape[1] > k:
+                    part = np.argpartition(-top, k - 1, axis=1)[:, :k]
+                    top = np.take_along_axis(top, part, axis=1)
+                    idx = np.take_along_axis(idx, part, axis=1)
+
+            order = np.argsort(-top, axis=1, kind="stable")
+            result_scores[q_start:q_start + chunk_size] = np.take_along_axis(top, order, axis=1)
+            result_idx[q_start:q_start + chunk_size] = np.take_along_axis(idx, order, axis=1)
+
+        return (result_idx[0], result_scores[0]) if single else (result_idx, result_scores)
@@ -0,0 +1,119 @@
+# backend/services/executors.py - Executores nomeados e limitados para trabalho bloqueante
+
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from loguru import logger
+
+
+class InstrumentedExecutor:
+    """ThreadPoolExecutor nomeado com métricas de saturação.
+
+    Registra tarefas ativas, enfileiradas e concluídas, além do tempo que cada
+    tarefa esperou na fila antes de ganhar uma thread.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+
+        # Contadores
+        self.submitted = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_queue_wait_ms = 0.0
+        self.max_queue_wait_ms = 0.0
+        self.total_run_ms = 0.0
+
+    def submit(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Agenda `func` no executor registrando espera em fila e duração"""
+        enqueued_at = time.perf_counter()
+
+        def task():
+            started_at = time.perf_counter()
+            wait_ms = (started_at - enqueued_at) * 1000
+            with self._lock:
+                self.active += 1
+                self.total_queue_wait_ms += wait_ms
+                self.max_queue_wait_ms = max(self.max_queue_wait_ms, wait_ms)
+
+            failed = False
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+                    self.failed += int(failed)
+                    self.total_run_ms += (time.perf_counter() - started_at) * 1000
+
+        with self._lock:
+            self.submitted += 1
+        return self._executor.submit(task)
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Executa `func` no executor sem bloquear o event loop"""
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            started = self.completed + self.active
+            queued = self.submitted - started
+            return {
+                "max_workers": self.max_workers,
+                "active": self.active,
+                "queued": queued,
+                "completed": self.completed,
+                "failed": self.failed,
+                "saturation": round(self.active / self.max_workers, 4) if self.max_workers else 0.0,
+                "avg_queue_wait_ms": round(self.total_queue_wait_ms / started, 2) if started else 0.0,
+                "max_queue_wait_ms": round(self.max_queue_wait_ms, 2),
+                "avg_run_ms": round(self.total_run_ms / self.completed, 2) if self.completed else 0.0
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+# Executores dedicados: um pico de chamadas longas de LLM não atrasa a
+# extração de documentos nem os embeddings locais (e vice-versa)
+agent_executor = InstrumentedExecutor(
+    "agent_execution", int(os.getenv("AGNO_EXECUTOR_WORKERS", "8"))
+)
+document_executor = InstrumentedExecutor(
+    "document_extraction", int(os.getenv("DOCUMENT_EXECUTOR_WORKERS", "4"))
+)
+embedding_executor = InstrumentedExecutor(
+    "embedding_local", int(os.getenv("EMBEDDING_EXECUTOR_WORKERS", str(min(4, os.cpu_count() or 1))))
+)
+# Consultas ao cache de embeddings (SQLite serializado pelo lock do cache)
+embedding_cache_executor = InstrumentedExecutor(
+    "embedding_cache", int(os.getenv("EMBEDDING_CACHE_EXECUTOR_WORKERS", "2"))
+)
+
+EXECUTORS: Dict[str, InstrumentedExecutor] = {
+    executor.name: executor
+    for executor in (agent_executor, document_executor, embedding_executor, embedding_cache_executor)
+}
+
+
+def get_executor_stats() -> Dict[str, Dict[str, Any]]:
+    """Métricas de todos os executores nomeados"""
+    return {name: executor.get_stats() for name, executor in EXECUTORS.items()}
+
+
+def shutdown_executors(wait: bool = False) -> None:
+    """Encerra os executores (shutdown da aplicação)"""
+    for executor in EXECUTORS.values():
+        executor.shutdown(wait=wait)
+    logger.info("✅ Executores dedicados encerrados")
@@ -0,0 +1,383 @@
+# backend/services/llm_governor.py - Controle de concorrência e rate limit por provider de LLM
+
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, Mapping, Optional
+
+from loguru import logger
+
+try:
+    from services.model_clients import model_clients
+except ImportError:
+    from backend.services.model_clients import model_clients
+
+# Limites padrão por provider: (concorrência, requisições/min, tokens/min)
+DEFAULT_PROVIDER_LIMITS = {
+    "openai": (16, 500, 200_000),
+    "anthropic": (8, 50, 40_000),
+    "groq": (8, 30, 6_000),
+}
+FALLBACK_PROVIDER_LIMITS = (8, 60, 60_000)
+
+LLM_GOVERNOR_QUEUE_TIMEOUT = float(os.getenv("LLM_GOVERNOR_QUEUE_TIMEOUT", "30"))
+LLM_GOVERNOR_EST_OUTPUT_TOKENS = int(os.getenv("LLM_GOVERNOR_EST_OUTPUT_TOKENS", "500"))
+LLM_GOVERNOR_POLL_INTERVAL = 0.05
+
+
+class LLMGovernorTimeout(Exception):
+    """Requisição descartada: o prazo na fila do provider expirou"""
+
+    def __init__(self, provider: str, waited_s: float):
+        super().__init__(f"Fila do provider '{provider}' saturada (aguardou {waited_s:.1f}s)")
+        self.provider = provider
+        self.waited_s = waited_s
+
+
+class TokenBucket:
+    """Token bucket com reposição contínua (capacidade por minuto)"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.capacity / 60.0)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Segundos até `amount` estar disponível (0 = disponível agora)"""
+        self._refill(now)
+        # Pedidos maiores que a capacidade passam quando o bucket estiver cheio
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) * 60.0 / self.capacity if self.capacity else LLM_GOVERNOR_POLL_INTERVAL
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        """Devolve (ou cobra, se negativo) tokens após conhecer o uso real"""
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def resize(self, per_minute: float) -> None:
+        if per_minute > 0 and per_minute != self.capacity:
+            self.capacity = float(per_minute)
+            self.tokens = min(self.tokens, self.capacity)
+
+
+@dataclass
+class _Waiter:
+    """Chamada aguardando vaga num provider (atendida por ordem de chegada)"""
+    future: asyncio.Future
+    loop: asyncio.AbstractEventLoop
+    estimated_tokens: int
+
+
+@dataclass
+class ProviderState:
+    """Estado de controle de um provider"""
+    name: str
+    max_concurrency: int
+    requests: TokenBucket
+    tokens: TokenBucket
+    in_flight: int = 0
+    queued: int = 0
+    paused_until: float = 0.0
+    waiters: Deque[_Waiter] = field(default_factory=deque)
+    wakeup_at: float = 0.0
+
+    # Métricas
+    admitted: int = 0
+    shed: int = 0
+    throttled_429: int = 0
+    total_wait_ms: float = 0.0
+    max_wait_ms: float = 0.0
+    peak_queue_depth: int = 0
+    limit_updates: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class LLMGovernor:
+    """Governa as chamadas de modelo por provider.
+
+    Cada provider tem um teto de concorrência e dois token buckets
+    (requisições/min e tokens/min). Chamadas sem capacidade entram numa fila
+    FIFO de futures: cada vaga liberada (ou reposição do bucket, via timer)
+    acorda o primeiro da fila, sem polling. Quem passa do prazo é descartado
+    (`LLMGovernorTimeout`). Os limites são ajustados a partir dos headers de
+    rate limit das respostas.
+    """
+
+    def __init__(self, queue_timeout: float = LLM_GOVERNOR_QUEUE_TIMEOUT):
+        self.queue_timeout = queue_timeout
+        self._providers: Dict[str, ProviderState] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, provider: str) -> ProviderState:
+        provider = (provider or "openai").lower()
+        state = self._providers.get(provider)
+        if state is not None:
+            return state
+
+        with self._lock:
+            state = self._providers.get(provider)
+            if state is None:
+                concurrency, rpm, tpm = DEFAULT_PROVIDER_LIMITS.get(provider, FALLBACK_PROVIDER_LIMITS)
+                prefix = f"LLM_{provider.upper()}"
+                state = ProviderState(
+                    name=provider,
+                    max_concurrency=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", concurrency)),
+                    requests=TokenBucket(float(os.getenv(f"{prefix}_RPM", rpm))),
+                    tokens=TokenBucket(float(os.getenv(f"{prefix}_TPM", tpm)))
+                )
+                self._providers[provider] = state
+            return state
+
+    @staticmethod
+    def estimate_tokens(prompt: str, instructions: Any = None) -> int:
+        """Estimativa grosseira (~4 caracteres por token) + saída esperada"""
+        text_len = len(prompt or "")
+        if instructions:
+            text_len += sum(len(str(i)) for i in instructions) if isinstance(instructions, list) else len(str(instructions))
+        return text_len // 4 + LLM_GOVERNOR_EST_OUTPUT_TOKENS
+
+    @staticmethod
+    def _admission_wait(state: ProviderState, estimated_tokens: int, now: float) -> Optional[float]:
+        """Com o lock: 0 se há capacidade, segundos até haver, ou None se só a
+        liberação de uma vaga de concorrência resolve"""
+        if state.paused_until > now:
+            return state.paused_until - now
+        if state.in_flight >= state.max_concurrency:
+            return None
+        return max(
+            state.requests.wait_time(1, now),
+            state.tokens.wait_time(estimated_tokens, now)
+        )
+
+    @staticmethod
+    def _take(state: ProviderState, estimated_tokens: int) -> None:
+        state.requests.take(1)
+        state.tokens.take(estimated_tokens)
+        state.in_flight += 1
+        state.admitted += 1
+
+    @staticmethod
+    def _untake(state: ProviderState, estimated_tokens: int) -> None:
+        """Desfaz uma admissão que ninguém chegou a usar"""
+        state.requests.refund(1)
+        state.tokens.refund(estimated_tokens)
+        state.in_flight -= 1
+        state.admitted -= 1
+
+    def _dispatch(self, state: ProviderState) -> None:
+        """Admite os primeiros da fila enquanto houver capacidade.
+
+        Se o primeiro depende da reposição dos buckets (ou de uma pausa por
+        429), agenda um timer no loop dele para tentar de novo.
+        """
+        now = time.monotonic()
+        timer = None
+        with state.lock:
+            while state.waiters:
+                waiter = state.waiters[0]
+                if waiter.future.done():
+                    # Expirou ou foi cancelado enquanto aguardava
+                    state.waiters.popleft()
+                    continue
+
+                wait = self._admission_wait(state, waiter.estimated_tokens, now)
+                if wait is None:
+                    break
+                if wait > 0:
+                    if not state.wakeup_at or now + wait < state.wakeup_at:
+                        state.wakeup_at = now + wait
+                        timer = (waiter.loop, wait)
+                    break
+
+                self._take(state, waiter.estimated_tokens)
+                state.waiters.popleft()
+                waiter.loop.call_soon_threadsafe(self._wake, state, waiter)
+
+        if timer:
+            loop, wait = timer
+            loop.call_soon_threadsafe(loop.call_later, wait, self._on_timer, state)
+
+    def _on_timer(self, state: ProviderState) -> None:
+        with state.lock:
+            state.wakeup_at = 0.0
+        self._dispatch(state)
+
+    def _wake(self, state: ProviderState, waiter: _Waiter) -> None:
+        """Entrega a vaga no loop do waiter (ou a devolve, se ele já desistiu)"""
+        if waiter.future.done():
+            with state.lock:
+                self._untake(state, waiter.estimated_tokens)
+            self._dispatch(state)
+        else:
+            waiter.future.set_result(None)
+
+    def _abandon(self, state: ProviderState, waiter: _Waiter) -> None:
+        """Waiter saiu da fila por timeout/cancelamento"""
+        if waiter.future.done() and not waiter.future.cancelled():
+            # A vaga chegou junto com o timeout: devolver
+            with state.lock:
+                self._untake(state, waiter.estimated_tokens)
+        else:
+            waiter.future.cancel()
+        self._dispatch(state)
+
+    @asynccontextmanager
+    async def slot(
+            self,
+            provider: str,
+            estimated_tokens: int = LLM_GOVERNOR_EST_OUTPUT_TOKENS,
+            timeout: Optional[float] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Reserva capacidade no provider durante a chamada ao modelo.
+
+        O dict entregue pode receber `actual_tokens` para ajustar o bucket de
+        tokens/min com o uso real quando a chamada terminar.
+        """
+        state = self._state(provider)
+        start = time.monotonic()
+        timeout = self.queue_timeout if timeout is None else timeout
+
+        waiter = None
+        with state.lock:
+            # Fast path só com a fila vazia: quem chegou antes tem prioridade
+            if not state.waiters and self._admission_wait(state, estimated_tokens, start) == 0:
+                self._take(state, estimated_tokens)
+            else:
+                loop = asyncio.get_running_loop()
+                waiter = _Waiter(future=loop.create_future(), loop=loop, estimated_tokens=estimated_tokens)
+                state.waiters.append(waiter)
+                state.queued += 1
+                state.peak_queue_depth = max(state.peak_queue_depth, state.queued)
+
+        if waiter is not None:
+            try:
+                # Agenda o timer caso a espera seja pelos buckets
+                self._dispatch(state)
+                await asyncio.wait_for(waiter.future, max(timeout, 0.0))
+            except asyncio.TimeoutError:
+                self._abandon(state, waiter)
+                with state.lock:
+                    state.shed += 1
+                waited = time.monotonic() - start
+                logger.warning(f"🚦 Chamada ao provider {state.name} descartada após {waited:.1f}s na fila")
+                raise LLMGovernorTimeout(state.name, waited)
+            except BaseException:
+                self._abandon(state, waiter)
+                raise
+            finally:
+                with state.lock:
+                    state.queued -= 1
+
+        waited_ms = (time.monotonic() - start) * 1000
+        with state.lock:
+            state.total_wait_ms += waited_ms
+            state.max_wait_ms = max(state.max_wait_ms, waited_ms)
+
+        usage: Dict[str, Any] = {"provider": state.name, "estimated_tokens": estimated_tokens, "wait_ms": waited_ms}
+        try:
+            yield usage
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+                actual = usage.get("actual_tokens")
+                if actual:
+                    state.tokens.refund(estimated_tokens - int(actual))
+            self._dispatch(state)
+
+    # ==================== ADAPTAÇÃO POR HEADERS ====================
+
+    @staticmethod
+    def _header_number(headers: Mapping[str, str], *names: str) -> Optional[float]:
+        for name in names:
+            value = headers.get(name)
+            if value is None:
+                continue
+            try:
+                return float(value)
+            except ValueError:
+                continue
+        return None
+
+    def observe_response(self, provider: str, response: Any) -> None:
+        """Ajusta os limites a partir dos headers de rate limit (OpenAI/Groq/Anthropic)"""
+        headers = getattr(response, "headers", None)
+        if headers is None:
+            return
+
+        state = self._state(provider)
+        limit_requests = self._header_number(
+            headers, "x-ratelimit-limit-requests", "anthropic-ratelimit-requests-limit")
+        limit_tokens = self._header_number(
+            headers, "x-ratelimit-limit-tokens", "anthropic-ratelimit-tokens-limit")
+        remaining_requests = self._header_number(
+            headers, "x-ratelimit-remaining-requests", "anthropic-ratelimit-requests-remaining")
+        remaining_tokens = self._header_number(
+            headers, "x-ratelimit-remaining-tokens", "anthropic-ratelimit-tokens-remaining")
+        retry_after = self._header_number(headers, "retry-after")
+
+        with state.lock:
+            if limit_requests:
+                state.requests.resize(limit_requests)
+                state.limit_updates += 1
+            if limit_tokens:
+                state.tokens.resize(limit_tokens)
+                state.limit_updates += 1
+            if remaining_requests is not None:
+                state.requests.tokens = min(state.requests.tokens, remaining_requests)
+            if remaining_tokens is not None:
+                state.tokens.tokens = min(state.tokens.tokens, remaining_tokens)
+
+            if getattr(response, "status_code", None) == 429:
+                state.throttled_429 += 1
+                pause = retry_after if retry_after is not None else 1.0
+                state.paused_until = max(state.paused_until, time.monotonic() + pause)
+                logger.warning(f"🚦 Provider {state.name} retornou 429; pausando por {pause:.1f}s")
+
+        # Limites novos podem liberar (ou adiar) o primeiro da fila
+        if state.waiters:
+            self._dispatch(state)
+
+    # ==================== MÉTRICAS ====================
+
+    def get_stats(self) -> Dict[str, Any]:
+        providers = {}
+        for name, state in list(self._providers.items()):
+            with state.lock:
+                providers[name] = {
+                    "max_concurrency": state.max_concurrency,
+                    "in_flight": state.in_flight,
+                    "queue_depth": state.queued,
+                    "peak_queue_depth": state.peak_queue_depth,
+                    "rpm_limit": state.requests.capacity,
+                    "tpm_limit": state.tokens.capacity,
+                    "admitted": state.admitted,
+                    "shed": state.shed,
+                    "throttled_429": state.throttled_429,
+                    "avg_wait_ms": round(state.total_wait_ms / state.admitted, 2) if state.admitted else 0.0,
+                    "max_wait_ms": round(state.max_wait_ms, 2),
+                    "limit_updates": state.limit_updates
+                }
+        return {
+            "queue_timeout_s": self.queue_timeout,
+            "providers": providers
+        }
+
+
+# Instância global do governor
+llm_governor = LLMGovernor()
+
+# Os clientes HTTP compartilhados repassam cada resposta para o governor
+model_clients.add_response_listener(llm_governor.observe_response)
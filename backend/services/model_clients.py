@@ -0,0 +1,390 @@
+# backend/services/model_clients.py - Registro de clientes HTTP compartilhados por provider
+
+import os
+import hashlib
+import importlib.util
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from loguru import logger
+
+# Limites configuráveis do pool de conexões
+MODEL_HTTP_MAX_CONNECTIONS = int(os.getenv("MODEL_HTTP_MAX_CONNECTIONS", "100"))
+MODEL_HTTP_MAX_KEEPALIVE = int(os.getenv("MODEL_HTTP_MAX_KEEPALIVE", "20"))
+MODEL_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("MODEL_HTTP_KEEPALIVE_EXPIRY", "30"))
+MODEL_HTTP_TIMEOUT = float(os.getenv("MODEL_HTTP_TIMEOUT", "120"))
+MODEL_HTTP_CONNECT_TIMEOUT = float(os.getenv("MODEL_HTTP_CONNECT_TIMEOUT", "10"))
+
+# HTTP/2 só é habilitado quando o pacote `h2` está instalado
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+MODEL_HTTP2_ENABLED = os.getenv("MODEL_HTTP2", "true").lower() == "true" and HTTP2_AVAILABLE
+
+# Modelos de raciocínio da OpenAI rejeitam `temperature` (usam sempre a padrão)
+FIXED_TEMPERATURE_MODEL_PREFIXES = ("o1", "o3")
+
+
+def supports_temperature(model_id: Optional[str]) -> bool:
+    """True se o modelo aceita o parâmetro `temperature`"""
+    return not str(model_id or "").startswith(FIXED_TEMPERATURE_MODEL_PREFIXES)
+
+
+@dataclass
+class _ClientEntry:
+    """Clientes (httpx + SDK) de um par (provider, api_key)"""
+    provider: str
+    key_fingerprint: str
+    http_client: httpx.Client
+    async_http_client: httpx.AsyncClient
+    sdk_client: Any = None
+    async_sdk_client: Any = None
+    requests_total: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def on_request(self) -> None:
+        with self.lock:
+            self.requests_total += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def on_response(self) -> None:
+        with self.lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+
+class _ReleasingByteStream(httpx.SyncByteStream):
+    """Corpo da resposta que chama `on_close` (uma vez) ao ser fechado"""
+
+    def __init__(self, inner: httpx.SyncByteStream, on_close: Callable[[], None]):
+        self._inner = inner
+        self._on_close = on_close
+
+    def __iter__(self):
+        yield from self._inner
+
+    def close(self) -> None:
+        try:
+            self._inner.close()
+        finally:
+            on_close, self._on_close = self._on_close, None
+            if on_close is not None:
+                on_close()
+
+
+class _AsyncReleasingByteStream(httpx.AsyncByteStream):
+    """Versão assíncrona do `_ReleasingByteStream`"""
+
+    def __init__(self, inner: httpx.AsyncByteStream, on_close: Callable[[], None]):
+        self._inner = inner
+        self._on_close = on_close
+
+    async def __aiter__(self):
+        async for chunk in self._inner:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._inner.aclose()
+        finally:
+            on_close, self._on_close = self._on_close, None
+            if on_close is not None:
+                on_close()
+
+
+class _CountingTransport(httpx.BaseTransport):
+    """Transport que contabiliza requisições em voo do par (provider, api_key).
+
+    A requisição só deixa de contar quando o corpo da resposta é fechado
+    (completions em streaming continuam em voo enquanto o corpo é lido), e
+    erros de transporte (timeout, conexão recusada) também liberam a
+    contagem - o que event hooks de resposta não garantem.
+    """
+
+    def __init__(self, inner: httpx.BaseTransport, on_request: Callable[[], None],
+                 on_done: Callable[[], None], on_response: Callable[[httpx.Response], None]):
+        self._inner = inner
+        self._on_request = on_request
+        self._on_done = on_done
+        self._on_response = on_response
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self._on_request()
+        try:
+            response = self._inner.handle_request(request)
+        except BaseException:
+            self._on_done()
+            raise
+        if response.is_closed:
+            # Corpo já lido pelo transport (ex.: MockTransport)
+            self._on_done()
+        else:
+            response.stream = _ReleasingByteStream(response.stream, self._on_done)
+        self._on_response(response)
+        return response
+
+    def close(self) -> None:
+        self._inner.close()
+
+
+class _AsyncCountingTransport(httpx.AsyncBaseTransport):
+    """Versão assíncrona do `_CountingTransport`"""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, on_request: Callable[[], None],
+                 on_done: Callable[[], None], on_response: Callable[[httpx.Response], None]):
+        self._inner = inner
+        self._on_request = on_request
+        self._on_done = on_done
+        self._on_response = on_response
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._on_request()
+        try:
+            response = await self._inner.handle_async_request(request)
+        except BaseException:
+            self._on_done()
+            raise
+        if response.is_closed:
+            # Corpo já lido pelo transport (ex.: MockTransport)
+            self._on_done()
+        else:
+            response.stream = _AsyncReleasingByteStream(response.stream, self._on_done)
+        self._on_response(response)
+        return response
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+class ModelClientRegistry:
+    """Registro process-wide de clientes HTTP por (provider, api_key).
+
+    Cada par recebe um `httpx.Client` e um `httpx.AsyncClient` com keep-alive
+    e limites de conexão, e os clientes dos SDKs (openai/anthropic/groq) são
+    construídos sobre eles. Os modelos Agno recebem esses clientes prontos, de
+    modo que as conexões TCP/TLS são reaproveitadas entre requisições.
+    """
+
+    def __init__(
+            self,
+            max_connections: int = MODEL_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections: int = MODEL_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry: float = MODEL_HTTP_KEEPALIVE_EXPIRY,
+            http2: bool = MODEL_HTTP2_ENABLED
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+
+        self._entries: Dict[Tuple[str, str], _ClientEntry] = {}
+        self._lock = threading.Lock()
+        self._response_listeners: List[Callable[[str, httpx.Response], None]] = []
+
+    def add_response_listener(self, listener: Callable[[str, httpx.Response], None]) -> None:
+        """Registra um callback chamado com (provider, response) a cada resposta"""
+        self._response_listeners.append(listener)
+
+    def _notify_response(self, provider: str, response: httpx.Response) -> None:
+        for listener in self._response_listeners:
+            try:
+                listener(provider, response)
+            except Exception as e:
+                logger.warning(f"⚠️ Erro no listener de respostas HTTP ({provider}): {e}")
+
+    @staticmethod
+    def _fingerprint(api_key: str) -> str:
+        """Identificador da chave que pode aparecer em logs e métricas"""
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+
+    def _timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(MODEL_HTTP_TIMEOUT, connect=MODEL_HTTP_CONNECT_TIMEOUT)
+
+    def _create_entry(self, provider: str, api_key: str) -> _ClientEntry:
+        holder: Dict[str, _ClientEntry] = {}
+
+        def on_request() -> None:
+            holder["entry"].on_request()
+
+        def on_done() -> None:
+            holder["entry"].on_response()
+
+        def on_response(response: httpx.Response) -> None:
+            self._notify_response(provider, response)
+
+        http_client = httpx.Client(
+            timeout=self._timeout(),
+            transport=_CountingTransport(
+                httpx.HTTPTransport(limits=self._limits(), http2=self.http2),
+                on_request, on_done, on_response
+            )
+        )
+        async_http_client = httpx.AsyncClient(
+            timeout=self._timeout(),
+            transport=_AsyncCountingTransport(
+                httpx.AsyncHTTPTransport(limits=self._limits(), http2=self.http2),
+                on_request, on_done, on_response
+            )
+        )
+
+        entry = _ClientEntry(
+            provider=provider,
+            key_fingerprint=self._fingerprint(api_key),
+            http_client=http_client,
+            async_http_client=async_http_client
+        )
+        holder["entry"] = entry
+
+        entry.sdk_client, entry.async_sdk_client = self._create_sdk_clients(
+            provider, api_key, http_client, async_http_client
+        )
+
+        logger.info(
+            f"🔌 Pool HTTP criado para {provider} (key={entry.key_fingerprint}, "
+            f"max={self.max_connections}, http2={self.http2})"
+        )
+        return entry
+
+    @staticmethod
+    def _create_sdk_clients(
+            provider: str,
+            api_key: str,
+            http_client: httpx.Client,
+            async_http_client: httpx.AsyncClient
+    ) -> Tuple[Any, Any]:
+        """Constrói os clientes do SDK do provider sobre os clientes httpx compartilhados"""
+        try:
+            if provider == "openai":
+                import openai
+                return (
+                    openai.OpenAI(api_key=api_key, http_client=http_client),
+                    openai.AsyncOpenAI(api_key=api_key, http_client=async_http_client)
+                )
+            if provider == "anthropic":
+                import anthropic
+                return (
+                    anthropic.Anthropic(api_key=api_key, http_client=http_client),
+                    anthropic.AsyncAnthropic(api_key=api_key, http_client=async_http_client)
+                )
+            if provider == "groq":
+                import groq
+                return (
+                    groq.Groq(api_key=api_key, http_client=http_client),
+                    groq.AsyncGroq(api_key=api_key, http_client=async_http_client)
+                )
+        except ImportError as e:
+            logger.warning(f"⚠️ SDK do provider {provider} não disponível: {e}")
+
+        return None, None
+
+    def get_entry(self, provider: str, api_key: str) -> _ClientEntry:
+        """Retorna (criando se necessário) os clientes do par (provider, api_key)"""
+        key = (provider, self._fingerprint(api_key))
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._create_entry(provider, api_key)
+                self._entries[key] = entry
+            return entry
+
+    def discard(self, provider: str, api_key: str) -> None:
+        """Esquece os clientes de uma chave rotacionada ou revogada.
+
+        Os clientes não são fechados aqui: modelos já construídos podem estar
+        no meio de uma requisição com eles.
+        """
+        with self._lock:
+            entry = self._entries.pop((provider, self._fingerprint(api_key)), None)
+        if entry is not None:
+            logger.info(f"♻️ Clientes HTTP de {provider} (chave {entry.key_fingerprint}) descartados")
+
+    def model_kwargs(self, provider: str, api_key: Optional[str]) -> Dict[str, Any]:
+        """Argumentos para injetar os clientes compartilhados num modelo Agno.
+
+        Sem api_key (ou sem SDK instalado) devolve um dict vazio e o modelo
+        cria seus próprios clientes, como antes.
+        """
+        if not api_key:
+            return {}
+
+        entry = self.get_entry(provider, api_key)
+        kwargs: Dict[str, Any] = {"api_key": api_key}
+        if entry.sdk_client is not None:
+            kwargs["client"] = entry.sdk_client
+        if entry.async_sdk_client is not None:
+            kwargs["async_client"] = entry.async_sdk_client
+        return kwargs
+
+    @staticmethod
+    def _pool_snapshot(client: Any) -> Dict[str, int]:
+        """Conexões abertas/ociosas do pool httpcore (melhor esforço)"""
+        transport = getattr(client, "_transport", None)
+        transport = getattr(transport, "_inner", transport)
+        pool = getattr(transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        idle = 0
+        for connection in connections:
+            is_idle = getattr(connection, "is_idle", None)
+            try:
+                if callable(is_idle) and is_idle():
+                    idle += 1
+            except Exception:
+                pass
+        return {"open": len(connections), "idle": idle}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Utilização dos pools para o health check"""
+        pools = []
+        for (provider, fingerprint), entry in list(self._entries.items()):
+            sync_pool = self._pool_snapshot(entry.http_client)
+            async_pool = self._pool_snapshot(entry.async_http_client)
+            open_connections = sync_pool["open"] + async_pool["open"]
+            pools.append({
+                "provider": provider,
+                "key": fingerprint,
+                "requests_total": entry.requests_total,
+                "in_flight": entry.in_flight,
+                "peak_in_flight": entry.peak_in_flight,
+                "open_connections": open_connections,
+                "idle_connections": sync_pool["idle"] + async_pool["idle"],
+                "utilisation": round(entry.in_flight / self.max_connections, 4) if self.max_connections else 0.0,
+                "sdk_clients": entry.sdk_client is not None
+            })
+
+        return {
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "keepalive_expiry": self.keepalive_expiry,
+            "pools": pools
+        }
+
+    async def aclose(self) -> None:
+        """Fecha todos os clientes (shutdown da aplicação)"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+
+        for entry in entries:
+            try:
+                entry.http_client.close()
+                await entry.async_http_client.aclose()
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao fechar clientes HTTP de {entry.provider}: {e}")
+
+
+# Instância global do registro
+model_clients = ModelClientRegistry()
@@ -0,0 +1,207 @@
+# backend/services/node_memo.py - Memoização de resultados de nós entre execuções de workflow
+
+import os
+import copy
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+# Chaves do config do nó que não alteram o resultado (só a política de cache)
+_POLICY_KEYS = {"memoize"}
+
+
+@dataclass
+class _MemoEntry:
+    output_data: Dict[str, Any]
+    workflow_id: Optional[str]
+    agent_id: Optional[str]
+    created_at: float
+    expires_at: float
+
+
+def _stable_hash(value: Any) -> str:
+    raw = json.dumps(value, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class NodeMemo:
+    """Cache (opt-in por nó) das saídas de nós de workflow visual.
+
+    Um nó participa quando `config.memoize` está ativo (`true` usa o TTL
+    padrão; `{"ttl_seconds": N}` define o próprio). A chave é
+    (hash do config do nó, hash da configuração do agente, hash da entrada),
+    então execuções diferentes do mesmo workflow - ou de workflows distintos
+    com o mesmo nó - reaproveitam a chamada ao LLM. Hits/misses são
+    contabilizados por workflow.
+
+    A chave já muda quando o nó, o agente (inclusive `updated_at`) ou a
+    entrada mudam; `observe_workflow`/`observe_agent` ainda descartam as
+    entradas de versões antigas assim que o worker vê uma versão nova, e
+    `invalidate_agent`/`invalidate_workflow` fazem o mesmo sob demanda.
+    O memo vive só nos processos do workflow_worker: edições feitas pela API
+    chegam até ele pela chave e por `observe_agent`, não por invalidação direta.
+    """
+
+    def __init__(self, max_entries: int = 4096, default_ttl_seconds: float = 3600.0):
+        self.max_entries = max_entries
+        self.default_ttl_seconds = default_ttl_seconds
+
+        self._entries: "OrderedDict[str, _MemoEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Contadores (globais e por workflow)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._per_workflow: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+        # Última versão vista de cada workflow/agente
+        self._workflow_versions: Dict[str, str] = {}
+        self._agent_versions: Dict[str, str] = {}
+
+    # ==================== POLÍTICA ====================
+
+    def ttl_for(self, node_config: Optional[Dict[str, Any]]) -> Optional[float]:
+        """TTL da memoização do nó, ou None se ela estiver desligada"""
+        setting = (node_config or {}).get("memoize")
+        if not setting:
+            return None
+        if isinstance(setting, dict):
+            return float(setting.get("ttl_seconds", self.default_ttl_seconds))
+        return self.default_ttl_seconds
+
+    # ==================== CHAVES ====================
+
+    def make_key(
+            self,
+            node_type: str,
+            node_config: Optional[Dict[str, Any]],
+            agent_config_hash: Optional[str],
+            input_data: Dict[str, Any]
+    ) -> str:
+        config = {k: v for k, v in (node_config or {}).items() if k not in _POLICY_KEYS}
+        return _stable_hash({
+            "node": _stable_hash({"type": node_type, "config": config}),
+            "agent": agent_config_hash,
+            "input": _stable_hash(input_data)
+        })
+
+    # ==================== OPERAÇÕES ====================
+
+    def get(self, workflow_id: Any, key: str) -> Optional[Dict[str, Any]]:
+        """Retorna uma cópia da saída memorizada (ou None)"""
+        now = time.monotonic()
+        with self._lock:
+            stats = self._per_workflow[str(workflow_id)]
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            stats["hits"] += 1
+            return copy.deepcopy(entry.output_data)
+
+    def put(
+            self,
+            workflow_id: Any,
+            key: str,
+            output_data: Dict[str, Any],
+            ttl_seconds: float,
+            agent_id: Any = None
+    ) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = _MemoEntry(
+                output_data=copy.deepcopy(output_data),
+                workflow_id=str(workflow_id) if workflow_id is not None else None,
+                agent_id=str(agent_id) if agent_id is not None else None,
+                created_at=now,
+                expires_at=now + ttl_seconds
+            )
+            self._entries.move_to_end(key)
+            self.stores += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _invalidate(self, field: str, value: Any) -> int:
+        value = str(value)
+        with self._lock:
+            keys = [k for k, e in self._entries.items() if getattr(e, field) == value]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += 1
+        return len(keys)
+
+    def invalidate_workflow(self, workflow_id: Any) -> None:
+        """Remove as saídas memorizadas a partir de um workflow"""
+        removed = self._invalidate("workflow_id", workflow_id)
+        if removed:
+            logger.debug(f"♻️ {removed} saída(s) de nós memorizadas removidas para workflow {workflow_id}")
+
+    def invalidate_agent(self, agent_id: Any) -> None:
+        """Remove as saídas memorizadas de nós que usam o agente"""
+        removed = self._invalidate("agent_id", agent_id)
+        if removed:
+            logger.debug(f"♻️ {removed} saída(s) de nós memorizadas removidas para agente {agent_id}")
+
+    def _observe(self, versions: Dict[str, str], key: Any, version: Any) -> bool:
+        """Registra a versão vista; True se ela mudou desde a última vez"""
+        key, version = str(key), str(version)
+        with self._lock:
+            previous = versions.get(key)
+            versions[key] = version
+        return previous is not None and previous != version
+
+    def observe_workflow(self, workflow_id: Any, definition_version: Any) -> None:
+        """Chamado a cada execução: definição nova => entradas antigas descartadas"""
+        if workflow_id is not None and self._observe(self._workflow_versions, workflow_id, definition_version):
+            self.invalidate_workflow(workflow_id)
+
+    def observe_agent(self, agent_id: Any, config_version: Any) -> None:
+        """Chamado ao carregar o agente: configuração editada => entradas antigas descartadas"""
+        if self._observe(self._agent_versions, agent_id, config_version):
+            self.invalidate_agent(agent_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "default_ttl_seconds": self.default_ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "workflows": {
+                    workflow_id: {
+                        **stats,
+                        "hit_ratio": round(stats["hits"] / (stats["hits"] + stats["misses"]), 4)
+                        if stats["hits"] + stats["misses"] else 0.0
+                    }
+                    for workflow_id, stats in self._per_workflow.items()
+                }
+            }
+
+
+# Instância global da memoização
+node_memo = NodeMemo(
+    max_entries=int(os.getenv("NODE_MEMO_SIZE", "4096")),
+    default_ttl_seconds=float(os.getenv("NODE_MEMO_TTL", "3600"))
+)
@@ -0,0 +1,184 @@
+# backend/services/response_cache.py - Cache exato de respostas para agentes determinísticos
+
+import os
+import copy
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Set
+
+from loguru import logger
+
+try:
+    from services.model_clients import supports_temperature
+except ImportError:
+    from backend.services.model_clients import supports_temperature
+
+# Ferramentas que consultam dados ao vivo: respostas nunca são reaproveitadas
+LIVE_DATA_TOOLS: Set[str] = {
+    "duckduckgo", "web_search", "yfinance", "financial",
+    "google_search", "googlesearch", "youtube", "dalle", "image_generation"
+}
+
+# Header para ignorar o cache numa requisição específica
+CACHE_BYPASS_HEADER = "X-Agno-Cache"
+
+
+@dataclass
+class _CachedResponse:
+    result: Dict[str, Any]
+    agent_id: Any
+    created_at: float
+    expires_at: float
+
+
+class ResponseCache:
+    """Cache exato (opt-in por agente) de execuções não-streaming.
+
+    Um agente participa quando `configuration.response_cache` está ativo,
+    a temperatura enviada ao modelo é 0 e nenhuma ferramenta de dados ao vivo está em uso.
+    A chave é (hash da configuração, prompt normalizado, lista de ferramentas).
+    """
+
+    def __init__(self, max_entries: int = 2048, default_ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.default_ttl_seconds = default_ttl_seconds
+
+        self._entries: "OrderedDict[str, _CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Contadores
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.bypasses = 0
+        self.evictions = 0
+
+    # ==================== POLÍTICA ====================
+
+    def ttl_for(self, agent_row: Any, tools_list: Optional[List[str]]) -> Optional[float]:
+        """TTL do cache para o agente, ou None se ele não for elegível"""
+        configuration = getattr(agent_row, "configuration", None) or {}
+        if isinstance(configuration, str):
+            try:
+                configuration = json.loads(configuration)
+            except ValueError:
+                configuration = {}
+
+        setting = configuration.get("response_cache") if isinstance(configuration, dict) else None
+        if not setting:
+            return None
+
+        # A temperatura precisa chegar ao modelo (ver RealAgnoService._build_agent)
+        temperature = getattr(agent_row, "temperature", None)
+        if temperature is None or float(temperature) != 0.0:
+            return None
+        if not supports_temperature(getattr(agent_row, "model_id", None)):
+            return None
+
+        if any(str(tool) in LIVE_DATA_TOOLS for tool in (tools_list or [])):
+            return None
+
+        if isinstance(setting, dict):
+            return float(setting.get("ttl_seconds", self.default_ttl_seconds))
+        return self.default_ttl_seconds
+
+    def should_bypass(self, headers: Mapping[str, str]) -> bool:
+        """Verifica os headers X-Agno-Cache: bypass / Cache-Control: no-cache"""
+        bypass = (headers.get(CACHE_BYPASS_HEADER) or "").lower() == "bypass" or \
+            "no-cache" in (headers.get("Cache-Control") or "").lower()
+        if bypass:
+            with self._lock:
+                self.bypasses += 1
+        return bypass
+
+    # ==================== CHAVES ====================
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """Normaliza espaços em branco do prompt"""
+        return " ".join((prompt or "").split())
+
+    def make_key(self, config_hash: str, prompt: str, tools_list: Optional[List[str]]) -> str:
+        raw = json.dumps({
+            "config": config_hash,
+            "prompt": self.normalize_prompt(prompt),
+            "tools": sorted(str(t) for t in (tools_list or []))
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # ==================== OPERAÇÕES ====================
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Retorna uma cópia da resposta em cache marcada como `cached`"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            result = copy.deepcopy(entry.result)
+
+        result["cached"] = True
+        result["cache_age_ms"] = int((now - entry.created_at) * 1000)
+        return result
+
+    def put(self, key: str, result: Dict[str, Any], ttl_seconds: float, agent_id: Any = None) -> None:
+        """Armazena apenas resultados de sucesso"""
+        if result.get("status") != "success":
+            return
+
+        now = time.monotonic()
+        stored = {k: v for k, v in result.items() if k not in ("cached", "cache_age_ms")}
+        with self._lock:
+            self._entries[key] = _CachedResponse(
+                result=copy.deepcopy(stored),
+                agent_id=agent_id,
+                created_at=now,
+                expires_at=now + ttl_seconds
+            )
+            self._entries.move_to_end(key)
+            self.stores += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_agent(self, agent_id: Any) -> None:
+        """Remove as respostas em cache de um agente"""
+        with self._lock:
+            keys = [k for k, e in self._entries.items() if e.agent_id == agent_id]
+            for key in keys:
+                del self._entries[key]
+
+        if keys:
+            logger.debug(f"♻️ {len(keys)} resposta(s) em cache removidas para agente {agent_id}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "default_ttl_seconds": self.default_ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "stores": self.stores,
+                "bypasses": self.bypasses,
+                "evictions": self.evictions
+            }
+
+
+# Instância global do cache
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "2048")),
+    default_ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+)
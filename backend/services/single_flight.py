@@ -0,0 +1,147 @@
+# backend/services/single_flight.py - Coalescência de requisições idênticas concorrentes
+
+import json
+import asyncio
+import hashlib
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+
+def flight_key(*parts: Any) -> str:
+    """Chave estável para identificar chamadas idênticas"""
+    raw = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _StreamFlight:
+    """Stream em andamento: chunks já emitidos + cauda ao vivo"""
+    chunks: List[Any] = field(default_factory=list)
+    done: bool = False
+    subscribers: int = 0
+    condition: asyncio.Condition = field(default_factory=asyncio.Condition)
+    task: Optional[asyncio.Task] = None
+
+
+class SingleFlight:
+    """Agrupa chamadas idênticas em andamento numa única execução.
+
+    - `do()`: chamadas concorrentes com a mesma chave aguardam o mesmo
+      resultado. A execução roda numa task própria, então o cancelamento do
+      primeiro chamador não derruba os demais.
+    - `stream()`: quem chega atrasado recebe os chunks já emitidos e depois
+      acompanha o restante ao vivo. Se todos os ouvintes saírem, o stream de
+      origem é cancelado.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._streams: Dict[str, _StreamFlight] = {}
+
+        # Contadores
+        self.leaders = 0
+        self.joined = 0
+        self.stream_leaders = 0
+        self.stream_joined = 0
+        self.replayed_chunks = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Executa `func` uma única vez por chave; retorna (resultado, compartilhado)"""
+        task = self._calls.get(key)
+        if task is not None:
+            self.joined += 1
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(func())
+        self._calls[key] = task
+        self.leaders += 1
+        task.add_done_callback(lambda _t: self._calls.pop(key, None))
+        return await asyncio.shield(task), False
+
+    async def stream(
+            self,
+            key: str,
+            source_factory: Callable[[], AsyncIterator[Any]]
+    ) -> AsyncGenerator[Any, None]:
+        """Compartilha um stream entre requisições idênticas concorrentes"""
+        flight = self._streams.get(key)
+        if flight is None:
+            flight = _StreamFlight()
+            flight.task = asyncio.ensure_future(self._produce(key, flight, source_factory))
+            self._streams[key] = flight
+            self.stream_leaders += 1
+        else:
+            self.stream_joined += 1
+            self.replayed_chunks += len(flight.chunks)
+            logger.debug(f"🔗 Stream coalescido: replay de {len(flight.chunks)} chunks (key={key[:12]})")
+
+        flight.subscribers += 1
+        index = 0
+        try:
+            while True:
+                async with flight.condition:
+                    await flight.condition.wait_for(lambda: index < len(flight.chunks) or flight.done)
+                    pending = flight.chunks[index:]
+                    finished = flight.done
+
+                for chunk in pending:
+                    yield chunk
+                index += len(pending)
+
+                if finished and index >= len(flight.chunks):
+                    break
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done and flight.task:
+                flight.task.cancel()
+
+    async def _produce(
+            self,
+            key: str,
+            flight: _StreamFlight,
+            source_factory: Callable[[], AsyncIterator[Any]]
+    ) -> None:
+        source = source_factory()
+        try:
+            async for chunk in source:
+                async with flight.condition:
+                    flight.chunks.append(chunk)
+                    flight.condition.notify_all()
+        except asyncio.CancelledError:
+            logger.debug(f"🛑 Stream coalescido cancelado sem ouvintes (key={key[:12]})")
+        except Exception as e:
+            logger.error(f"❌ Erro no stream coalescido: {e}")
+            async with flight.condition:
+                flight.chunks.append({"type": "error", "error": str(e)})
+        finally:
+            aclose = getattr(source, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+            # Novas requisições passam a iniciar um stream próprio
+            if self._streams.get(key) is flight:
+                del self._streams[key]
+            async with flight.condition:
+                flight.done = True
+                flight.condition.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        calls = self.leaders + self.joined
+        streams = self.stream_leaders + self.stream_joined
+        return {
+            "in_flight_calls": len(self._calls),
+            "in_flight_streams": len(self._streams),
+            "leaders": self.leaders,
+            "joined": self.joined,
+            "coalesced_ratio": round(self.joined / calls, 4) if calls else 0.0,
+            "stream_leaders": self.stream_leaders,
+            "stream_joined": self.stream_joined,
+            "stream_coalesced_ratio": round(self.stream_joined / streams, 4) if streams else 0.0,
+            "replayed_chunks": self.replayed_chunks
+        }
+
+
+# Instância global
+single_flight = SingleFlight()
@@ -0,0 +1,257 @@
+# backend/services/step_journal.py - Journal write-behind dos steps de workflow
+
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+
+try:
+    from services.supabase_async import supabase_async
+except ImportError:
+    from backend.services.supabase_async import supabase_async
+
+STEP_JOURNAL_MAX_BUFFER = int(os.getenv("STEP_JOURNAL_MAX_BUFFER", "5000"))
+STEP_JOURNAL_BATCH_SIZE = int(os.getenv("STEP_JOURNAL_BATCH_SIZE", "200"))
+STEP_JOURNAL_FLUSH_INTERVAL = float(os.getenv("STEP_JOURNAL_FLUSH_INTERVAL", "0.5"))
+STEP_JOURNAL_RETRY_BACKOFF = float(os.getenv("STEP_JOURNAL_RETRY_BACKOFF", "2.0"))
+
+_TERMINAL_STATUSES = {"completed", "failed", "skipped"}
+
+StepKey = Tuple[str, str]
+
+
+class StepJournal:
+    """Registro em lote dos steps de `agno_execution_steps`, fora do caminho crítico.
+
+    Início e fim de cada nó só atualizam um buffer em memória; uma task de
+    fundo grava os registros pendentes em upserts por (execution_id, node_id)
+    quando o lote enche ou o intervalo expira. Início e fim de um step que
+    caem no mesmo lote viram uma única linha. Com o buffer cheio, quem
+    registra aguarda a próxima gravação (backpressure) em vez de descartar.
+    Um step concluído e ainda não gravado quando o processo morre é
+    reexecutado na retomada; nós caros (agentes) usam `durable=True` para
+    que o checkpoint seja gravado antes de seguir.
+    """
+
+    def __init__(
+            self,
+            max_buffer: int = STEP_JOURNAL_MAX_BUFFER,
+            batch_size: int = STEP_JOURNAL_BATCH_SIZE,
+            flush_interval: float = STEP_JOURNAL_FLUSH_INTERVAL
+    ):
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        # Linha completa de cada step ativo e chaves com alterações pendentes
+        self._rows: Dict[StepKey, Dict[str, Any]] = {}
+        self._dirty: "OrderedDict[StepKey, float]" = OrderedDict()
+
+        self._wakeup: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Condition] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._closed = False
+
+        # Métricas
+        self.records = 0
+        self.rows_written = 0
+        self.batches = 0
+        self.flush_errors = 0
+        self.backpressure_waits = 0
+        self.checkpoints = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+
+    # ==================== REGISTRO ====================
+
+    def _ensure_started(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._wakeup = asyncio.Event()
+            self._space = asyncio.Condition()
+            self._flush_lock = asyncio.Lock()
+            self._closed = False
+            self._flusher = asyncio.ensure_future(self._run())
+
+    async def _reserve(self, key: StepKey) -> None:
+        """Aguarda espaço no buffer (chaves já pendentes não ocupam espaço novo)"""
+        if key in self._dirty or len(self._dirty) < self.max_buffer:
+            return
+        self.backpressure_waits += 1
+        self._wakeup.set()
+        async with self._space:
+            await self._space.wait_for(lambda: len(self._dirty) < self.max_buffer)
+
+    def _mark(self, key: StepKey) -> None:
+        self.records += 1
+        self._dirty.setdefault(key, time.monotonic())
+        if len(self._dirty) >= self.batch_size:
+            self._wakeup.set()
+
+    async def record_start(
+            self,
+            execution_id: Any,
+            node_id: str,
+            step_type: str,
+            input_data: Dict[str, Any]
+    ) -> None:
+        self._ensure_started()
+        key = (str(execution_id), str(node_id))
+        await self._reserve(key)
+        self._rows[key] = {
+            'execution_id': execution_id,
+            'node_id': node_id,
+            'step_type': step_type,
+            'input_data': input_data,
+            'output_data': None,
+            'status': 'running',
+            'error_message': None,
+            'started_at': datetime.utcnow().isoformat(),
+            'completed_at': None
+        }
+        self._mark(key)
+
+    async def record_finish(
+            self,
+            execution_id: Any,
+            node_id: str,
+            status: str,
+            output_data: Optional[Dict[str, Any]] = None,
+            error_message: Optional[str] = None,
+            durable: bool = False
+    ) -> None:
+        """Registra o fim do step; `durable` grava na hora (checkpoint de nós caros)"""
+        self._ensure_started()
+        key = (str(execution_id), str(node_id))
+        await self._reserve(key)
+        row = self._rows.setdefault(key, {
+            'execution_id': execution_id,
+            'node_id': node_id,
+            'step_type': None,
+            'input_data': None,
+            'started_at': None
+        })
+        row.update({
+            'status': status,
+            'output_data': output_data,
+            'error_message': error_message,
+            'completed_at': datetime.utcnow().isoformat()
+        })
+        self._mark(key)
+
+        if durable:
+            try:
+                await self.flush()
+                self.checkpoints += 1
+            except Exception as e:
+                # Continua no buffer: a task de fundo tenta de novo
+                logger.warning(f"⚠️ Checkpoint do nó {node_id} (execução {execution_id}) adiado: {e}")
+
+    # ==================== GRAVAÇÃO ====================
+
+    async def _write(self, rows) -> None:
+        await supabase_async.upsert('agno_execution_steps', rows, on_conflict='execution_id,node_id')
+
+    async def _flush_batch(self) -> int:
+        """Grava até `batch_size` registros pendentes; retorna quantos gravou"""
+        keys = []
+        while self._dirty and len(keys) < self.batch_size:
+            keys.append(self._dirty.popitem(last=False))
+        if not keys:
+            return 0
+
+        rows = [dict(self._rows[key]) for key, _ in keys]
+        try:
+            await self._write(rows)
+        except Exception:
+            # Devolve ao início do buffer preservando o instante original
+            for key, since in reversed(keys):
+                if key in self._dirty:
+                    since = min(since, self._dirty.pop(key))
+                self._dirty[key] = since
+                self._dirty.move_to_end(key, last=False)
+            raise
+
+        now = time.monotonic()
+        lag_ms = max((now - since) * 1000 for _, since in keys)
+        self.last_lag_ms = lag_ms
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        self.rows_written += len(rows)
+        self.batches += 1
+
+        # Steps finalizados saem da memória (se não mudaram durante a gravação)
+        for (key, _), row in zip(keys, rows):
+            if key not in self._dirty and row.get('status') in _TERMINAL_STATUSES:
+                self._rows.pop(key, None)
+
+        async with self._space:
+            self._space.notify_all()
+        return len(rows)
+
+    async def flush(self) -> None:
+        """Grava todos os registros pendentes (ex.: antes de finalizar a execução)"""
+        if self._flush_lock is None:
+            return
+        async with self._flush_lock:
+            while self._dirty:
+                await self._flush_batch()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                self.flush_errors += 1
+                logger.warning(f"⚠️ Falha ao gravar journal de steps ({len(self._dirty)} pendentes): {e}")
+                await asyncio.sleep(STEP_JOURNAL_RETRY_BACKOFF)
+
+            if self._closed and not self._dirty:
+                return
+
+    async def close(self, timeout: float = 30.0) -> None:
+        """Garante a gravação de tudo que está no buffer (shutdown)"""
+        if self._flusher is None:
+            return
+        self._closed = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._flusher, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"❌ Journal de steps encerrado com {len(self._dirty)} registros não gravados")
+        finally:
+            self._flusher = None
+        logger.info(f"✅ Journal de steps encerrado ({self.rows_written} linhas em {self.batches} lotes)")
+
+    # ==================== MÉTRICAS ====================
+
+    def get_stats(self) -> Dict[str, Any]:
+        oldest = next(iter(self._dirty.values()), None)
+        return {
+            "buffered": len(self._dirty),
+            "max_buffer": self.max_buffer,
+            "active_steps": len(self._rows),
+            "lag_ms": round((time.monotonic() - oldest) * 1000, 2) if oldest is not None else 0.0,
+            "last_flush_lag_ms": round(self.last_lag_ms, 2),
+            "max_flush_lag_ms": round(self.max_lag_ms, 2),
+            "records": self.records,
+            "rows_written": self.rows_written,
+            "batches": self.batches,
+            "avg_batch_size": round(self.rows_written / self.batches, 2) if self.batches else 0.0,
+            "flush_errors": self.flush_errors,
+            "backpressure_waits": self.backpressure_waits,
+            "checkpoints": self.checkpoints
+        }
+
+
+# Instância global do journal
+step_journal = StepJournal()
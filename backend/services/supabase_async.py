@@ -0,0 +1,324 @@
+# backend/services/supabase_async.py - Acesso assíncrono ao Supabase (PostgREST) com pool HTTP
+
+import os
+import time
+import asyncio
+import importlib.util
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+import httpx
+from loguru import logger
+
+SUPABASE_HTTP_MAX_CONNECTIONS = int(os.getenv("SUPABASE_HTTP_MAX_CONNECTIONS", "50"))
+SUPABASE_HTTP_MAX_KEEPALIVE = int(os.getenv("SUPABASE_HTTP_MAX_KEEPALIVE", "20"))
+SUPABASE_HTTP_TIMEOUT = float(os.getenv("SUPABASE_HTTP_TIMEOUT", "30"))
+SUPABASE_PIPELINE_CONCURRENCY = int(os.getenv("SUPABASE_PIPELINE_CONCURRENCY", "16"))
+SUPABASE_BATCH_SIZE = int(os.getenv("SUPABASE_BATCH_SIZE", "500"))
+SUPABASE_MAX_RETRIES = int(os.getenv("SUPABASE_MAX_RETRIES", "2"))
+
+# HTTP/2 (multiplexação das requisições do pipeline) quando o `h2` está instalado
+SUPABASE_HTTP2 = importlib.util.find_spec("h2") is not None
+
+# Amostras mantidas por operação para os percentis de latência
+_LATENCY_SAMPLES = 512
+
+Filters = Dict[str, Any]
+
+
+class SupabaseAsyncError(Exception):
+    """Erro retornado pelo PostgREST"""
+
+    def __init__(self, status_code: int, message: str, operation: str):
+        super().__init__(f"{operation}: HTTP {status_code} - {message}")
+        self.status_code = status_code
+        self.operation = operation
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def build_filters(filters: Optional[Filters]) -> List[Tuple[str, str]]:
+    """Converte {coluna: valor} em parâmetros PostgREST.
+
+    Valores simples viram `eq`; tuplas (operador, valor) usam o operador
+    informado, ex.: {"id": ("in", [1, 2])}, {"created_at": ("lt", ts)}.
+    """
+    params: List[Tuple[str, str]] = []
+    for column, value in (filters or {}).items():
+        if value is None:
+            params.append((column, "is.null"))
+        elif isinstance(value, tuple):
+            op, operand = value
+            if op in ("in", "not.in"):
+                operand = "(" + ",".join(_format_value(v) for v in operand) + ")"
+            elif operand is None:
+                operand = "null"
+            params.append((column, f"{op}.{_format_value(operand)}"))
+        else:
+            params.append((column, f"eq.{_format_value(value)}"))
+    return params
+
+
+class _OperationStats:
+    __slots__ = ("calls", "errors", "retries", "total_ms", "max_ms", "samples")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.samples: Deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+
+    def snapshot(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+
+        def percentile(p: float) -> float:
+            if not ordered:
+                return 0.0
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 2)
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_ms": round(self.total_ms / self.calls, 2) if self.calls else 0.0,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "max_ms": round(self.max_ms, 2)
+        }
+
+
+class AsyncSupabase:
+    """Cliente PostgREST assíncrono sobre um `httpx.AsyncClient` compartilhado.
+
+    Substitui o cliente síncrono do Supabase nos serviços async: as chamadas
+    não bloqueiam o event loop, reaproveitam conexões keep-alive e podem ser
+    disparadas em paralelo (`pipeline`). Inserções em lote são divididas em
+    blocos de `batch_size`. Cada operação registra latência por tabela.
+    """
+
+    def __init__(
+            self,
+            url: Optional[str] = None,
+            key: Optional[str] = None,
+            max_connections: int = SUPABASE_HTTP_MAX_CONNECTIONS,
+            pipeline_concurrency: int = SUPABASE_PIPELINE_CONCURRENCY,
+            batch_size: int = SUPABASE_BATCH_SIZE
+    ):
+        self.url = (url or os.getenv("SUPABASE_URL") or "").rstrip("/")
+        self.key = key or os.getenv("SUPABASE_KEY")
+        self.max_connections = max_connections
+        self.pipeline_concurrency = pipeline_concurrency
+        self.batch_size = batch_size
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_pid: Optional[int] = None
+        self._stats: Dict[str, _OperationStats] = defaultdict(_OperationStats)
+
+    # ==================== CLIENTE ====================
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Processos filhos (workers) criam seu próprio pool
+        if self._client is None or self._client_pid != os.getpid():
+            if not self.url or not self.key:
+                raise RuntimeError("SUPABASE_URL e SUPABASE_KEY devem estar configurados")
+
+            self._client = httpx.AsyncClient(
+                base_url=f"{self.url}/rest/v1",
+                headers={
+                    "apikey": self.key,
+                    "Authorization": f"Bearer {self.key}",
+                    "Content-Type": "application/json"
+                },
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=SUPABASE_HTTP_MAX_KEEPALIVE
+                ),
+                timeout=httpx.Timeout(SUPABASE_HTTP_TIMEOUT),
+                http2=SUPABASE_HTTP2
+            )
+            self._client_pid = os.getpid()
+            logger.info(f"🔌 Pool HTTP do Supabase criado (max={self.max_connections}, http2={SUPABASE_HTTP2})")
+        return self._client
+
+    async def _request(
+            self,
+            operation: str,
+            method: str,
+            path: str,
+            params: Optional[List[Tuple[str, str]]] = None,
+            json_body: Any = None,
+            prefer: Optional[str] = None,
+            retry: bool = False
+    ) -> Any:
+        client = self._get_client()
+        headers = {"Prefer": prefer} if prefer else None
+        stats = self._stats[operation]
+        attempts = SUPABASE_MAX_RETRIES + 1 if retry else 1
+
+        start = time.perf_counter()
+        try:
+            for attempt in range(attempts):
+                try:
+                    response = await client.request(method, path, params=params, json=json_body, headers=headers)
+                    if response.status_code >= 500 and attempt < attempts - 1:
+                        raise httpx.TransportError(f"HTTP {response.status_code}")
+                    break
+                except httpx.TransportError:
+                    if attempt == attempts - 1:
+                        raise
+                    stats.retries += 1
+                    await asyncio.sleep(0.2 * (2 ** attempt))
+
+            if response.status_code >= 400:
+                try:
+                    message = response.json().get("message", response.text)
+                except ValueError:
+                    message = response.text
+                raise SupabaseAsyncError(response.status_code, message, operation)
+
+            if response.status_code == 204 or not response.content:
+                return None
+            return response.json()
+
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            stats.calls += 1
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            stats.samples.append(elapsed_ms)
+
+    # ==================== OPERAÇÕES ====================
+
+    async def select(
+            self,
+            table: str,
+            columns: str = "*",
+            filters: Optional[Filters] = None,
+            order: Optional[str] = None,
+            desc: bool = False,
+            limit: Optional[int] = None,
+            offset: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        params = [("select", columns)] + build_filters(filters)
+        if order:
+            params.append(("order", f"{order}.{'desc' if desc else 'asc'}"))
+        if limit is not None:
+            params.append(("limit", str(limit)))
+        if offset:
+            params.append(("offset", str(offset)))
+        return await self._request(f"select:{table}", "GET", f"/{table}", params=params, retry=True) or []
+
+    async def select_one(self, table: str, columns: str = "*", filters: Optional[Filters] = None) -> Optional[Dict[str, Any]]:
+        rows = await self.select(table, columns, filters, limit=1)
+        return rows[0] if rows else None
+
+    async def insert(
+            self,
+            table: str,
+            rows: Union[Dict[str, Any], Sequence[Dict[str, Any]]],
+            returning: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Insere uma linha ou um lote (dividido em blocos enviados em paralelo)"""
+        return await self._write_batches(f"insert:{table}", table, rows, returning, resolution=None, on_conflict=None)
+
+    async def upsert(
+            self,
+            table: str,
+            rows: Union[Dict[str, Any], Sequence[Dict[str, Any]]],
+            on_conflict: str,
+            returning: bool = False
+    ) -> List[Dict[str, Any]]:
+        return await self._write_batches(
+            f"upsert:{table}", table, rows, returning, resolution="merge-duplicates", on_conflict=on_conflict
+        )
+
+    async def _write_batches(
+            self,
+            operation: str,
+            table: str,
+            rows: Union[Dict[str, Any], Sequence[Dict[str, Any]]],
+            returning: bool,
+            resolution: Optional[str],
+            on_conflict: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        rows = [rows] if isinstance(rows, dict) else list(rows)
+        if not rows:
+            return []
+
+        prefer = ["return=representation" if returning else "return=minimal"]
+        if resolution:
+            prefer.append(f"resolution={resolution}")
+        params = [("on_conflict", on_conflict)] if on_conflict else None
+        # Upserts são idempotentes e podem ser repetidos em falhas transitórias
+        retry = resolution is not None
+
+        chunks = [rows[i:i + self.batch_size] for i in range(0, len(rows), self.batch_size)]
+        results = await self.pipeline(*[
+            self._request(operation, "POST", f"/{table}", params=params, json_body=chunk,
+                          prefer=",".join(prefer), retry=retry)
+            for chunk in chunks
+        ])
+        return [row for result in results for row in (result or [])]
+
+    async def update(
+            self,
+            table: str,
+            values: Dict[str, Any],
+            filters: Filters,
+            returning: bool = True
+    ) -> List[Dict[str, Any]]:
+        if not filters:
+            raise ValueError("update sem filtros não é permitido")
+        return await self._request(
+            f"update:{table}", "PATCH", f"/{table}", params=build_filters(filters), json_body=values,
+            prefer="return=representation" if returning else "return=minimal"
+        ) or []
+
+    async def delete(self, table: str, filters: Filters) -> None:
+        if not filters:
+            raise ValueError("delete sem filtros não é permitido")
+        await self._request(f"delete:{table}", "DELETE", f"/{table}", params=build_filters(filters),
+                            prefer="return=minimal")
+
+    async def rpc(self, function: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        return await self._request(f"rpc:{function}", "POST", f"/rpc/{function}", json_body=params or {})
+
+    async def pipeline(self, *calls: Awaitable[Any]) -> List[Any]:
+        """Dispara várias chamadas em paralelo sobre o mesmo pool (ordem preservada)"""
+        if len(calls) == 1:
+            return [await calls[0]]
+
+        semaphore = asyncio.Semaphore(self.pipeline_concurrency)
+
+        async def bounded(call: Awaitable[Any]) -> Any:
+            async with semaphore:
+                return await call
+
+        return list(await asyncio.gather(*(bounded(call) for call in calls)))
+
+    # ==================== MÉTRICAS ====================
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "http2": SUPABASE_HTTP2,
+            "max_connections": self.max_connections,
+            "operations": {name: stats.snapshot() for name, stats in sorted(self._stats.items())}
+        }
+
+    async def aclose(self) -> None:
+        if self._client is not None and self._client_pid == os.getpid():
+            await self._client.aclose()
+        self._client = None
+
+
+# Instância global do cliente
+supabase_async = AsyncSupabase()
@@ -0,0 +1,153 @@
+# backend/services/team_loader.py - Carregamento em lote de teams com seus agentes
+
+import json
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+try:
+    from models.agents import Agent, Team, TeamAgent
+except ImportError:
+    from backend.models.agents import Agent, Team, TeamAgent
+
+TEAM_LIST_DEFAULT_LIMIT = 100
+TEAM_LIST_MAX_LIMIT = 500
+
+
+def _decode_json(value: Any, default: Any) -> Any:
+    """Decodifica colunas JSON gravadas como string (dados legados)"""
+    if not value:
+        return default
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return default
+    return value
+
+
+def serialize_team_agent(team_agent: TeamAgent, agent: Agent) -> Dict[str, Any]:
+    """Dados de um agente dentro do team (instruções/tools normalizadas)"""
+    agent_config = _decode_json(team_agent.agent_config, {})
+    if not isinstance(agent_config, dict):
+        agent_config = {}
+
+    instructions = agent.instructions if agent.instructions else []
+    if isinstance(instructions, str):
+        try:
+            instructions = json.loads(instructions)
+        except ValueError:
+            instructions = [instructions]
+
+    tools = _decode_json(agent.tools, [])
+    if isinstance(tools, list):
+        tools = [
+            t if isinstance(t, dict) else {"tool_id": str(t), "config": {}}
+            for t in tools
+        ]
+
+    return {
+        "id": agent.id,
+        "name": agent.name,
+        "role": agent.role,
+        "description": agent.description or "",
+        "model_provider": agent.model_provider,
+        "model_id": agent.model_id,
+        "instructions": instructions,
+        "tools": tools,
+        "memory_enabled": agent.memory_enabled,
+        "rag_enabled": agent.rag_enabled,
+        "rag_index_id": agent.rag_index_id,
+        # Versão da linha: o pool de agentes descarta instâncias antigas
+        "updated_at": agent.updated_at,
+        "role_in_team": team_agent.role_in_team,
+        "priority": team_agent.priority,
+        "config": agent_config
+    }
+
+
+def serialize_team(team: Team, agents_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Dados completos de um team"""
+    team_config = _decode_json(team.team_configuration, {})
+    if not isinstance(team_config, dict):
+        team_config = {}
+
+    return {
+        "id": team.id,
+        "name": team.name,
+        "description": team.description or "",
+        "team_type": team.team_type,
+        "supervisor_agent_id": team.supervisor_agent_id,
+        "team_configuration": team_config,
+        "is_active": team.is_active,
+        "created_at": team.created_at,
+        "updated_at": team.updated_at,
+        "agents": agents_data,
+        "agent_count": len(agents_data)
+    }
+
+
+async def load_team_members(
+        db: AsyncSession,
+        team_ids: Iterable[int]
+) -> Dict[int, List[Dict[str, Any]]]:
+    """Membros ativos de vários teams numa única consulta (JOIN + IN)"""
+    team_ids = list(team_ids)
+    members: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    if not team_ids:
+        return members
+
+    result = await db.execute(
+        select(TeamAgent, Agent)
+        .join(Agent, TeamAgent.agent_id == Agent.id)
+        .where(
+            TeamAgent.team_id.in_(team_ids),
+            TeamAgent.is_active == True,
+            Agent.is_active == True
+        )
+        .order_by(TeamAgent.team_id.asc(), TeamAgent.priority.asc())
+    )
+    for team_agent, agent in result.all():
+        members[team_agent.team_id].append(serialize_team_agent(team_agent, agent))
+    return members
+
+
+async def count_active_teams(db: AsyncSession, user_id: int) -> int:
+    """Total de teams ativos do usuário (para paginação)"""
+    result = await db.execute(
+        select(func.count(Team.id)).where(Team.user_id == user_id, Team.is_active == True)
+    )
+    return int(result.scalar() or 0)
+
+
+async def load_teams_with_agents(
+        db: AsyncSession,
+        user_id: int,
+        team_ids: Optional[Iterable[int]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0
+) -> List[Dict[str, Any]]:
+    """Teams ativos do usuário com seus agentes em duas consultas.
+
+    A quantidade de consultas não depende do número de teams: uma busca a
+    página de teams e outra traz todos os membros (team_agents + agents).
+    """
+    query = (
+        select(Team)
+        .where(Team.user_id == user_id, Team.is_active == True)
+        .order_by(Team.created_at.desc(), Team.id.desc())
+    )
+    if team_ids is not None:
+        query = query.where(Team.id.in_(list(team_ids)))
+    if offset:
+        query = query.offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+
+    result = await db.execute(query)
+    teams = result.scalars().all()
+
+    members = await load_team_members(db, [team.id for team in teams])
+    return [serialize_team(team, members.get(team.id, [])) for team in teams]
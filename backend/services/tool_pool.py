@@ -0,0 +1,142 @@
+# backend/services/tool_pool.py - Pool de instâncias de ferramentas Agno reutilizáveis
+
+import os
+import time
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from loguru import logger
+
+# Ferramentas que mantêm sessão HTTP/estado pandas e não podem ser usadas por
+# várias execuções ao mesmo tempo: cada agente construído recebe a sua própria
+# instância, que vive enquanto o agente viver (no agent_pool, um agente
+# emprestado só atende uma execução por vez)
+THREAD_UNSAFE_TOOLS: Set[str] = {
+    t.strip() for t in os.getenv(
+        "TOOL_POOL_THREAD_UNSAFE",
+        "duckduckgo,web_search,yfinance,financial,google_search,youtube,python_code,file_tools"
+    ).split(",") if t.strip()
+}
+
+
+def freeze_config(value: Any) -> Hashable:
+    """Converte a configuração da ferramenta numa chave imutável e estável"""
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), freeze_config(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze_config(v) for v in value)
+    if isinstance(value, set):
+        return tuple(sorted(repr(freeze_config(v)) for v in value))
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+class ToolPool:
+    """Pool de instâncias de ferramentas indexado por (tool_id, config congelada).
+
+    Ferramentas sem estado são compartilhadas por todo o processo e sua
+    construção sai do caminho de cada requisição. As listadas em
+    THREAD_UNSAFE_TOOLS nunca são compartilhadas: `get()` cria uma instância
+    nova, que fica presa ao agente em construção (e é reaproveitada junto com
+    ele pelo agent_pool), independentemente da thread que construiu ou que
+    executa o agente.
+    """
+
+    def __init__(self, thread_unsafe: Optional[Set[str]] = None):
+        self.thread_unsafe = set(thread_unsafe if thread_unsafe is not None else THREAD_UNSAFE_TOOLS)
+
+        self._shared: Dict[Tuple[str, Hashable], Any] = {}
+        self._lock = threading.Lock()
+
+        # Contadores por ferramenta
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _record(self, tool_id: str, hit: bool, build_ms: float = 0.0) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(tool_id, {
+                "hits": 0, "misses": 0, "instances": 0, "total_build_ms": 0.0, "build_time_saved_ms": 0.0
+            })
+            if hit:
+                stats["hits"] += 1
+                if stats["instances"]:
+                    stats["build_time_saved_ms"] += stats["total_build_ms"] / stats["instances"]
+            else:
+                stats["misses"] += 1
+                stats["instances"] += 1
+                stats["total_build_ms"] += build_ms
+
+    def get(self, tool_id: str, config: Optional[Dict[str, Any]], factory: Callable[[], Any]) -> Any:
+        """Retorna a instância da ferramenta para o agente em construção.
+
+        Ferramentas compartilháveis vêm do pool; as de THREAD_UNSAFE_TOOLS são
+        sempre instâncias novas, exclusivas do agente que as recebe.
+        """
+        key = (tool_id, freeze_config(config or {}))
+
+        if tool_id in self.thread_unsafe:
+            start = time.perf_counter()
+            instance = factory()
+            self._record(tool_id, hit=False, build_ms=(time.perf_counter() - start) * 1000)
+            logger.debug(f"🔧 Ferramenta {tool_id} criada exclusivamente para um agente")
+            return instance
+
+        instance = self._shared.get(key)
+        if instance is not None:
+            self._record(tool_id, hit=True)
+            return instance
+
+        start = time.perf_counter()
+        instance = factory()
+        build_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            # Outra thread pode ter construído a mesma ferramenta em paralelo
+            existing = self._shared.get(key)
+            if existing is None:
+                self._shared[key] = instance
+            else:
+                instance = existing
+
+        self._record(tool_id, hit=False, build_ms=build_ms)
+        logger.debug(f"🔧 Ferramenta {tool_id} adicionada ao pool compartilhado")
+        return instance
+
+    def invalidate(self, tool_id: Optional[str] = None) -> None:
+        """Descarta instâncias (de uma ferramenta ou de todas)"""
+        with self._lock:
+            if tool_id is None:
+                self._shared.clear()
+            else:
+                for key in [k for k in self._shared if k[0] == tool_id]:
+                    del self._shared[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores do pool para monitoramento"""
+        with self._lock:
+            per_tool = {
+                tool_id: {
+                    "hits": int(s["hits"]),
+                    "misses": int(s["misses"]),
+                    "instances": int(s["instances"]),
+                    "avg_build_ms": round(s["total_build_ms"] / s["instances"], 2) if s["instances"] else 0.0,
+                    "build_time_saved_ms": round(s["build_time_saved_ms"], 2),
+                    "per_agent": tool_id in self.thread_unsafe
+                }
+                for tool_id, s in self._stats.items()
+            }
+            hits = sum(s["hits"] for s in per_tool.values())
+            misses = sum(s["misses"] for s in per_tool.values())
+            return {
+                "shared_instances": len(self._shared),
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                "tools": per_tool
+            }
+
+
+# Instância global do pool
+tool_pool = ToolPool()
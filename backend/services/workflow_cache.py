@@ -0,0 +1,81 @@
+# backend/services/workflow_cache.py - Cache curto das consultas de workflows
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from loguru import logger
+
+
+class WorkflowCache:
+    """Cache TTL em processo para listagens e detalhes de workflows.
+
+    As entradas são agrupadas por usuário: qualquer escrita do usuário
+    invalida todas as páginas dele neste processo. Outros workers uvicorn
+    enxergam a alteração no máximo após `ttl_seconds`.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 5.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[Tuple[int, Hashable], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Contadores
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id: int, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[(user_id, key)]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end((user_id, key))
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user_id: int, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[(user_id, key)] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end((user_id, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            keys = [k for k in self._entries if k[0] == user_id]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += 1
+
+        if keys:
+            logger.debug(f"♻️ {len(keys)} consulta(s) de workflows removidas do cache (usuário {user_id})")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations
+            }
+
+
+# Instância global do cache
+workflow_cache = WorkflowCache(
+    max_entries=int(os.getenv("WORKFLOW_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("WORKFLOW_CACHE_TTL", "5"))
+)
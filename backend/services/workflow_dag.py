@@ -0,0 +1,394 @@
+# backend/services/workflow_dag.py - Agendador DAG para workflows visuais
+
+import os
+import ast
+import time
+import asyncio
+import operator
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Set
+
+from loguru import logger
+
+WORKFLOW_MAX_PARALLEL_NODES = int(os.getenv("WORKFLOW_MAX_PARALLEL_NODES", "4"))
+
+# Rótulos aceitos nas conexões que saem de um nó `condition`
+_TRUE_LABELS = {"true", "yes", "sim", "1"}
+_FALSE_LABELS = {"false", "no", "nao", "não", "0", "else"}
+
+
+class WorkflowGraphError(ValueError):
+    """Grafo do workflow inválido (ciclo, nó inexistente, sem início)"""
+
+
+class ConditionError(ValueError):
+    """Expressão de condição inválida ou não permitida"""
+
+
+# ==================== CONDIÇÕES ====================
+
+_COMPARISONS = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne,
+    ast.Lt: operator.lt, ast.LtE: operator.le,
+    ast.Gt: operator.gt, ast.GtE: operator.ge,
+    ast.In: lambda a, b: a in b, ast.NotIn: lambda a, b: a not in b,
+    ast.Is: operator.is_, ast.IsNot: operator.is_not,
+}
+_BIN_OPS = {
+    ast.Add: operator.add, ast.Sub: operator.sub,
+    ast.Mult: operator.mul, ast.Div: operator.truediv, ast.Mod: operator.mod,
+}
+_SAFE_FUNCS = {"len": len, "str": str, "int": int, "float": float, "bool": bool, "lower": str.lower}
+
+
+def _lookup(data: Mapping[str, Any], name: str) -> Any:
+    if name in ("true", "True"):
+        return True
+    if name in ("false", "False"):
+        return False
+    if name in ("null", "None"):
+        return None
+    return data.get(name) if isinstance(data, Mapping) else None
+
+
+def _eval_node(node: ast.AST, data: Mapping[str, Any]) -> Any:
+    if isinstance(node, ast.Expression):
+        return _eval_node(node.body, data)
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.Name):
+        return _lookup(data, node.id)
+    if isinstance(node, ast.Attribute):
+        # Acesso a campos aninhados: output.status -> data["output"]["status"]
+        base = _eval_node(node.value, data)
+        return base.get(node.attr) if isinstance(base, Mapping) else None
+    if isinstance(node, ast.Subscript):
+        base = _eval_node(node.value, data)
+        key = _eval_node(node.slice, data)
+        try:
+            return base[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return [_eval_node(e, data) for e in node.elts]
+    if isinstance(node, ast.BoolOp):
+        values = (_eval_node(v, data) for v in node.values)
+        return all(values) if isinstance(node.op, ast.And) else any(values)
+    if isinstance(node, ast.UnaryOp):
+        operand = _eval_node(node.operand, data)
+        if isinstance(node.op, ast.Not):
+            return not operand
+        if isinstance(node.op, ast.USub):
+            return -operand
+        if isinstance(node.op, ast.UAdd):
+            return +operand
+    if isinstance(node, ast.BinOp) and type(node.op) in _BIN_OPS:
+        return _BIN_OPS[type(node.op)](_eval_node(node.left, data), _eval_node(node.right, data))
+    if isinstance(node, ast.Compare):
+        left = _eval_node(node.left, data)
+        for op, comparator in zip(node.ops, node.comparators):
+            right = _eval_node(comparator, data)
+            try:
+                if not _COMPARISONS[type(op)](left, right):
+                    return False
+            except TypeError:
+                return False
+            left = right
+        return True
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _SAFE_FUNCS \
+            and not node.keywords:
+        return _SAFE_FUNCS[node.func.id](*[_eval_node(a, data) for a in node.args])
+
+    raise ConditionError(f"Construção não permitida na condição: {type(node).__name__}")
+
+
+def evaluate_condition(expression: Optional[str], data: Mapping[str, Any]) -> bool:
+    """Avalia uma condição de forma segura (sem eval) sobre os dados do nó.
+
+    Aceita comparações, and/or/not, aritmética simples, acesso a campos
+    (`output.status`, `data['score']`) e algumas funções (len, str, lower...).
+    Condição vazia é sempre verdadeira. Qualquer erro durante a avaliação
+    (ex.: `len(None)`, `x + 1` com x nulo) vira `ConditionError`: é uma falha
+    determinística do workflow, não algo a ser repetido pela fila.
+    """
+    if expression is None:
+        return True
+    expression = str(expression).strip()
+    if not expression or expression.lower() in _TRUE_LABELS:
+        return True
+    if expression.lower() in _FALSE_LABELS:
+        return False
+
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as e:
+        raise ConditionError(f"Condição inválida '{expression}': {e.msg}")
+
+    try:
+        return bool(_eval_node(tree, data))
+    except ConditionError:
+        raise
+    except Exception as e:
+        raise ConditionError(f"Erro ao avaliar a condição '{expression}': {type(e).__name__}: {e}")
+
+
+# ==================== GRAFO ====================
+
+def _field(obj: Any, name: str, default: Any = None) -> Any:
+    """Lê atributo de dataclass ou chave de dict"""
+    if isinstance(obj, Mapping):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+@dataclass
+class WorkflowEdge:
+    from_node: str
+    to_node: str
+    condition: Optional[str] = None
+
+
+class WorkflowGraph:
+    """Grafo do workflow com adjacência pré-calculada.
+
+    Cada etapa do agendador consulta apenas as arestas de saída do nó
+    concluído (O(grau de saída)), sem percorrer a lista de conexões.
+    """
+
+    def __init__(self, nodes: List[Any], connections: List[Any]):
+        self.nodes: Dict[str, Any] = {}
+        for node in nodes:
+            self.nodes[str(_field(node, "id"))] = node
+
+        self.outgoing: Dict[str, List[WorkflowEdge]] = defaultdict(list)
+        self.incoming: Dict[str, List[WorkflowEdge]] = defaultdict(list)
+        for conn in connections:
+            edge = WorkflowEdge(
+                from_node=str(_field(conn, "from_node")),
+                to_node=str(_field(conn, "to_node")),
+                condition=_field(conn, "condition")
+            )
+            if edge.from_node not in self.nodes or edge.to_node not in self.nodes:
+                raise WorkflowGraphError(f"Conexão inválida: {edge.from_node} -> {edge.to_node}")
+            self.outgoing[edge.from_node].append(edge)
+            self.incoming[edge.to_node].append(edge)
+
+        self.order = self._topological_order()
+
+    def node_type(self, node_id: str) -> str:
+        return _field(self.nodes[node_id], "type", "")
+
+    def _topological_order(self) -> List[str]:
+        """Ordenação de Kahn; falha se houver ciclo"""
+        in_degree = {node_id: len(self.incoming[node_id]) for node_id in self.nodes}
+        queue = deque(node_id for node_id, degree in in_degree.items() if degree == 0)
+        order = []
+        while queue:
+            node_id = queue.popleft()
+            order.append(node_id)
+            for edge in self.outgoing[node_id]:
+                in_degree[edge.to_node] -= 1
+                if in_degree[edge.to_node] == 0:
+                    queue.append(edge.to_node)
+
+        if len(order) != len(self.nodes):
+            cyclic = sorted(node_id for node_id, degree in in_degree.items() if degree > 0)
+            raise WorkflowGraphError(f"Workflow contém ciclo envolvendo os nós: {', '.join(cyclic)}")
+        return order
+
+    @property
+    def start_nodes(self) -> List[str]:
+        return [node_id for node_id in self.order if self.node_type(node_id) == "start"]
+
+
+# ==================== AGENDADOR ====================
+
+@dataclass
+class DagRunResult:
+    status: str  # completed | failed
+    output_data: Dict[str, Any]
+    node_outputs: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    skipped: Set[str] = field(default_factory=set)
+    failed_node: Optional[str] = None
+    error: Optional[str] = None
+    duration_ms: int = 0
+    peak_parallelism: int = 0
+    resumed: int = 0
+    # False: falha determinística (condição inválida), não adianta repetir
+    retryable: bool = True
+
+
+NodeRunner = Callable[[Any, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class DagScheduler:
+    """Executa um `WorkflowGraph` respeitando dependências.
+
+    - Um nó fica pronto quando todas as arestas de entrada foram resolvidas.
+    - Ramos independentes rodam em paralelo, limitados por `max_concurrency`.
+    - Nós com várias entradas ativas (merge) recebem as saídas combinadas.
+    - Arestas cuja condição é falsa não são seguidas; um nó sem nenhuma
+      entrada ativa é pulado e o salto se propaga para os sucessores.
+    - Nós presentes em `completed` (retomada após crash) não são executados
+      de novo: a saída registrada é reaproveitada.
+    - Um passo que devolve `retryable: False` (ou uma `ConditionError`) marca
+      o resultado como não repetível: a fila encerra a execução direto.
+    """
+
+    def __init__(self, graph: WorkflowGraph, run_node: NodeRunner, max_concurrency: int = WORKFLOW_MAX_PARALLEL_NODES):
+        self.graph = graph
+        self.run_node = run_node
+        self.max_concurrency = max(1, max_concurrency)
+
+    def _edge_active(self, edge: WorkflowEdge, output: Dict[str, Any]) -> bool:
+        condition = edge.condition
+        if condition is None or not str(condition).strip():
+            return True
+
+        # Ramos true/false de um nó de condição
+        if self.graph.node_type(edge.from_node) == "condition":
+            label = str(condition).strip().lower()
+            if label in _TRUE_LABELS or label in _FALSE_LABELS:
+                return bool(output.get("condition_result", True)) == (label in _TRUE_LABELS)
+
+        return evaluate_condition(condition, output)
+
+    @staticmethod
+    def _merge_inputs(inputs: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Combina as saídas dos predecessores diretos.
+
+        `branches` guarda só as chaves de primeiro nível de cada predecessor
+        (sem o `branches` dele): merges encadeados não aninham de novo toda a
+        saída anterior, e o tamanho não cresce com a profundidade do grafo.
+        """
+        if len(inputs) == 1:
+            return next(iter(inputs.values()))
+
+        merged: Dict[str, Any] = {}
+        branches: Dict[str, Dict[str, Any]] = {}
+        for source, output in inputs.items():
+            top_level = {key: value for key, value in output.items() if key != "branches"}
+            merged.update(top_level)
+            branches[source] = top_level
+        merged["branches"] = branches
+        return merged
+
+    async def run(
+            self,
+            input_data: Dict[str, Any],
+            completed: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> DagRunResult:
+        graph = self.graph
+        completed = completed or {}
+        starts = graph.start_nodes
+        if not starts:
+            raise WorkflowGraphError("Workflow deve ter um nó de início")
+
+        begin = time.perf_counter()
+        pending_inputs = {node_id: len(graph.incoming[node_id]) for node_id in graph.nodes}
+        active_inputs: Dict[str, Dict[str, Dict[str, Any]]] = defaultdict(dict)
+        outputs: Dict[str, Dict[str, Any]] = {}
+        skipped: Set[str] = set()
+        result = DagRunResult(status="completed", output_data=input_data)
+
+        ready: deque = deque()
+        for node_id in graph.order:
+            if pending_inputs[node_id] == 0:
+                if node_id in starts:
+                    ready.append((node_id, input_data))
+                else:
+                    # Nós soltos (sem entrada e que não são início) não executam
+                    skipped.add(node_id)
+
+        def resolve(node_id: str, output: Optional[Dict[str, Any]]) -> None:
+            """Resolve as arestas de saída de um nó concluído (output) ou pulado (None)"""
+            stack = [(node_id, output)]
+            while stack:
+                source, source_output = stack.pop()
+                for edge in graph.outgoing[source]:
+                    target = edge.to_node
+                    if source_output is not None and self._edge_active(edge, source_output):
+                        active_inputs[target][source] = source_output
+                    pending_inputs[target] -= 1
+                    if pending_inputs[target] > 0:
+                        continue
+                    if active_inputs[target]:
+                        ready.append((target, self._merge_inputs(active_inputs.pop(target))))
+                    else:
+                        skipped.add(target)
+                        stack.append((target, None))
+
+        for node_id in list(skipped):
+            resolve(node_id, None)
+
+        running: Dict[asyncio.Task, str] = {}
+        try:
+            while ready or running:
+                while ready and len(running) < self.max_concurrency:
+                    node_id, node_input = ready.popleft()
+                    if node_id in completed:
+                        outputs[node_id] = completed[node_id]
+                        result.resumed += 1
+                        try:
+                            resolve(node_id, completed[node_id])
+                        except ConditionError as e:
+                            result.status = "failed"
+                            result.failed_node = node_id
+                            result.error = str(e)
+                            result.retryable = False
+                            return result
+                        continue
+                    task = asyncio.ensure_future(self.run_node(graph.nodes[node_id], node_input))
+                    running[task] = node_id
+                result.peak_parallelism = max(result.peak_parallelism, len(running))
+                if not running:
+                    continue
+
+                done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    node_id = running.pop(task)
+                    try:
+                        step = task.result()
+                    except Exception as e:
+                        step = {"status": "failed", "error": str(e), "retryable": not isinstance(e, ConditionError)}
+
+                    if step.get("status") == "failed":
+                        result.status = "failed"
+                        result.failed_node = node_id
+                        result.error = step.get("error")
+                        result.retryable = step.get("retryable", True)
+                        logger.warning(f"⚠️ Nó {node_id} falhou; interrompendo workflow")
+                        return result
+
+                    output = step.get("output_data") or {}
+                    outputs[node_id] = output
+                    try:
+                        resolve(node_id, output)
+                    except ConditionError as e:
+                        result.status = "failed"
+                        result.failed_node = node_id
+                        result.error = str(e)
+                        result.retryable = False
+                        return result
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running.keys(), return_exceptions=True)
+
+            result.node_outputs = outputs
+            result.skipped = skipped
+            result.duration_ms = int((time.perf_counter() - begin) * 1000)
+
+        # Saída final: nós `end` executados (ou o último nó concluído)
+        end_outputs = {
+            node_id: outputs[node_id] for node_id in graph.order
+            if node_id in outputs and graph.node_type(node_id) == "end"
+        }
+        if end_outputs:
+            result.output_data = self._merge_inputs(end_outputs)
+        elif outputs:
+            last = next(node_id for node_id in reversed(graph.order) if node_id in outputs)
+            result.output_data = outputs[last]
+        return result
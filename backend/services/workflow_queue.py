@@ -0,0 +1,174 @@
+# backend/services/workflow_queue.py - Fila durável de execuções de workflow
+
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+try:
+    from services.supabase_async import supabase_async
+except ImportError:
+    from backend.services.supabase_async import supabase_async
+
+WORKFLOW_LEASE_SECONDS = int(os.getenv("WORKFLOW_LEASE_SECONDS", "60"))
+WORKFLOW_MAX_ATTEMPTS = int(os.getenv("WORKFLOW_MAX_ATTEMPTS", "3"))
+WORKFLOW_RETRY_BACKOFF_S = float(os.getenv("WORKFLOW_RETRY_BACKOFF_S", "10"))
+
+
+class WorkflowQueue:
+    """Fila de execuções persistida em `agno_workflow_executions`.
+
+    O claim usa a função SQL `agno_claim_workflow_execution` (FOR UPDATE
+    SKIP LOCKED) e cada execução reservada tem um lease renovado por
+    heartbeat. Se o worker morrer, o lease expira e outro worker retoma a
+    execução a partir dos steps já concluídos.
+    """
+
+    def __init__(
+            self,
+            lease_seconds: int = WORKFLOW_LEASE_SECONDS,
+            max_attempts: int = WORKFLOW_MAX_ATTEMPTS,
+            retry_backoff_s: float = WORKFLOW_RETRY_BACKOFF_S
+    ):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff_s = retry_backoff_s
+        self._lock = threading.Lock()
+
+        # Contadores (por processo)
+        self.enqueued = 0
+        self.claimed = 0
+        self.completed = 0
+        self.failed = 0
+        self.requeued = 0
+        self.leases_lost = 0
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    async def enqueue(
+            self,
+            workflow_id: int,
+            user_id: int,
+            input_data: Dict[str, Any],
+            visual_definition: Dict[str, Any]
+    ) -> str:
+        """Registra a execução como `queued` (com snapshot da definição)"""
+        rows = await supabase_async.insert('agno_workflow_executions', {
+            'workflow_id': workflow_id,
+            'user_id': user_id,
+            'input_data': input_data,
+            'visual_definition': visual_definition,
+            'execution_status': 'queued',
+            'max_attempts': self.max_attempts
+        })
+        self._count('enqueued')
+        return str(rows[0]['id'])
+
+    async def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Reserva a próxima execução disponível (ou None se a fila estiver vazia)"""
+        rows = await supabase_async.rpc('agno_claim_workflow_execution', {
+            'p_worker_id': worker_id,
+            'p_lease_seconds': self.lease_seconds
+        })
+        if not rows:
+            return None
+
+        execution = rows[0]
+        self._count('claimed')
+        logger.info(
+            f"📥 Execução {execution['id']} reservada por {worker_id} "
+            f"(tentativa {execution.get('attempts')}/{execution.get('max_attempts')})"
+        )
+        return execution
+
+    async def heartbeat(self, execution_id: Any, worker_id: str) -> bool:
+        """Renova o lease; False significa que a execução foi perdida"""
+        alive = bool(await supabase_async.rpc('agno_heartbeat_workflow_execution', {
+            'p_execution_id': int(execution_id),
+            'p_worker_id': worker_id,
+            'p_lease_seconds': self.lease_seconds
+        }))
+        if not alive:
+            self._count('leases_lost')
+            logger.warning(f"⚠️ Lease da execução {execution_id} perdido por {worker_id}")
+        return alive
+
+    async def _finish(self, execution_id: Any, worker_id: str, update_data: Dict[str, Any]) -> bool:
+        """Atualiza a execução apenas se o worker ainda for o dono do lease"""
+        update_data = {**update_data, 'lease_owner': None, 'lease_expires_at': None}
+        rows = await supabase_async.update(
+            'agno_workflow_executions', update_data, {'id': execution_id, 'lease_owner': worker_id}
+        )
+        if not rows:
+            self._count('leases_lost')
+            logger.warning(f"⚠️ Execução {execution_id} não pertence mais a {worker_id}; resultado descartado")
+            return False
+        return True
+
+    async def complete(self, execution_id: Any, worker_id: str, output_data: Optional[Dict[str, Any]]) -> None:
+        if await self._finish(execution_id, worker_id, {
+            'execution_status': 'completed',
+            'output_data': output_data,
+            'error_message': None,
+            'completed_at': datetime.utcnow().isoformat()
+        }):
+            self._count('completed')
+
+    async def fail(self, execution: Dict[str, Any], worker_id: str, error: str, retryable: bool = True) -> None:
+        """Devolve a execução para a fila (com backoff) ou encerra como falha.
+
+        Falhas não repetíveis (`retryable=False`: condição ou grafo inválido)
+        encerram a execução na hora, sem consumir as tentativas restantes.
+        """
+        attempts = int(execution.get('attempts') or 1)
+        max_attempts = int(execution.get('max_attempts') or self.max_attempts)
+
+        if retryable and attempts < max_attempts:
+            available_at = datetime.utcnow() + timedelta(seconds=self.retry_backoff_s * attempts)
+            if await self._finish(execution['id'], worker_id, {
+                'execution_status': 'queued',
+                'error_message': error,
+                'available_at': available_at.isoformat()
+            }):
+                self._count('requeued')
+                logger.warning(f"🔁 Execução {execution['id']} devolvida à fila ({attempts}/{max_attempts}): {error}")
+            return
+
+        if await self._finish(execution['id'], worker_id, {
+            'execution_status': 'failed',
+            'error_message': error,
+            'completed_at': datetime.utcnow().isoformat()
+        }):
+            self._count('failed')
+            if retryable:
+                logger.error(f"❌ Execução {execution['id']} falhou após {attempts} tentativas: {error}")
+            else:
+                logger.error(f"❌ Execução {execution['id']} falhou (não repetível): {error}")
+
+    async def completed_steps(self, execution_id: Any) -> Dict[str, Dict[str, Any]]:
+        """Saídas dos nós já concluídos (ponto de retomada após crash)"""
+        rows = await supabase_async.select(
+            'agno_execution_steps', 'node_id,output_data', {'execution_id': execution_id, 'status': 'completed'}
+        )
+        return {row['node_id']: row.get('output_data') or {} for row in rows}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "lease_seconds": self.lease_seconds,
+                "max_attempts": self.max_attempts,
+                "enqueued": self.enqueued,
+                "claimed": self.claimed,
+                "completed": self.completed,
+                "failed": self.failed,
+                "requeued": self.requeued,
+                "leases_lost": self.leases_lost
+            }
+
+
+# Instância global da fila
+workflow_queue = WorkflowQueue()
@@ -1,10 +1,10 @@
 # backend/services/workflow_team_service.py
 
+import os
 import json
+import hashlib
 import uuid
-import asyncio
 from typing import Dict, List, Optional, Any, Tuple
-from datetime import datetime
 from dataclasses import dataclass, asdict
 from fastapi import HTTPException
 from loguru import logger
@@ -19,8 +19,34 @@ from agno.tools.yfinance import YFinanceTools
 from agno.tools.calculator import CalculatorTools
 from agno.tools.reasoning import ReasoningTools
 
-# Supabase client
-from backend.supabase_client import supabase
+# Clientes HTTP compartilhados por provider e acesso assíncrono ao Supabase
+try:
+    from services.model_clients import model_clients
+    from services.tool_pool import tool_pool
+    from services.executors import agent_executor
+    from services.supabase_async import supabase_async
+except ImportError:
+    from backend.services.model_clients import model_clients
+    from backend.services.tool_pool import tool_pool
+    from backend.services.executors import agent_executor
+    from backend.services.supabase_async import supabase_async
+
+try:
+    from services.workflow_dag import (
+        ConditionError, DagRunResult, DagScheduler, WorkflowGraph, evaluate_condition, WORKFLOW_MAX_PARALLEL_NODES
+    )
+    from services.workflow_queue import workflow_queue
+    from services.step_journal import step_journal
+    from services.node_memo import node_memo
+    from services.agent_pool import AgentPool, agent_pool
+except ImportError:
+    from backend.services.workflow_dag import (
+        ConditionError, DagRunResult, DagScheduler, WorkflowGraph, evaluate_condition, WORKFLOW_MAX_PARALLEL_NODES
+    )
+    from backend.services.workflow_queue import workflow_queue
+    from backend.services.step_journal import step_journal
+    from backend.services.node_memo import node_memo
+    from backend.services.agent_pool import AgentPool, agent_pool
 
 
 @dataclass
@@ -67,6 +93,13 @@ class WorkflowTeamService:
         self.active_workflows: Dict[str, Any] = {}
         self.active_teams: Dict[str, Team] = {}
         self.agents_cache: Dict[str, Agent] = {}
+        # Agentes dos nós de workflow: cada execução de nó pega a sua instância
+        # emprestada (ramos paralelos nunca compartilham run_response/memória).
+        # Pool próprio porque o agente é construído com opções diferentes das rotas de chat.
+        self.node_agent_pool = AgentPool(
+            max_configs=int(os.getenv("WORKFLOW_AGENT_POOL_MAX_CONFIGS", "64")),
+            max_idle_per_config=int(os.getenv("WORKFLOW_AGENT_POOL_MAX_IDLE", "4"))
+        )
         logger.info("🚀 WorkflowTeamService inicializado")
 
     # ==================== TEAM BUILDER ====================
@@ -114,19 +147,21 @@ class WorkflowTeamService:
                 }
             }
 
-            result = supabase.table('agno_teams').insert(team_data).execute()
-            team_id = result.data[0]['id']
+            rows = await supabase_async.insert('agno_teams', team_data)
+            team_id = rows[0]['id']
 
-            # 5. Relacionar agentes ao team
-            for i, agent_config in enumerate(agent_configs):
-                agent_relation = {
+            # 5. Relacionar agentes ao team (inserção em lote)
+            agent_relations = [
+                {
                     'team_id': team_id,
                     'agent_id': agent_config.get('id'),
                     'role_in_team': agent_config.get('role_in_team', 'member'),
                     'priority': i + 1,
                     'agent_config': agent_config
                 }
-                supabase.table('agno_team_agents').insert(agent_relation).execute()
+                for i, agent_config in enumerate(agent_configs)
+            ]
+            await supabase_async.insert('agno_team_agents', agent_relations, returning=False)
 
             # 6. Cache do team ativo
             self.active_teams[str(team_id)] = agno_team
@@ -141,13 +176,11 @@ class WorkflowTeamService:
     async def get_teams(self, user_id: int) -> List[Dict]:
         """Lista todos os teams do usuário"""
         try:
-            result = supabase.table('agno_teams') \
-                .select('*, agno_team_agents(*, agno_agents(name, role, model_provider))') \
-                .eq('user_id', user_id) \
-                .eq('is_active', True) \
-                .execute()
-
-            return result.data
+            return await supabase_async.select(
+                'agno_teams',
+                '*, agno_team_agents(*, agno_agents(name, role, model_provider))',
+                {'user_id': user_id, 'is_active': True}
+            )
         except Exception as e:
             logger.error(f"❌ Erro ao buscar teams: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
@@ -162,7 +195,7 @@ class WorkflowTeamService:
                 self.active_teams[team_id] = team
 
             # Executar usando Agno Team
-            response = team.run(message)
+            response = await agent_executor.run(team.run, message)
 
             return {
                 'team_id': team_id,
@@ -205,8 +238,8 @@ class WorkflowTeamService:
                 }
             }
 
-            result = supabase.table('agno_workflows').insert(workflow_data).execute()
-            workflow_id = result.data[0]['id']
+            rows = await supabase_async.insert('agno_workflows', workflow_data)
+            workflow_id = rows[0]['id']
 
             logger.info(f"✅ Workflow visual criado: {name} (ID: {workflow_id})")
             return str(workflow_id)
@@ -215,128 +248,102 @@ class WorkflowTeamService:
             logger.error(f"❌ Erro ao criar workflow visual: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
 
-    async def execute_visual_workflow(
-            self,
-            workflow_id: str,
-            input_data: Dict[str, Any]
-    ) -> str:
-        """Executa um workflow visual"""
-        try:
-            # 1. Carregar workflow
-            workflow = await self._load_workflow(workflow_id)
-            visual_def = VisualWorkflowDefinition(**workflow['visual_definition'])
-
-            # 2. Criar execução no banco
-            execution_data = {
-                'workflow_id': int(workflow_id),
-                'user_id': workflow['user_id'],
-                'input_data': input_data,
-                'execution_status': 'running'
-            }
-
-            execution_result = supabase.table('agno_workflow_executions') \
-                .insert(execution_data).execute()
-            execution_id = execution_result.data[0]['id']
-
-            # 3. Executar workflow assincronamente
-            asyncio.create_task(
-                self._execute_workflow_steps(execution_id, visual_def, input_data)
-            )
-
-            return execution_id
-
-        except Exception as e:
-            logger.error(f"❌ Erro ao executar workflow: {str(e)}")
-            raise HTTPException(status_code=500, detail=str(e))
+    async def run_claimed_execution(self, execution: Dict[str, Any]) -> DagRunResult:
+        """Executa uma execução reservada da fila, retomando dos steps concluídos"""
+        execution_id = execution['id']
+        raw_definition = execution.get('visual_definition')
+        if not raw_definition:
+            workflow = await self._load_workflow(str(execution['workflow_id']))
+            raw_definition = workflow['visual_definition']
+        visual_def = self._parse_visual_definition(raw_definition)
+        node_memo.observe_workflow(execution.get('workflow_id'), self._definition_hash(raw_definition))
+
+        completed = await workflow_queue.completed_steps(execution_id)
+        if completed:
+            logger.info(f"♻️ Retomando execução {execution_id}: {len(completed)} nós já concluídos")
+
+        return await self._execute_workflow_steps(
+            execution_id, visual_def, execution.get('input_data') or {}, completed,
+            workflow_id=execution.get('workflow_id')
+        )
 
     async def _execute_workflow_steps(
             self,
             execution_id: str,
             visual_def: VisualWorkflowDefinition,
-            input_data: Dict[str, Any]
-    ):
-        """Executa os steps do workflow visual de forma assíncrona"""
-        try:
-            # 1. Encontrar nó de início
-            start_nodes = [n for n in visual_def.nodes if n.type == 'start']
-            if not start_nodes:
-                raise ValueError("Workflow deve ter um nó de início")
-
-            # 2. Executar sequencialmente seguindo as conexões
-            current_data = input_data
-            current_node = start_nodes[0]
-            visited_nodes = set()
-
-            while current_node and current_node.id not in visited_nodes:
-                visited_nodes.add(current_node.id)
-
-                # Executar nó atual
-                step_result = await self._execute_node(
-                    execution_id, current_node, current_data
-                )
-
-                if step_result['status'] == 'failed':
-                    await self._update_execution_status(execution_id, 'failed', step_result.get('error'))
-                    return
-
-                current_data = step_result.get('output_data', current_data)
-
-                # Encontrar próximo nó
-                next_connections = [
-                    conn for conn in visual_def.connections
-                    if conn.from_node == current_node.id
-                ]
-
-                if not next_connections:
-                    break
-
-                # Por simplicidade, pegar primeira conexão
-                # TODO: Implementar lógica condicional
-                next_node_id = next_connections[0].to_node
-                current_node = next(
-                    (n for n in visual_def.nodes if n.id == next_node_id),
-                    None
-                )
+            input_data: Dict[str, Any],
+            completed: Optional[Dict[str, Dict[str, Any]]] = None,
+            workflow_id: Any = None
+    ) -> DagRunResult:
+        """Executa os steps do workflow visual como DAG (ramos em paralelo)"""
+        graph = WorkflowGraph(visual_def.nodes, visual_def.connections)
+        max_parallel = int(
+            (visual_def.metadata or {}).get('max_parallel_nodes', WORKFLOW_MAX_PARALLEL_NODES)
+        )
+        scheduler = DagScheduler(
+            graph,
+            lambda node, data: self._execute_node(execution_id, node, data, workflow_id),
+            max_concurrency=max_parallel
+        )
 
-            # 3. Finalizar execução
-            await self._update_execution_status(
-                execution_id, 'completed', None, current_data
+        result = await scheduler.run(input_data, completed)
+        if result.status == 'completed':
+            logger.info(
+                f"✅ Workflow {execution_id} concluído: {len(result.node_outputs)} nós "
+                f"({result.resumed} retomados), {len(result.skipped)} pulados, "
+                f"paralelismo máximo {result.peak_parallelism} ({result.duration_ms}ms)"
             )
-
-        except Exception as e:
-            logger.error(f"❌ Erro na execução do workflow: {str(e)}")
-            await self._update_execution_status(execution_id, 'failed', str(e))
+        return result
 
     async def _execute_node(
             self,
             execution_id: str,
             node: NodeConfig,
-            input_data: Dict[str, Any]
+            input_data: Dict[str, Any],
+            workflow_id: Any = None
     ) -> Dict[str, Any]:
         """Executa um nó específico do workflow"""
-        step_data = {
-            'execution_id': execution_id,
-            'node_id': node.id,
-            'step_type': node.type,
-            'input_data': input_data,
-            'status': 'running',
-            'started_at': datetime.utcnow().isoformat()
-        }
-
-        step_result = supabase.table('agno_execution_steps') \
-            .insert(step_data).execute()
-        step_id = step_result.data[0]['id']
+        await step_journal.record_start(execution_id, node.id, node.type, input_data)
 
         try:
             output_data = input_data
 
+            # Configuração atual do agente (o pool e a memoização dependem dela)
+            agent_id = node.config.get('agentId') if node.type == 'agent' else None
+            agent_data = await self._load_agent_data(agent_id) if agent_id else None
+
+            # Memoização opt-in (config.memoize): mesma entrada => mesma saída
+            memo_ttl = node_memo.ttl_for(node.config)
+            memo_key = None
+            if memo_ttl is not None:
+                agent_hash = None
+                if agent_data is not None:
+                    agent_hash = self._agent_config_hash(agent_data)
+                    node_memo.observe_agent(agent_id, agent_hash)
+                memo_key = node_memo.make_key(node.type, node.config, agent_hash, input_data)
+                memoized = node_memo.get(workflow_id, memo_key)
+                if memoized is not None:
+                    await step_journal.record_finish(execution_id, node.id, 'completed', memoized)
+                    return {
+                        'status': 'completed',
+                        'output_data': memoized,
+                        'memoized': True
+                    }
+
             if node.type == 'agent':
                 # Executar agente
-                agent_id = node.config.get('agentId')
-                if agent_id:
-                    agent = await self._get_cached_agent(agent_id)
+                if agent_data is not None:
+                    # O pool descarta instâncias construídas com um updated_at antigo
+                    agent = self.node_agent_pool.acquire(
+                        agent_data,
+                        self._agent_tool_names(agent_data),
+                        lambda: self._construct_agno_agent(agent_data)
+                    )
                     message = input_data.get('message', 'Processe estes dados')
-                    response = agent.run(message)
+                    try:
+                        response = await agent_executor.run(agent.run, message)
+                    finally:
+                        self.node_agent_pool.release(agent)
                     output_data = {
                         **input_data,
                         'agent_response': response.content,
@@ -344,12 +351,11 @@ class WorkflowTeamService:
                     }
 
             elif node.type == 'condition':
-                # Lógica condicional (simplificada)
+                # Avaliação segura (AST restrita) sobre os dados de entrada
                 condition = node.config.get('condition', 'true')
-                # TODO: Implementar avaliação segura de condições
                 output_data = {
                     **input_data,
-                    'condition_result': True  # Simplificado
+                    'condition_result': evaluate_condition(condition, input_data)
                 }
 
             elif node.type == 'transform':
@@ -361,15 +367,13 @@ class WorkflowTeamService:
                     'transformed': True
                 }
 
-            # Atualizar step como concluído
-            supabase.table('agno_execution_steps') \
-                .update({
-                'status': 'completed',
-                'output_data': output_data,
-                'completed_at': datetime.utcnow().isoformat()
-            }) \
-                .eq('id', step_id) \
-                .execute()
+            # Registrar step como concluído (gravação em lote); a saída de um
+            # agente é checkpoint gravado na hora para a retomada não repetir a chamada ao LLM
+            await step_journal.record_finish(
+                execution_id, node.id, 'completed', output_data, durable=node.type == 'agent'
+            )
+            if memo_key is not None:
+                node_memo.put(workflow_id, memo_key, output_data, memo_ttl, agent_id=agent_id)
 
             return {
                 'status': 'completed',
@@ -377,21 +381,21 @@ class WorkflowTeamService:
             }
 
         except Exception as e:
-            # Atualizar step como falha
-            supabase.table('agno_execution_steps') \
-                .update({
-                'status': 'failed',
-                'error_message': str(e),
-                'completed_at': datetime.utcnow().isoformat()
-            }) \
-                .eq('id', step_id) \
-                .execute()
+            # Registrar step como falha (gravação em lote)
+            await step_journal.record_finish(execution_id, node.id, 'failed', error_message=str(e))
 
             return {
                 'status': 'failed',
-                'error': str(e)
+                'error': str(e),
+                # Condição inválida falha igual em qualquer tentativa
+                'retryable': not isinstance(e, ConditionError)
             }
 
+    @staticmethod
+    def _definition_hash(raw_definition: Dict[str, Any]) -> str:
+        raw = json.dumps(raw_definition, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
     # ==================== HELPERS ====================
 
     async def _create_or_get_agent(self, user_id: int, agent_config: Dict) -> Agent:
@@ -403,11 +407,9 @@ class WorkflowTeamService:
 
         # Buscar agente no banco
         if agent_id:
-            result = supabase.table('agno_agents') \
-                .select('*').eq('id', agent_id).execute()
+            agent_data = await supabase_async.select_one('agno_agents', filters={'id': agent_id})
 
-            if result.data:
-                agent_data = result.data[0]
+            if agent_data:
                 agent = await self._build_agno_agent(agent_data)
                 self.agents_cache[agent_id] = agent
                 return agent
@@ -418,33 +420,39 @@ class WorkflowTeamService:
 
     async def _build_agno_agent(self, config: Dict) -> Agent:
         """Constrói um agente Agno baseado na configuração"""
+        return self._construct_agno_agent(config)
+
+    @staticmethod
+    def _agent_tool_names(config: Dict) -> List[str]:
+        tool_names = config.get('tools') or []
+        if isinstance(tool_names, str):
+            tool_names = json.loads(tool_names)
+        return tool_names
+
+    def _construct_agno_agent(self, config: Dict) -> Agent:
+        """Construção síncrona do agente (usada como builder do pool)"""
         # Selecionar modelo
         provider = config.get('model_provider', 'openai')
         model_id = config.get('model_id', 'gpt-4o-mini')
 
         if provider == 'openai':
-            model = OpenAIChat(id=model_id)
+            model = OpenAIChat(id=model_id, **model_clients.model_kwargs('openai', os.getenv('OPENAI_API_KEY')))
         elif provider == 'anthropic':
-            model = Claude(id=model_id)
+            model = Claude(id=model_id, **model_clients.model_kwargs('anthropic', os.getenv('ANTHROPIC_API_KEY')))
         else:
-            model = OpenAIChat(id='gpt-4o-mini')
+            model = OpenAIChat(id='gpt-4o-mini', **model_clients.model_kwargs('openai', os.getenv('OPENAI_API_KEY')))
 
         # Selecionar tools
         tools = []
-        tool_names = config.get('tools', [])
-
-        if isinstance(tool_names, str):
-            tool_names = json.loads(tool_names)
-
-        for tool_name in tool_names:
+        for tool_name in self._agent_tool_names(config):
             if tool_name == 'web_search' or tool_name == 'duckduckgo':
-                tools.append(DuckDuckGoTools())
+                tools.append(tool_pool.get('duckduckgo', None, DuckDuckGoTools))
             elif tool_name == 'yfinance':
-                tools.append(YFinanceTools())
+                tools.append(tool_pool.get('yfinance', None, YFinanceTools))
             elif tool_name == 'calculator' or tool_name == 'calculations':
-                tools.append(CalculatorTools())
+                tools.append(tool_pool.get('calculator', None, CalculatorTools))
             elif tool_name == 'reasoning':
-                tools.append(ReasoningTools())
+                tools.append(tool_pool.get('reasoning', None, ReasoningTools))
 
         # Criar agente
         instructions = config.get('instructions', [])
@@ -475,33 +483,51 @@ class WorkflowTeamService:
         if len(end_nodes) == 0:
             raise ValueError("Workflow deve ter pelo menos um nó de fim")
 
-        # Verificar conexões válidas
-        node_ids = {n.id for n in visual_def.nodes}
-        for conn in visual_def.connections:
-            if conn.from_node not in node_ids or conn.to_node not in node_ids:
-                raise ValueError(f"Conexão inválida: {conn.from_node} -> {conn.to_node}")
+        # Verificar conexões válidas e ausência de ciclos
+        WorkflowGraph(visual_def.nodes, visual_def.connections)
+
+    @staticmethod
+    def _parse_visual_definition(raw: Dict[str, Any]) -> VisualWorkflowDefinition:
+        """Converte a definição salva (JSON) nas dataclasses do workflow"""
+        nodes = [
+            node if isinstance(node, NodeConfig) else NodeConfig(
+                id=str(node['id']),
+                type=node.get('type', ''),
+                name=node.get('name', node['id']),
+                position=node.get('position') or {},
+                config=node.get('config') or {},
+                status=node.get('status', 'idle')
+            )
+            for node in raw.get('nodes', [])
+        ]
+        connections = [
+            conn if isinstance(conn, WorkflowConnection) else WorkflowConnection(
+                from_node=str(conn['from_node']),
+                to_node=str(conn['to_node']),
+                condition=conn.get('condition')
+            )
+            for conn in raw.get('connections', [])
+        ]
+        return VisualWorkflowDefinition(nodes=nodes, connections=connections, metadata=raw.get('metadata') or {})
 
     async def _load_workflow(self, workflow_id: str) -> Dict:
         """Carrega um workflow do banco"""
-        result = supabase.table('agno_workflows') \
-            .select('*').eq('id', int(workflow_id)).execute()
+        workflow = await supabase_async.select_one('agno_workflows', filters={'id': int(workflow_id)})
 
-        if not result.data:
+        if not workflow:
             raise HTTPException(status_code=404, detail="Workflow não encontrado")
 
-        return result.data[0]
+        return workflow
 
     async def _load_team(self, team_id: str) -> Team:
         """Carrega um team do banco e constrói o objeto Agno Team"""
-        result = supabase.table('agno_teams') \
-            .select('*, agno_team_agents(*, agno_agents(*))') \
-            .eq('id', int(team_id)).execute()
+        team_data = await supabase_async.select_one(
+            'agno_teams', '*, agno_team_agents(*, agno_agents(*))', {'id': int(team_id)}
+        )
 
-        if not result.data:
+        if not team_data:
             raise HTTPException(status_code=404, detail="Team não encontrado")
 
-        team_data = result.data[0]
-
         # Construir agentes do team
         agents = []
         for team_agent in team_data['agno_team_agents']:
@@ -520,56 +546,32 @@ class WorkflowTeamService:
 
         return team
 
-    async def _get_cached_agent(self, agent_id: str) -> Agent:
-        """Recupera agente do cache ou carrega do banco"""
-        if agent_id in self.agents_cache:
-            return self.agents_cache[agent_id]
-
-        result = supabase.table('agno_agents') \
-            .select('*').eq('id', int(agent_id)).execute()
-
-        if not result.data:
+    async def _load_agent_data(self, agent_id: str) -> Dict[str, Any]:
+        """Linha atual do agente no banco"""
+        agent_data = await supabase_async.select_one('agno_agents', filters={'id': int(agent_id)})
+        if not agent_data:
             raise ValueError(f"Agente {agent_id} não encontrado")
-
-        agent = await self._build_agno_agent(result.data[0])
-        self.agents_cache[agent_id] = agent
-        return agent
-
-    async def _update_execution_status(
-            self,
-            execution_id: str,
-            status: str,
-            error_message: Optional[str] = None,
-            output_data: Optional[Dict] = None
-    ):
-        """Atualiza status de uma execução"""
-        update_data = {
-            'execution_status': status,
-            'completed_at': datetime.utcnow().isoformat()
-        }
-
-        if error_message:
-            update_data['error_message'] = error_message
-
-        if output_data:
-            update_data['output_data'] = output_data
-
-        supabase.table('agno_workflow_executions') \
-            .update(update_data) \
-            .eq('id', execution_id) \
-            .execute()
+        return agent_data
+
+    @staticmethod
+    def _agent_config_hash(agent_data: Dict[str, Any]) -> str:
+        tools = agent_data.get('tools') or []
+        if isinstance(tools, str):
+            tools = json.loads(tools)
+        instructions = agent_data.get('instructions') or []
+        if isinstance(instructions, str):
+            instructions = json.loads(instructions)
+        # Role e updated_at entram na chave: qualquer edição do agente gera uma chave nova
+        config_hash = agent_pool.config_hash({**agent_data, 'instructions': instructions}, tools)
+        return f"{config_hash}:{agent_data.get('role', 'Assistant')}:{agent_data.get('updated_at')}"
 
     # ==================== TEMPLATES ====================
 
     async def get_workflow_templates(self) -> List[Dict]:
         """Lista templates de workflow disponíveis"""
-        result = supabase.table('agno_workflow_templates') \
-            .select('*') \
-            .eq('is_public', True) \
-            .order('usage_count', desc=True) \
-            .execute()
-
-        return result.data
+        return await supabase_async.select(
+            'agno_workflow_templates', filters={'is_public': True}, order='usage_count', desc=True
+        )
 
     async def create_workflow_from_template(
             self,
@@ -580,13 +582,11 @@ class WorkflowTeamService:
     ) -> str:
         """Cria um workflow baseado em um template"""
         # Buscar template
-        template_result = supabase.table('agno_workflow_templates') \
-            .select('*').eq('id', template_id).execute()
+        template = await supabase_async.select_one('agno_workflow_templates', filters={'id': template_id})
 
-        if not template_result.data:
+        if not template:
             raise HTTPException(status_code=404, detail="Template não encontrado")
 
-        template = template_result.data[0]
         template_def = template['template_definition']
 
         # Aplicar customizações se houver
@@ -606,10 +606,10 @@ class WorkflowTeamService:
         )
 
         # Incrementar contador de uso do template
-        supabase.table('agno_workflow_templates') \
-            .update({'usage_count': template['usage_count'] + 1}) \
-            .eq('id', template_id) \
-            .execute()
+        await supabase_async.update(
+            'agno_workflow_templates', {'usage_count': template['usage_count'] + 1}, {'id': template_id},
+            returning=False
+        )
 
         return workflow_id
 
@@ -0,0 +1,7 @@
+# backend/tests/conftest.py - Configuração comum dos testes
+
+import os
+import sys
+
+# Os módulos são importados como no container (a partir de backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
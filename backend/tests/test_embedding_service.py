@@ -0,0 +1,229 @@
+# backend/tests/test_embedding_service.py - EmbeddingService: lotes, cache, backends locais e similaridade
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from tenacity import wait_fixed, wait_none
+
+from services.embedding_cache import EmbeddingCache
+from services.embedding_service import EmbeddingService
+
+MODEL = "text-embedding-3-small"
+
+
+def vector_for(text):
+    return [float(len(text)), 1.0, -1.0]
+
+
+class FakeEmbeddingsAPI:
+    """Imita `client.embeddings.create`; `failures[texto]` = quantas vezes falhar"""
+
+    def __init__(self, failures=None):
+        self.failures = dict(failures or {})
+        self.calls = []
+
+    async def create(self, model, input, encoding_format="float"):
+        self.calls.append(list(input))
+        for text in input:
+            if self.failures.get(text, 0) > 0:
+                self.failures[text] -= 1
+                raise ConnectionError(f"falha simulada em {text}")
+        return SimpleNamespace(data=[SimpleNamespace(embedding=vector_for(text)) for text in input])
+
+
+@pytest.fixture(autouse=True)
+def no_retry_wait(monkeypatch):
+    # Mesmo número de tentativas, sem os 4-10 s de espera entre elas
+    monkeypatch.setattr(EmbeddingService._embed_batch.retry, "wait", wait_none())
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "embeddings.sqlite3"))
+    yield cache
+    cache.close()
+
+
+def make_service(api, cache, max_concurrency=2):
+    return EmbeddingService(client=SimpleNamespace(embeddings=api), cache=cache, max_concurrency=max_concurrency)
+
+
+TEXTS = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta"]
+
+
+@pytest.mark.asyncio
+async def test_transient_failure_retries_only_that_batch(cache):
+    api = FakeEmbeddingsAPI(failures={"gamma": 1})
+    service = make_service(api, cache)
+
+    embeddings = await service.create_embeddings(TEXTS, MODEL, batch_size=2)
+
+    assert embeddings == [vector_for(text) for text in TEXTS]
+    # 3 lotes + 1 repetição do lote que falhou
+    assert len(api.calls) == 4
+    assert api.calls.count(["gamma", "delta"]) == 2
+    assert api.calls.count(["alpha", "beta"]) == 1
+    assert service.failed_requests == 1
+
+
+@pytest.mark.asyncio
+async def test_completed_batches_are_checkpointed_before_failure(cache):
+    api = FakeEmbeddingsAPI(failures={"epsilon": 3})
+    service = make_service(api, cache)
+
+    with pytest.raises(ConnectionError):
+        await service.create_embeddings(TEXTS, MODEL, batch_size=2)
+
+    # Lotes que deram certo já estão no cache
+    cached = cache.get_many_sync(MODEL, TEXTS)
+    assert [vector is not None for vector in cached] == [True, True, True, True, False, False]
+
+    # Nova chamada só envia o que faltou
+    api.calls.clear()
+    embeddings = await service.create_embeddings(TEXTS, MODEL, batch_size=2)
+
+    assert api.calls == [["epsilon", "zeta"]]
+    assert [list(map(float, e)) for e in embeddings] == [vector_for(text) for text in TEXTS]
+
+
+@pytest.mark.asyncio
+async def test_duplicate_texts_are_embedded_once(cache):
+    api = FakeEmbeddingsAPI()
+    service = make_service(api, cache)
+
+    embeddings = await service.create_embeddings(["alpha", "beta", "alpha"], MODEL)
+
+    assert api.calls == [["alpha", "beta"]]
+    assert embeddings[0] == embeddings[2] == vector_for("alpha")
+
+
+@pytest.mark.asyncio
+async def test_retry_backoff_does_not_hold_a_concurrency_slot(cache, monkeypatch):
+    monkeypatch.setattr(EmbeddingService._embed_batch.retry, "wait", wait_fixed(0.05))
+    api = FakeEmbeddingsAPI(failures={"alpha": 1})
+    service = make_service(api, cache, max_concurrency=1)
+
+    await service.create_embeddings(["alpha", "beta"], MODEL, batch_size=1)
+
+    # O outro lote usa a única vaga enquanto "alpha" espera o backoff
+    assert api.calls == [["alpha"], ["beta"], ["alpha"]]
+
+
+@pytest.mark.asyncio
+async def test_single_embedding_in_memory_cache_skips_the_micro_batcher(cache):
+    api = FakeEmbeddingsAPI()
+    service = make_service(api, cache)
+    await service.create_embeddings(["alpha"], MODEL)
+
+    embedding = await service.create_single_embedding("alpha", MODEL)
+
+    assert list(map(float, embedding)) == vector_for("alpha")
+    assert api.calls == [["alpha"]]
+    assert MODEL not in service.micro_batchers
+
+
+def test_memory_lookup_does_not_wait_for_disk_io(cache):
+    cache.put_many_sync(MODEL, ["alpha"], [vector_for("alpha")])
+
+    # Simula uma gravação em disco em andamento no executor do cache
+    with cache._db_lock:
+        vector = cache.get_memory(MODEL, "alpha")
+
+    assert list(map(float, vector)) == vector_for("alpha")
+
+
+@pytest.mark.asyncio
+async def test_hashing_model_is_stable_normalized_and_not_cached(cache):
+    api = FakeEmbeddingsAPI()
+    service = make_service(api, cache)
+    texts = ["o rato roeu a roupa", "do rei de roma", "o rato roeu a roupa"]
+
+    first = await service.create_embeddings(texts, "hash:16")
+    second = await service.create_embeddings(texts, "hash:16")
+
+    vectors = np.asarray(first)
+    assert vectors.shape == (3, 16)
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-6)
+    assert first == second
+    assert first[0] == first[2]
+    assert api.calls == []
+    # Vetores baratos de recalcular não vão para o cache em disco
+    assert cache.get_stats()["stores"] == 0
+    assert cache.get_many_sync("hash:16", texts) == [None, None, None]
+
+
+# ==================== SIMILARIDADE EM LOTE ====================
+
+def reference_top_k(service, queries, matrix, k):
+    scores = service.batch_cosine_similarity(queries, matrix)
+    order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    return order, np.take_along_axis(scores, order, axis=1)
+
+
+def test_chunked_top_k_matches_full_sort():
+    rng = np.random.default_rng(7)
+    queries, matrix = rng.normal(size=(9, 8)), rng.normal(size=(23, 8))
+    service = EmbeddingService(client=object())
+
+    # chunk menor que o número de linhas e que k: várias rodadas de argpartition
+    idx, scores = service.top_k_similar(queries, matrix, k=6, chunk_size=4)
+    expected_idx, expected_scores = reference_top_k(service, queries, matrix, 6)
+
+    np.testing.assert_array_equal(idx, expected_idx)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+
+def test_batch_cosine_similarity_matches_pairwise():
+    rng = np.random.default_rng(3)
+    queries, matrix = rng.normal(size=(3, 5)), rng.normal(size=(7, 5))
+    service = EmbeddingService(client=object())
+
+    scores = service.batch_cosine_similarity(queries, matrix, chunk_size=2)
+
+    expected = [[service.cosine_similarity(q, row) for row in matrix] for q in queries]
+    np.testing.assert_allclose(scores, expected, rtol=1e-5)
+
+
+def test_top_k_larger_than_rows_returns_every_row():
+    rng = np.random.default_rng(11)
+    queries, matrix = rng.normal(size=(2, 4)), rng.normal(size=(5, 4))
+    service = EmbeddingService(client=object())
+
+    idx, scores = service.top_k_similar(queries, matrix, k=50, chunk_size=2)
+    expected_idx, expected_scores = reference_top_k(service, queries, matrix, 5)
+
+    assert idx.shape == scores.shape == (2, 5)
+    np.testing.assert_array_equal(idx, expected_idx)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+
+def test_top_k_zero_returns_empty_results():
+    service = EmbeddingService(client=object())
+
+    idx, scores = service.top_k_similar(np.ones((3, 4)), np.ones((5, 4)), k=0)
+
+    assert idx.shape == scores.shape == (3, 0)
+
+
+def test_zero_vectors_score_zero():
+    service = EmbeddingService(client=object())
+    matrix = np.array([[0.0, 0.0], [1.0, 0.0], [0.0, 2.0]])
+
+    scores = service.batch_cosine_similarity(np.array([[0.0, 0.0], [1.0, 1.0]]), matrix)
+
+    assert np.all(np.isfinite(scores))
+    np.testing.assert_allclose(scores[0], 0.0)
+    np.testing.assert_allclose(scores[1], [0.0, np.sqrt(0.5), np.sqrt(0.5)], rtol=1e-6)
+
+
+def test_single_query_returns_one_dimensional_results():
+    service = EmbeddingService(client=object())
+    matrix = np.array([[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]])
+
+    scores = service.batch_cosine_similarity([1.0, 0.0], matrix)
+    idx, top = service.top_k_similar([1.0, 0.0], matrix, k=2, chunk_size=1)
+
+    assert scores.shape == (3,)
+    assert idx.tolist() == [0, 2]
+    np.testing.assert_allclose(top, [1.0, np.sqrt(0.5)], rtol=1e-6)
@@ -0,0 +1,117 @@
+# backend/tests/test_step_journal.py - Journal write-behind dos steps de workflow
+
+import asyncio
+
+import pytest
+
+from services.step_journal import StepJournal
+
+
+class MemoryJournal(StepJournal):
+    """Journal que grava numa lista; `gate` segura as gravações quando limpo"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.written = []
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def _write(self, rows) -> None:
+        await self.gate.wait()
+        self.written.append(rows)
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_flushed_without_waiting_for_interval():
+    journal = MemoryJournal(batch_size=3, flush_interval=60)
+
+    for i in range(3):
+        await journal.record_start("exec-1", f"n{i}", "agent", {"i": i})
+    await asyncio.wait_for(_until(lambda: journal.batches == 1), timeout=1)
+
+    assert [len(rows) for rows in journal.written] == [3]
+    assert journal.get_stats()["buffered"] == 0
+    await journal.close()
+
+
+@pytest.mark.asyncio
+async def test_start_and_finish_in_same_batch_become_one_row():
+    journal = MemoryJournal(batch_size=100, flush_interval=60)
+
+    await journal.record_start("exec-1", "a", "agent", {"q": 1})
+    await journal.record_finish("exec-1", "a", "completed", output_data={"r": 2})
+    await journal.flush()
+
+    rows = [row for batch in journal.written for row in batch]
+    assert len(rows) == 1
+    assert rows[0]["status"] == "completed"
+    assert rows[0]["input_data"] == {"q": 1}
+    assert rows[0]["output_data"] == {"r": 2}
+    # Step finalizado e gravado sai da memória
+    assert journal.get_stats()["active_steps"] == 0
+    await journal.close()
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_blocks_recorders_until_written():
+    journal = MemoryJournal(max_buffer=2, batch_size=2, flush_interval=60)
+    journal.gate.clear()
+
+    await journal.record_start("exec-1", "a", "agent", {})
+    await journal.record_start("exec-1", "b", "agent", {})
+    blocked = asyncio.ensure_future(journal.record_start("exec-1", "c", "agent", {}))
+    await asyncio.sleep(0.05)
+
+    assert not blocked.done()
+    assert journal.backpressure_waits == 1
+
+    journal.gate.set()
+    await asyncio.wait_for(blocked, timeout=1)
+    await journal.close()
+
+    rows = [row for batch in journal.written for row in batch]
+    assert sorted(row["node_id"] for row in rows) == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_close_flushes_everything_pending():
+    journal = MemoryJournal(batch_size=100, flush_interval=60)
+
+    for i in range(5):
+        await journal.record_start("exec-1", f"n{i}", "agent", {})
+        await journal.record_finish("exec-1", f"n{i}", "completed", output_data={"i": i})
+    assert journal.written == []
+
+    await journal.close(timeout=5)
+
+    assert journal.rows_written == 5
+    assert journal.get_stats()["buffered"] == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_write_keeps_rows_for_retry():
+    journal = MemoryJournal(batch_size=100, flush_interval=60)
+    attempts = []
+
+    async def flaky_write(rows):
+        attempts.append(len(rows))
+        if len(attempts) == 1:
+            raise ConnectionError("supabase indisponível")
+        journal.written.append(rows)
+
+    journal._write = flaky_write
+    await journal.record_finish("exec-1", "a", "completed", output_data={})
+
+    with pytest.raises(ConnectionError):
+        await journal.flush()
+    assert journal.get_stats()["buffered"] == 1
+
+    await journal.flush()
+    assert attempts == [1, 1]
+    assert journal.rows_written == 1
+    await journal.close()
+
+
+async def _until(predicate, interval: float = 0.005) -> None:
+    while not predicate():
+        await asyncio.sleep(interval)
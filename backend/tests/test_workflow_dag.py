@@ -0,0 +1,130 @@
+# backend/tests/test_workflow_dag.py - Agendador DAG dos workflows visuais
+
+import asyncio
+
+import pytest
+
+from services.workflow_dag import DagScheduler, WorkflowGraph, WorkflowGraphError
+
+
+def node(node_id, node_type="agent", **config):
+    return {"id": node_id, "type": node_type, "config": config}
+
+
+def edge(from_node, to_node, condition=None):
+    return {"from_node": from_node, "to_node": to_node, "condition": condition}
+
+
+class Recorder:
+    """run_node falso: registra as chamadas e devolve a saída configurada"""
+
+    def __init__(self, outputs=None, fail=()):
+        self.outputs = outputs or {}
+        self.fail = set(fail)
+        self.calls = []
+
+    async def __call__(self, node_config, input_data):
+        node_id = node_config["id"]
+        self.calls.append(node_id)
+        await asyncio.sleep(0)
+        if node_id in self.fail:
+            return {"status": "failed", "error": f"{node_id} falhou"}
+        output = self.outputs.get(node_id, {"from": node_id})
+        return {"status": "completed", "output_data": {**input_data, **output}}
+
+
+def test_cycle_is_rejected():
+    nodes = [node("start", "start"), node("a"), node("b"), node("end", "end")]
+    connections = [edge("start", "a"), edge("a", "b"), edge("b", "a"), edge("b", "end")]
+
+    with pytest.raises(WorkflowGraphError, match="ciclo"):
+        WorkflowGraph(nodes, connections)
+
+
+def test_connection_to_unknown_node_is_rejected():
+    with pytest.raises(WorkflowGraphError):
+        WorkflowGraph([node("start", "start")], [edge("start", "missing")])
+
+
+@pytest.mark.asyncio
+async def test_false_condition_skips_branch_and_its_successors():
+    nodes = [
+        node("start", "start"), node("check", "condition"),
+        node("yes"), node("no"), node("after_no"), node("end", "end")
+    ]
+    connections = [
+        edge("start", "check"),
+        edge("check", "yes", "true"), edge("check", "no", "false"),
+        edge("no", "after_no"),
+        edge("yes", "end"), edge("after_no", "end")
+    ]
+    runner = Recorder(outputs={"check": {"condition_result": True}})
+
+    result = await DagScheduler(WorkflowGraph(nodes, connections), runner).run({"q": 1})
+
+    assert result.status == "completed"
+    assert result.skipped == {"no", "after_no"}
+    assert "no" not in runner.calls and "after_no" not in runner.calls
+    # `end` roda com uma única entrada ativa (não vira merge)
+    assert runner.calls[-1] == "end"
+    assert "branches" not in result.output_data
+
+
+@pytest.mark.asyncio
+async def test_parallel_branches_merge_once():
+    nodes = [node("start", "start"), node("a"), node("b"), node("end", "end")]
+    connections = [edge("start", "a"), edge("start", "b"), edge("a", "end"), edge("b", "end")]
+    runner = Recorder()
+
+    result = await DagScheduler(WorkflowGraph(nodes, connections), runner, max_concurrency=4).run({})
+
+    assert result.status == "completed"
+    assert result.peak_parallelism == 2
+    assert runner.calls.count("end") == 1
+    assert set(result.output_data["branches"]) == {"a", "b"}
+
+
+@pytest.mark.asyncio
+async def test_resume_reuses_completed_nodes_and_reruns_failed():
+    nodes = [node("start", "start"), node("a"), node("b"), node("end", "end")]
+    connections = [edge("start", "a"), edge("a", "b"), edge("b", "end")]
+    graph = WorkflowGraph(nodes, connections)
+
+    first = Recorder(fail={"b"})
+    failed = await DagScheduler(graph, first).run({"q": 1})
+    assert failed.status == "failed"
+    assert failed.failed_node == "b"
+    assert first.calls == ["start", "a", "b"]
+
+    # Checkpoints dos nós concluídos, como lidos de agno_execution_steps
+    second = Recorder()
+    result = await DagScheduler(graph, second).run({"q": 1}, completed=failed.node_outputs)
+
+    assert result.status == "completed"
+    assert result.resumed == 2
+    assert second.calls == ["b", "end"]
+    assert result.output_data["from"] == "end"
+
+
+@pytest.mark.asyncio
+async def test_invalid_condition_fails_the_run():
+    nodes = [node("start", "start"), node("a"), node("end", "end")]
+    connections = [edge("start", "a", "len(missing) > 0"), edge("a", "end")]
+
+    result = await DagScheduler(WorkflowGraph(nodes, connections), Recorder()).run({})
+
+    assert result.status == "failed"
+    assert result.failed_node == "start"
+    assert "condição" in result.error
+    assert result.retryable is False
+
+
+@pytest.mark.asyncio
+async def test_failed_node_is_retryable_by_default():
+    nodes = [node("start", "start"), node("a"), node("end", "end")]
+    connections = [edge("start", "a"), edge("a", "end")]
+
+    result = await DagScheduler(WorkflowGraph(nodes, connections), Recorder(fail={"a"})).run({})
+
+    assert result.status == "failed"
+    assert result.retryable is True
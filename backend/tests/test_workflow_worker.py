@@ -0,0 +1,104 @@
+# backend/tests/test_workflow_worker.py - Falhas repetíveis e não repetíveis na fila de workflows
+
+import asyncio
+
+import pytest
+
+import services.workflow_queue as queue_module
+from services.workflow_dag import DagScheduler, WorkflowGraph, WorkflowGraphError
+from services.workflow_queue import WorkflowQueue
+from workflow_worker import WorkflowWorker
+
+
+class RecordingSupabase:
+    """Substitui o supabase_async da fila: registra os updates e confirma o lease"""
+
+    def __init__(self):
+        self.updates = []
+
+    async def update(self, table, data, filters):
+        self.updates.append(data)
+        return [{"id": filters["id"]}]
+
+
+class FakeService:
+    def __init__(self, run):
+        self.run = run
+
+    async def run_claimed_execution(self, execution):
+        return await self.run()
+
+
+class NullJournal:
+    async def flush(self):
+        pass
+
+
+def make_worker(queue, run):
+    worker = WorkflowWorker.__new__(WorkflowWorker)
+    worker.queue = queue
+    worker.journal = NullJournal()
+    worker.service = FakeService(run)
+    worker.worker_id = "test-worker"
+    return worker
+
+
+@pytest.fixture
+def supabase(monkeypatch):
+    fake = RecordingSupabase()
+    monkeypatch.setattr(queue_module, "supabase_async", fake)
+    return fake
+
+
+def execution(attempts=1):
+    return {"id": 7, "workflow_id": 1, "attempts": attempts, "max_attempts": 3}
+
+
+@pytest.mark.asyncio
+async def test_bad_condition_is_never_requeued(supabase):
+    nodes = [
+        {"id": "start", "type": "start", "config": {}},
+        {"id": "a", "type": "agent", "config": {}},
+        {"id": "end", "type": "end", "config": {}},
+    ]
+    connections = [
+        {"from_node": "start", "to_node": "a", "condition": "len(missing) > 0"},
+        {"from_node": "a", "to_node": "end"},
+    ]
+
+    async def run_node(node_config, input_data):
+        await asyncio.sleep(0)
+        return {"status": "completed", "output_data": input_data}
+
+    scheduler = DagScheduler(WorkflowGraph(nodes, connections), run_node)
+    queue = WorkflowQueue(retry_backoff_s=0)
+    await make_worker(queue, lambda: scheduler.run({}))._process(execution(attempts=1))
+
+    assert [update["execution_status"] for update in supabase.updates] == ["failed"]
+    assert queue.get_stats()["requeued"] == 0
+    assert queue.get_stats()["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_invalid_graph_is_never_requeued(supabase):
+    async def run():
+        raise WorkflowGraphError("Workflow contém ciclo envolvendo os nós: a, b")
+
+    queue = WorkflowQueue(retry_backoff_s=0)
+    await make_worker(queue, run)._process(execution(attempts=1))
+
+    assert [update["execution_status"] for update in supabase.updates] == ["failed"]
+    assert queue.get_stats()["requeued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_transient_failure_is_requeued_until_max_attempts(supabase):
+    async def run():
+        raise ConnectionError("provider indisponível")
+
+    queue = WorkflowQueue(retry_backoff_s=0)
+    worker = make_worker(queue, run)
+    await worker._process(execution(attempts=1))
+    await worker._process(execution(attempts=3))
+
+    assert [update["execution_status"] for update in supabase.updates] == ["queued", "failed"]
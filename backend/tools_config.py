@@ -13,6 +13,9 @@ from agno.tools.reasoning import ReasoningTools
 from agno.tools.file import FileTools
 from agno.tools.python_code import PythonCodeTools
 
+# Pool de instâncias reutilizáveis
+from services.tool_pool import tool_pool
+
 
 @dataclass
 class ToolConfig:
@@ -192,7 +195,7 @@ class AgnoToolsManager:
         return True
 
     def create_tool_instance(self, tool_id: str):
-        """Cria instância da ferramenta"""
+        """Obtém instância da ferramenta (reaproveitada do pool quando possível)"""
         tool_config = self.get_tool_by_id(tool_id)
         if not tool_config or not self.is_tool_available(tool_id):
             raise ValueError(f"Ferramenta {tool_id} não está disponível")
@@ -212,7 +215,7 @@ class AgnoToolsManager:
         if not creator:
             raise ValueError(f"Implementação não encontrada para {tool_id}")
 
-        return creator(tool_config)
+        return tool_pool.get(tool_id, tool_config.config, lambda: creator(tool_config))
 
     def _create_duckduckgo(self, config: ToolConfig):
         return DuckDuckGoTools(
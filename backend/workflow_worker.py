@@ -0,0 +1,251 @@
+# backend/workflow_worker.py - Worker de execuções de workflow (fora do processo da API)
+"""
+Consome a fila durável `agno_workflow_executions` e executa os workflows.
+
+Uso (a partir de backend/):
+    python workflow_worker.py --processes 4 --concurrency 2
+
+Cada processo reserva execuções com `agno_claim_workflow_execution`
+(SKIP LOCKED), mantém o lease com heartbeats e, se cair, a execução volta a
+ficar disponível quando o lease expira: o próximo worker retoma a partir dos
+steps já concluídos. Requer database/migrations/001_workflow_execution_queue.sql.
+
+O worker não abre DATABASE_URL: reserva, checkpoints e métricas passam pelo
+Supabase (PostgREST, SUPABASE_URL). A API retoma execuções e lê
+agno_execution_steps via SQLAlchemy (DATABASE_URL), então as duas URLs devem
+apontar para o mesmo banco.
+"""
+
+import os
+import sys
+import time
+import signal
+import socket
+import asyncio
+import argparse
+import multiprocessing
+from typing import Any, Dict, Set
+
+# Os serviços importam `backend.*`: garante a raiz do repositório no path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loguru import logger
+
+from services.workflow_dag import WorkflowGraphError
+
+WORKFLOW_WORKER_PROCESSES = int(os.getenv("WORKFLOW_WORKER_PROCESSES", "1"))
+WORKFLOW_WORKER_CONCURRENCY = int(os.getenv("WORKFLOW_WORKER_CONCURRENCY", "2"))
+WORKFLOW_WORKER_POLL_INTERVAL = float(os.getenv("WORKFLOW_WORKER_POLL_INTERVAL", "1.0"))
+WORKFLOW_WORKER_SHUTDOWN_GRACE = float(os.getenv("WORKFLOW_WORKER_SHUTDOWN_GRACE", "30"))
+WORKFLOW_WORKER_STATS_INTERVAL = float(os.getenv("WORKFLOW_WORKER_STATS_INTERVAL", "15"))
+
+
+class WorkflowWorker:
+    """Loop de consumo da fila dentro de um processo"""
+
+    def __init__(self, concurrency: int, poll_interval: float):
+        from services.workflow_queue import workflow_queue
+        from services.workflow_team_service import workflow_team_service
+        from services.step_journal import step_journal
+        from services.node_memo import node_memo
+
+        self.queue = workflow_queue
+        self.journal = step_journal
+        self.memo = node_memo
+        self.service = workflow_team_service
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = asyncio.Event()
+        self._running: Set[asyncio.Task] = set()
+
+    def stop(self) -> None:
+        if not self._stopping.is_set():
+            logger.info(f"🛑 Worker {self.worker_id} encerrando: não reserva novas execuções")
+            self._stopping.set()
+
+    async def _heartbeat(self, execution_id: Any, task: asyncio.Task) -> None:
+        """Renova o lease; cancela a execução se outro worker a assumiu"""
+        interval = max(1.0, self.queue.lease_seconds / 3)
+        while not task.done():
+            await asyncio.sleep(interval)
+            try:
+                if not await self.queue.heartbeat(execution_id, self.worker_id):
+                    task.cancel()
+                    return
+            except Exception as e:
+                logger.warning(f"⚠️ Falha no heartbeat da execução {execution_id}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": len(self._running),
+            "concurrency": self.concurrency,
+            "queue": self.queue.get_stats(),
+            "step_journal": self.journal.get_stats(),
+            "node_memo": self.memo.get_stats(),
+            "node_agent_pool": self.service.node_agent_pool.get_stats()
+        }
+
+    async def _publish_stats(self) -> None:
+        """Grava as métricas do processo em agno_workflow_worker_stats (lidas pela API)"""
+        from datetime import datetime, timezone
+        from services.supabase_async import supabase_async
+
+        try:
+            await supabase_async.upsert('agno_workflow_worker_stats', {
+                'worker_id': self.worker_id,
+                'stats': self.get_stats(),
+                'updated_at': datetime.now(timezone.utc).isoformat()
+            }, on_conflict='worker_id')
+        except Exception as e:
+            logger.warning(f"⚠️ Falha ao publicar métricas do worker {self.worker_id}: {e}")
+
+    async def _stats_loop(self) -> None:
+        while not self._stopping.is_set():
+            await self._publish_stats()
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=WORKFLOW_WORKER_STATS_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _flush_journal(self, execution_id: Any) -> None:
+        """Steps gravados antes do status final (a retomada depende deles)"""
+        try:
+            await self.journal.flush()
+        except Exception as e:
+            logger.warning(f"⚠️ Journal de steps da execução {execution_id} não gravado: {e}")
+
+    async def _process(self, execution: Dict[str, Any]) -> None:
+        execution_id = execution['id']
+        run = asyncio.ensure_future(self.service.run_claimed_execution(execution))
+        heartbeat = asyncio.ensure_future(self._heartbeat(execution_id, run))
+        try:
+            result = await run
+            await self._flush_journal(execution_id)
+            if result.status == 'completed':
+                await self.queue.complete(execution_id, self.worker_id, result.output_data)
+            else:
+                await self.queue.fail(
+                    execution, self.worker_id, f"Nó {result.failed_node}: {result.error}",
+                    retryable=result.retryable
+                )
+        except asyncio.CancelledError:
+            logger.warning(f"⚠️ Execução {execution_id} interrompida neste worker")
+        except Exception as e:
+            logger.error(f"❌ Erro na execução {execution_id}: {e}")
+            await self._flush_journal(execution_id)
+            # Grafo inválido (ciclo, conexão quebrada) falha igual em qualquer tentativa
+            await self.queue.fail(execution, self.worker_id, str(e), retryable=not isinstance(e, WorkflowGraphError))
+        finally:
+            heartbeat.cancel()
+
+    async def run_forever(self) -> None:
+        logger.info(f"🚀 Worker {self.worker_id} iniciado (concorrência {self.concurrency})")
+        stats_task = asyncio.ensure_future(self._stats_loop())
+        while not self._stopping.is_set():
+            if len(self._running) >= self.concurrency:
+                await asyncio.wait(self._running, return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            try:
+                execution = await self.queue.claim(self.worker_id)
+            except Exception as e:
+                logger.error(f"❌ Erro ao reservar execução: {e}")
+                execution = None
+
+            if execution is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.ensure_future(self._process(execution))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+        # Execuções não concluídas no prazo voltam à fila quando o lease expira
+        if self._running:
+            logger.info(f"⏳ Aguardando {len(self._running)} execução(ões) em andamento")
+            _, pending = await asyncio.wait(self._running, timeout=WORKFLOW_WORKER_SHUTDOWN_GRACE)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        await self.journal.close()
+        await stats_task
+        await self._publish_stats()
+        logger.info(f"📊 Journal de steps: {self.journal.get_stats()}")
+        logger.info(f"📊 Memoização de nós (hits por workflow): {self.memo.get_stats()}")
+
+        from services.executors import shutdown_executors
+        from services.supabase_async import supabase_async
+        await supabase_async.aclose()
+        shutdown_executors()
+        logger.info(f"✅ Worker {self.worker_id} encerrado")
+
+
+def run_worker_process(concurrency: int, poll_interval: float) -> None:
+    """Ponto de entrada de cada processo worker"""
+
+    async def main():
+        worker = WorkflowWorker(concurrency, poll_interval)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, worker.stop)
+        await worker.run_forever()
+
+    asyncio.run(main())
+
+
+def supervise(processes: int, concurrency: int, poll_interval: float) -> None:
+    """Mantém N processos worker ativos, reiniciando os que morrerem"""
+    stopping = False
+    workers: Dict[int, multiprocessing.Process] = {}
+
+    def start(slot: int) -> None:
+        process = multiprocessing.Process(
+            target=run_worker_process, args=(concurrency, poll_interval), name=f"workflow-worker-{slot}"
+        )
+        process.start()
+        workers[slot] = process
+        logger.info(f"🔧 Processo {process.name} iniciado (pid {process.pid})")
+
+    def handle_signal(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for process in workers.values():
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    for slot in range(processes):
+        start(slot)
+
+    while not stopping:
+        for slot, process in list(workers.items()):
+            if not process.is_alive() and not stopping:
+                logger.warning(f"⚠️ {process.name} saiu com código {process.exitcode}; reiniciando")
+                start(slot)
+        time.sleep(1)
+
+    for process in workers.values():
+        process.join(WORKFLOW_WORKER_SHUTDOWN_GRACE + 5)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker da fila de execuções de workflow")
+    parser.add_argument("--processes", type=int, default=WORKFLOW_WORKER_PROCESSES)
+    parser.add_argument("--concurrency", type=int, default=WORKFLOW_WORKER_CONCURRENCY,
+                        help="Execuções simultâneas por processo")
+    parser.add_argument("--poll-interval", type=float, default=WORKFLOW_WORKER_POLL_INTERVAL)
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        run_worker_process(args.concurrency, args.poll_interval)
+    else:
+        supervise(args.processes, args.concurrency, args.poll_interval)
@@ -0,0 +1,102 @@
+-- 001_workflow_execution_queue.sql
+-- Fila durável de execuções de workflow (claim com SKIP LOCKED + lease/heartbeat)
+
+CREATE TABLE IF NOT EXISTS agno_workflow_executions (
+    id SERIAL PRIMARY KEY,
+    workflow_id INTEGER REFERENCES agno_workflows(id) ON DELETE CASCADE,
+    user_id INTEGER,
+    input_data JSONB DEFAULT '{}',
+    output_data JSONB,
+    execution_status VARCHAR(20) NOT NULL DEFAULT 'queued', -- 'queued', 'running', 'completed', 'failed'
+    error_message TEXT,
+    started_at TIMESTAMP WITH TIME ZONE,
+    completed_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS agno_execution_steps (
+    id SERIAL PRIMARY KEY,
+    execution_id INTEGER REFERENCES agno_workflow_executions(id) ON DELETE CASCADE,
+    node_id VARCHAR(100) NOT NULL,
+    step_type VARCHAR(50),
+    input_data JSONB,
+    output_data JSONB,
+    status VARCHAR(20) NOT NULL DEFAULT 'running', -- 'running', 'completed', 'failed'
+    error_message TEXT,
+    started_at TIMESTAMP WITH TIME ZONE,
+    completed_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Colunas da fila
+ALTER TABLE agno_workflow_executions
+    ADD COLUMN IF NOT EXISTS visual_definition JSONB,
+    ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS max_attempts INTEGER NOT NULL DEFAULT 3,
+    ADD COLUMN IF NOT EXISTS available_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS lease_owner VARCHAR(255),
+    ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP WITH TIME ZONE,
+    ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP WITH TIME ZONE;
+
+CREATE INDEX IF NOT EXISTS idx_agno_workflow_executions_queued
+    ON agno_workflow_executions(available_at, id) WHERE execution_status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_agno_workflow_executions_lease
+    ON agno_workflow_executions(lease_expires_at) WHERE execution_status = 'running';
+CREATE INDEX IF NOT EXISTS idx_agno_execution_steps_execution
+    ON agno_execution_steps(execution_id, node_id);
+
+-- Reserva a próxima execução disponível (fila nova ou lease expirado).
+-- SKIP LOCKED permite vários workers concorrentes sem disputa pela mesma linha.
+CREATE OR REPLACE FUNCTION agno_claim_workflow_execution(
+    p_worker_id TEXT,
+    p_lease_seconds INTEGER DEFAULT 60
+)
+RETURNS SETOF agno_workflow_executions AS $$
+BEGIN
+    -- Leases expirados sem tentativas restantes são encerrados como falha
+    UPDATE agno_workflow_executions
+    SET execution_status = 'failed',
+        error_message = 'Tentativas esgotadas (lease expirado)',
+        completed_at = now(),
+        lease_owner = NULL
+    WHERE execution_status = 'running'
+      AND lease_expires_at < now()
+      AND attempts >= max_attempts;
+
+    RETURN QUERY
+    UPDATE agno_workflow_executions e
+    SET execution_status = 'running',
+        lease_owner = p_worker_id,
+        lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+        heartbeat_at = now(),
+        attempts = e.attempts + 1,
+        started_at = COALESCE(e.started_at, now())
+    WHERE e.id = (
+        SELECT c.id
+        FROM agno_workflow_executions c
+        WHERE (c.execution_status = 'queued' AND c.available_at <= now())
+           OR (c.execution_status = 'running' AND c.lease_expires_at < now())
+        ORDER BY c.available_at, c.id
+        FOR UPDATE SKIP LOCKED
+        LIMIT 1
+    )
+    RETURNING e.*;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Renova o lease; retorna false se o worker perdeu a execução
+CREATE OR REPLACE FUNCTION agno_heartbeat_workflow_execution(
+    p_execution_id INTEGER,
+    p_worker_id TEXT,
+    p_lease_seconds INTEGER DEFAULT 60
+)
+RETURNS BOOLEAN AS $$
+BEGIN
+    UPDATE agno_workflow_executions
+    SET lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+        heartbeat_at = now()
+    WHERE id = p_execution_id
+      AND lease_owner = p_worker_id
+      AND execution_status = 'running';
+    RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,13 @@
+-- 002_execution_steps_journal.sql
+-- Um registro por (execução, nó): permite gravar os steps em lote via upsert
+
+-- Mantém apenas o registro mais recente de cada nó antes de criar a restrição
+DELETE FROM agno_execution_steps s
+USING agno_execution_steps newer
+WHERE s.execution_id = newer.execution_id
+  AND s.node_id = newer.node_id
+  AND s.id < newer.id;
+
+DROP INDEX IF EXISTS idx_agno_execution_steps_execution;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_agno_execution_steps_execution_node
+    ON agno_execution_steps(execution_id, node_id);
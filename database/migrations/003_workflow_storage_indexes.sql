@@ -0,0 +1,15 @@
+-- 003_workflow_storage_indexes.sql
+-- Armazenamento persistente dos workflows visuais e índices para paginação keyset
+
+ALTER TABLE agno_workflows
+    ADD COLUMN IF NOT EXISTS visual_definition JSONB;
+
+-- Listagem por usuário: WHERE user_id = ? AND is_active ORDER BY created_at DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_agno_workflows_user_active_created
+    ON agno_workflows(user_id, is_active, created_at DESC, id DESC);
+
+-- Execuções recentes por usuário e por workflow
+CREATE INDEX IF NOT EXISTS idx_agno_workflow_executions_user_created
+    ON agno_workflow_executions(user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_agno_workflow_executions_workflow_created
+    ON agno_workflow_executions(workflow_id, created_at DESC);
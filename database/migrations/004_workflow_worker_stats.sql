@@ -0,0 +1,12 @@
+-- 004_workflow_worker_stats.sql
+-- Métricas publicadas periodicamente por cada processo worker (workflow_worker.py):
+-- os workers não expõem HTTP, então a API lê os contadores desta tabela
+
+CREATE TABLE IF NOT EXISTS agno_workflow_worker_stats (
+    worker_id VARCHAR(255) PRIMARY KEY,
+    stats JSONB NOT NULL DEFAULT '{}'::jsonb,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_agno_workflow_worker_stats_updated
+    ON agno_workflow_worker_stats(updated_at DESC);